@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingest benchmark.
+
+Generates a synthetic push.json batch (themes, overlays and wallpapers with a
+configurable number and size of files), serves it the three ways submissions
+arrive -- zip uploads, local bare git repositories and a local HTTP server
+for URL submissions -- and runs process_push.main() against a scratch
+repository root. Nothing outside the scratch directory is touched.
+
+Throughput (submissions/s, MB/s of uncompressed package files) is measured
+on plain runs; one extra run with --profile supplies the per-stage
+breakdown, since tracemalloc slows the profiled run down. Results are
+compared against the committed baseline in .github/benchmarks/, which
+--save-baseline updates.
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import random
+import struct
+import zipfile
+import zlib
+import argparse
+import threading
+import subprocess
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+
+import process_push
+
+# Committed baseline, so every checkout and CI compare against the same numbers
+DEFAULT_BASELINE = Path(__file__).resolve().parent.parent / "benchmarks" / "ingest_baseline.json"
+
+# Submission types the generator can produce
+BENCHMARK_TYPES = ["theme", "overlay", "wallpaper"]
+
+# Submission methods, assigned round-robin
+BENCHMARK_METHODS = ["zip", "repository", "url"]
+
+# Throughput drop (fraction of the baseline) that counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def png_bytes(width, height, seed, noise=True):
+    """Return a valid RGB PNG; noise images barely compress, so their size tracks width * height"""
+    rnd = random.Random(seed)
+    if noise:
+        rows = [b"\x00" + rnd.randbytes(width * 3) for _ in range(height)]
+    else:
+        # A few flat bands, like a screenshot
+        rows = [b"\x00" + bytes(rnd.randrange(0, 4) * 60 for _ in range(width * 3)) for _ in range(height)]
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + chunk(b"IEND", b""))
+
+def make_manifest(name, component_type):
+    """Return a manifest that passes the schema for its type"""
+    if component_type == "theme":
+        return {
+            "theme_info": {"name": name, "version": "1.0.0", "author": "Benchmark",
+                           "creation_date": "2025-01-01T00:00:00Z", "exported_by": "Theme Manager v1.0.0"},
+            "content": {
+                "wallpapers": {"present": True, "count": 1},
+                "icons": {"present": False, "system_count": 0, "tool_count": 0, "collection_count": 0},
+                "overlays": {"present": False, "systems": []},
+                "fonts": {"present": False, "og_replaced": False, "next_replaced": False},
+                "settings": {"accents_included": True, "leds_included": False}
+            },
+            "path_mappings": {},
+            "accent_colors": {f"color{i}": f"0x{i * 0x111111:06X}" for i in range(1, 7)},
+            "led_settings": {}
+        }
+    if component_type == "overlay":
+        content = {"systems": ["GB", "GBA"]}
+    else:
+        content = {"count": 1, "system_wallpapers": [], "collection_wallpapers": []}
+    return {
+        "component_info": {"name": name, "type": component_type, "version": "1.0.0", "author": "Benchmark",
+                           "creation_date": "2025-01-01T00:00:00Z", "exported_by": "Theme Manager v1.2"},
+        "content": content,
+        "path_mappings": []
+    }
+
+def package_files(name, component_type, file_count, file_kb, seed):
+    """Return {relative path: bytes} for one synthetic package"""
+    files = OrderedDict()
+    files["manifest.json"] = json.dumps(make_manifest(name, component_type), indent=2).encode("utf-8")
+    files["preview.png"] = png_bytes(640, 480, seed, noise=False)
+
+    # Noise PNGs of roughly file_kb each
+    width = 256
+    height = max(1, file_kb * 1024 // (width * 3))
+    for i in range(file_count):
+        if component_type == "overlay":
+            path = f"Systems/{['GB', 'GBA'][i % 2]}/overlay{i}.png"
+        else:
+            path = f"Wallpapers/SystemWallpapers/Benchmark {i}.png"
+        files[path] = png_bytes(width, height, seed * 1000 + i)
+    return files
+
+def git(*args, cwd=None):
+    """Run a git command quietly and return its output"""
+    result = subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+def write_zip(path, name, files):
+    """Write a package zip with everything under a <name>/ folder, like the Theme Manager does"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for rel_path, data in files.items():
+            zf.writestr(f"{name}/{rel_path}", data)
+
+def write_bare_repo(path, files):
+    """Commit files to a new repository and return (bare repository path, commit)"""
+    work = path.with_suffix(".work")
+    for rel_path, data in files.items():
+        target = work / rel_path
+        os.makedirs(target.parent, exist_ok=True)
+        target.write_bytes(data)
+    git("init", "-q", "-b", "main", cwd=work)
+    git("add", "-A", cwd=work)
+    git("-c", "user.name=Benchmark", "-c", "user.email=benchmark@localhost", "commit", "-qm", "Benchmark", cwd=work)
+    commit = git("rev-parse", "HEAD", cwd=work)
+    git("clone", "-q", "--bare", str(work), str(path))
+    shutil.rmtree(work)
+    return path, commit
+
+def generate_sources(source_dir, counts, methods, file_count, file_kb, seed):
+    """
+    Build every synthetic package once. Returns (sources, payload bytes), where sources is a
+    list of (submission, upload zip or None) with URL submissions pointing at "{base_url}" to
+    be filled in once the server is up, and payload bytes is the size of all package files.
+    """
+    if source_dir.exists():
+        shutil.rmtree(source_dir)
+    for sub_dir in ("zips", "repos", "http"):
+        os.makedirs(source_dir / sub_dir)
+
+    sources = []
+    payload = 0
+    index = 0
+    for component_type in BENCHMARK_TYPES:
+        for i in range(counts[component_type]):
+            suffix = process_push.COMPONENT_TYPES[component_type]
+            name = f"Bench{component_type.capitalize()}{i:03d}{suffix}"
+            method = methods[index % len(methods)]
+            files = package_files(name, component_type, file_count, file_kb, seed + index)
+            payload += sum(len(data) for data in files.values())
+            index += 1
+
+            submission = {"type": component_type, "name": name, "author": "Benchmark", "submission_method": method}
+            upload = None
+            if method == "zip":
+                upload = source_dir / "zips" / f"{name}.zip"
+                write_zip(upload, name, files)
+            elif method == "url":
+                write_zip(source_dir / "http" / f"{name}.zip", name, files)
+                submission["url"] = "{base_url}/" + f"{name}.zip"
+            else:
+                repo, commit = write_bare_repo(source_dir / "repos" / f"{name}.git", files)
+                submission.update({"url": repo.as_uri(), "commit": commit, "branch": "main"})
+            sources.append((submission, upload))
+    return sources, payload
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler that doesn't log every request"""
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(directory):
+    """Serve a directory on a free localhost port; returns (server, base URL)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def prepare_root(root, sources, base_url):
+    """Create a fresh scratch repository root with the uploads and push.json in place"""
+    if root.exists():
+        shutil.rmtree(root)
+    os.makedirs(root / "Upload")
+    submissions = []
+    for submission, upload in sources:
+        submission = dict(submission)
+        if upload is not None:
+            shutil.copyfile(upload, root / "Upload" / upload.name)
+        if submission["submission_method"] == "url":
+            submission["url"] = submission["url"].format(base_url=base_url)
+        submissions.append(submission)
+    with open(root / "Upload" / "push.json", "w", encoding="utf-8") as f:
+        json.dump({"submission": submissions}, f, indent=2)
+
+def run_once(root, cache_dir, sources, base_url, main_args, verbose):
+    """Run process_push against the scratch root; returns (success, seconds)"""
+    prepare_root(root, sources, base_url)
+    process_push.configure_paths(root, cache_dir)
+    output = sys.stdout if verbose else io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        success = process_push.main(main_args)
+    seconds = time.perf_counter() - start
+    if not success and not verbose:
+        print(output.getvalue())
+    return success, seconds
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline; returns False on a throughput regression"""
+    if baseline.get("config") != results["config"]:
+        print("Baseline was recorded with a different configuration, skipping comparison")
+        return True
+
+    ok = True
+    for metric in ("submissions_per_second", "mb_per_second"):
+        old = baseline["results"][metric]
+        new = results["results"][metric]
+        change = (new - old) / old if old else 0.0
+        regressed = change < -tolerance
+        ok = ok and not regressed
+        print(f"{metric}: {old:.2f} -> {new:.2f} ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+
+    old_stages = baseline.get("stages", {})
+    for name, stage in results.get("stages", {}).items():
+        if name in old_stages and old_stages[name]["wall_seconds"]:
+            old = old_stages[name]["wall_seconds"]
+            print(f"  {name}: {old:.3f}s -> {stage['wall_seconds']:.3f}s ({(stage['wall_seconds'] - old) / old:+.1%})")
+    return ok
+
+def main(argv=None):
+    """Generate a synthetic batch, run the ingest on it and report throughput"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Benchmark process_push on synthetic submissions")
+    parser.add_argument("--themes", type=int, default=6)
+    parser.add_argument("--overlays", type=int, default=3)
+    parser.add_argument("--wallpapers", type=int, default=3)
+    parser.add_argument("--files", type=int, default=8, help="Extra image files per package")
+    parser.add_argument("--file-kb", type=int, default=64, help="Approximate size of each extra file, in KB")
+    parser.add_argument("--methods", default=",".join(BENCHMARK_METHODS),
+                        help="Comma-separated submission methods to use round-robin")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs (the best one is reported)")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Keep the ingest cache between runs instead of starting each run cold")
+    parser.add_argument("--no-stages", action="store_true", help="Skip the profiled run")
+    parser.add_argument("--workers", type=int, default=process_push.DEFAULT_WORKERS)
+    parser.add_argument("--optimize-png", action="store_true")
+    parser.add_argument("--no-thumbnails", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scratch", default=str(repo_root / ".cache" / "benchmark"),
+                        help="Scratch directory for sources, the fake repository root and its cache")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                        help="Baseline JSON (default: .github/benchmarks/ingest_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed throughput drop against the baseline, as a fraction")
+    parser.add_argument("--report", default=None, help="Write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show process_push output")
+    args = parser.parse_args(argv)
+
+    methods = [method.strip() for method in args.methods.split(",") if method.strip()]
+    for method in methods:
+        if method not in BENCHMARK_METHODS:
+            print(f"Error: Unknown submission method '{method}'")
+            return False
+
+    scratch = Path(args.scratch).resolve()
+    root = scratch / "root"
+    cache_dir = scratch / "cache"
+    baseline_path = Path(args.baseline)
+    counts = {"theme": args.themes, "overlay": args.overlays, "wallpaper": args.wallpapers}
+    total = sum(counts.values())
+    if total == 0:
+        print("Error: Nothing to benchmark")
+        return False
+
+    config = OrderedDict([
+        ("counts", counts), ("files", args.files), ("file_kb", args.file_kb), ("methods", methods),
+        ("workers", args.workers), ("optimize_png", args.optimize_png), ("thumbnails", not args.no_thumbnails),
+        ("warm_cache", args.warm_cache), ("seed", args.seed)
+    ])
+
+    print(f"Generating {total} submission(s) in {scratch / 'sources'}")
+    sources, payload = generate_sources(scratch / "sources", counts, methods, args.files, args.file_kb, args.seed)
+    megabytes = payload / (1024 * 1024)
+
+    main_args = ["--workers", str(args.workers)]
+    if args.optimize_png:
+        main_args.append("--optimize-png")
+    if args.no_thumbnails:
+        main_args.append("--no-thumbnails")
+
+    server, base_url = start_server(scratch / "sources" / "http")
+    try:
+        timings = []
+        for run in range(max(1, args.runs)):
+            if not args.warm_cache and cache_dir.exists():
+                shutil.rmtree(cache_dir)
+            success, seconds = run_once(root, cache_dir, sources, base_url, main_args, args.verbose)
+            if not success:
+                print(f"Error: Run {run + 1} failed")
+                return False
+            timings.append(seconds)
+            print(f"Run {run + 1}: {seconds:.3f}s")
+
+        stages = OrderedDict()
+        if not args.no_stages:
+            if not args.warm_cache and cache_dir.exists():
+                shutil.rmtree(cache_dir)
+            profile_path = scratch / "profile.json"
+            success, _ = run_once(root, cache_dir, sources, base_url, main_args + ["--profile", str(profile_path)],
+                                  args.verbose)
+            if success:
+                with open(profile_path, "r", encoding="utf-8") as f:
+                    stages = json.load(f, object_pairs_hook=OrderedDict)["stages"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    best = min(timings)
+    results = OrderedDict([
+        ("config", config),
+        ("results", OrderedDict([
+            ("submissions", total),
+            ("megabytes", round(megabytes, 3)),
+            ("best_seconds", round(best, 6)),
+            ("mean_seconds", round(sum(timings) / len(timings), 6)),
+            ("submissions_per_second", round(total / best, 3)),
+            ("mb_per_second", round(megabytes / best, 3))
+        ])),
+        ("stages", stages)
+    ])
+
+    print(f"{total} submission(s), {megabytes:.1f} MB: best {best:.3f}s, "
+          f"{total / best:.2f} submissions/s, {megabytes / best:.2f} MB/s")
+    for name, stage in stages.items():
+        print(f"  {name}: {stage['count']} x, {stage['wall_seconds']:.3f}s total")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    ok = True
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            ok = compare(results, json.load(f), args.tolerance)
+    if args.save_baseline:
+        os.makedirs(baseline_path.parent, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+    return ok
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Content-addressed blob store used when writing into Catalog/, Packages/ and .metadata.
+
+Every file is stored once under its SHA-256 and hardlinked into place, so identical
+icons, fonts, wallpapers and the duplicated preview/manifest copies in .metadata
+share a single inode. Files are always placed with a rename, never written in
+place, because a hardlinked file is shared by every path that points at it.
+
+Run directly to report (and optionally link) duplicates in the existing tree.
+"""
+
+import os
+import sys
+import errno
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+# Read buffer for hashing and copying
+CHUNK_SIZE = 1024 * 1024
+
+# Errors that mean "hardlinks are not possible here", so fall back to copying
+LINK_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES}
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def format_bytes(size):
+    """Format a byte count for log output"""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class BlobStore:
+    """SHA-256 keyed store that hardlinks identical files instead of writing them again"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.files_written = 0
+        self.files_deduplicated = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+        self.link_fallbacks = 0
+
+    def blob_path(self, sha256):
+        """Return the store path of a blob"""
+        return self.root / sha256[:2] / sha256[2:]
+
+    def _temp_file(self, directory):
+        """Create a temp file next to its final location so the final rename is atomic"""
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".blob.", suffix=".tmp", dir=directory)
+        return os.fdopen(fd, "wb"), temp_path
+
+    def _commit_blob(self, temp_path, sha256, size):
+        """Move a hashed temp file into the store (or drop it if the blob already exists)"""
+        blob = self.blob_path(sha256)
+        with self._lock:
+            if blob.exists():
+                os.unlink(temp_path)
+                self.files_deduplicated += 1
+                self.bytes_saved += size
+            else:
+                os.makedirs(blob.parent, exist_ok=True)
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, blob)
+                self.files_written += 1
+                self.bytes_written += size
+        return blob
+
+    def _place(self, blob, dest):
+        """Hardlink a blob to dest (copying when links are not possible), replacing dest atomically"""
+        dest = Path(dest)
+        os.makedirs(dest.parent, exist_ok=True)
+        if dest.exists() and os.path.samefile(blob, dest):
+            return dest
+
+        temp_dest = dest.parent / f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(blob, temp_dest)
+        except OSError as e:
+            if e.errno not in LINK_FALLBACK_ERRNOS:
+                raise
+            shutil.copyfile(blob, temp_dest)
+            with self._lock:
+                self.link_fallbacks += 1
+        os.replace(temp_dest, dest)
+        return dest
+
+    def write_stream(self, source, dest):
+        """Store the contents of a readable binary stream and place it at dest; returns the SHA-256"""
+        digest = hashlib.sha256()
+        size = 0
+        f, temp_path = self._temp_file(self.root / "tmp")
+        try:
+            with f:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            blob = self._commit_blob(temp_path, sha256, size)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self._place(blob, dest)
+        return sha256
+
+    def write_bytes(self, data, dest):
+        """Store an in-memory payload and place it at dest; returns the SHA-256"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(sha256)
+        if blob.exists():
+            with self._lock:
+                self.files_deduplicated += 1
+                self.bytes_saved += len(data)
+        else:
+            f, temp_path = self._temp_file(self.root / "tmp")
+            with f:
+                f.write(data)
+            self._commit_blob(temp_path, sha256, len(data))
+        self._place(blob, dest)
+        return sha256
+
+    def copy_file(self, src, dest):
+        """Place a copy of src at dest through the store; returns the SHA-256"""
+        with open(src, "rb") as source:
+            return self.write_stream(source, dest)
+
+    def link_file(self, src, dest):
+        """
+        Place src at dest without copying its bytes: a hardlink when both are on the same
+        filesystem (a copy only across filesystems), then adopt it into the store.
+        src is left in place. Returns the SHA-256.
+        """
+        dest = Path(dest)
+        os.makedirs(dest.parent, exist_ok=True)
+        if not (dest.exists() and os.path.samefile(src, dest)):
+            temp_dest = dest.parent / f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(src, temp_dest)
+            except OSError as e:
+                if e.errno not in LINK_FALLBACK_ERRNOS:
+                    raise
+                with self._lock:
+                    self.link_fallbacks += 1
+                shutil.copyfile(src, temp_dest)
+            os.replace(temp_dest, dest)
+        return self.adopt(dest)
+
+    def link(self, sha256, dest):
+        """Place an already stored blob at dest; returns the SHA-256"""
+        self._place(self.blob_path(sha256), dest)
+        return sha256
+
+    def adopt(self, path):
+        """Move an existing file into the store and replace it with a link; returns the SHA-256"""
+        path = Path(path)
+        sha256 = file_sha256(path)
+        blob = self.blob_path(sha256)
+        size = path.stat().st_size
+        with self._lock:
+            if blob.exists():
+                self.files_deduplicated += 1
+                self.bytes_saved += size
+                adopted = False
+            else:
+                os.makedirs(blob.parent, exist_ok=True)
+                try:
+                    os.link(path, blob)
+                    adopted = True
+                except OSError as e:
+                    if e.errno not in LINK_FALLBACK_ERRNOS:
+                        raise
+                    shutil.copyfile(path, blob)
+                    adopted = False
+                self.files_written += 1
+                self.bytes_written += size
+        if not adopted:
+            self._place(blob, path)
+        return sha256
+
+    def prune(self, keep=()):
+        """
+        Delete blobs that nothing links to or references; returns (files, bytes) removed.
+        A restored cache has no links into the checkout, so blobs whose SHA-256 is in
+        keep (the ownership registry and the PNG cache) are kept regardless of links.
+        """
+        removed_files = 0
+        removed_bytes = 0
+        if not self.root.exists():
+            return 0, 0
+
+        for directory in self.root.iterdir():
+            if not directory.is_dir() or directory.name == "tmp":
+                continue
+            for blob in directory.iterdir():
+                if directory.name + blob.name in keep:
+                    continue
+                stat = blob.stat()
+                if stat.st_nlink <= 1:
+                    blob.unlink()
+                    removed_files += 1
+                    removed_bytes += stat.st_size
+        return removed_files, removed_bytes
+
+    def report(self):
+        """Return the statistics for this run"""
+        return {
+            "files_written": self.files_written,
+            "files_deduplicated": self.files_deduplicated,
+            "bytes_written": self.bytes_written,
+            "bytes_saved": self.bytes_saved,
+            "link_fallbacks": self.link_fallbacks
+        }
+
+    def summary(self):
+        """Return a one-line summary of this run's statistics"""
+        return (f"Asset store: {self.files_written} new file(s) ({format_bytes(self.bytes_written)}), "
+                f"{self.files_deduplicated} deduplicated ({format_bytes(self.bytes_saved)} saved)")
+
+
+def scan_duplicates(roots):
+    """Group files under the given roots by content; returns (groups, total_bytes, duplicate_bytes)"""
+    by_size = {}
+    total_bytes = 0
+    for root in roots:
+        for dirpath, _, files in os.walk(root):
+            for file in files:
+                path = os.path.join(dirpath, file)
+                if os.path.islink(path):
+                    continue
+                size = os.path.getsize(path)
+                total_bytes += size
+                by_size.setdefault(size, []).append(path)
+
+    # Only hash files whose size collides with another file
+    groups = {}
+    for size, paths in by_size.items():
+        if len(paths) < 2 or size == 0:
+            continue
+        for path in paths:
+            groups.setdefault((size, file_sha256(path)), []).append(path)
+
+    groups = {key: paths for key, paths in groups.items() if len(paths) > 1}
+    duplicate_bytes = 0
+    for (size, _), paths in groups.items():
+        inodes = {os.stat(path).st_ino for path in paths}
+        duplicate_bytes += size * (len(inodes) - 1)
+    return groups, total_bytes, duplicate_bytes
+
+def main(argv=None):
+    """Report (and optionally hardlink) duplicate files in Catalog/ and Packages/"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Report duplicate assets and optionally link them through the blob store")
+    parser.add_argument("--link", action="store_true", help="Hardlink duplicates through the blob store")
+    parser.add_argument("--store", default=str(repo_root / ".cache" / "blobs"), help="Blob store directory")
+    args = parser.parse_args(argv)
+
+    roots = [repo_root / "Catalog", repo_root / "Packages"]
+    groups, total_bytes, duplicate_bytes = scan_duplicates(roots)
+    print(f"Scanned {format_bytes(total_bytes)} in {', '.join(str(r.relative_to(repo_root)) for r in roots)}")
+    print(f"{len(groups)} duplicated file(s), {format_bytes(duplicate_bytes)} reclaimable")
+
+    if args.link:
+        store = BlobStore(args.store)
+        for paths in groups.values():
+            for path in paths:
+                store.adopt(path)
+        print(store.summary())
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
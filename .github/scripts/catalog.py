@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Shared in-memory model of Catalog/catalog.json.
+
+The catalog is loaded once per run, edited in memory and written back once
+(atomically, via a temp file and os.replace) only if something changed.
+
+Alongside catalog.json, every section is also written as its own shard
+(Catalog/shards/<section>.json) with a small shards/index.json listing each
+shard's SHA-256 and item count. Clients can fetch the index, compare hashes
+and download only the shards that changed. Shards carry no timestamps, so an
+untouched section keeps the same bytes and hash.
+
+Every entry that was added, changed or removed since the catalog was loaded is
+also appended to the Catalog/changes.jsonl change feed when it is saved.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from change_log import ChangeLog, entry_hash
+
+# Section keys under "components" (themes live in their own top-level section)
+COMPONENT_SECTIONS = ["accents", "leds", "icons", "fonts", "wallpapers", "overlays"]
+
+# All section keys, themes first
+SECTION_KEYS = ["themes"] + COMPONENT_SECTIONS
+
+# Directory (next to catalog.json) holding the per-section shards and their index
+SHARD_DIR_NAME = "shards"
+SHARD_INDEX_NAME = "index.json"
+SHARD_INDEX_VERSION = 1
+
+# Append-only change feed, next to catalog.json
+CHANGE_LOG_NAME = "changes.jsonl"
+
+# Submission type -> catalog section key
+TYPE_SECTIONS = {
+    "theme": "themes",
+    "wallpaper": "wallpapers",
+    "icon": "icons",
+    "accent": "accents",
+    "led": "leds",
+    "font": "fonts",
+    "overlay": "overlays"
+}
+
+# Catalog section key -> submission type
+SECTION_TYPES = {section: component_type for component_type, section in TYPE_SECTIONS.items()}
+
+
+def utc_timestamp():
+    """Return the current UTC time in the catalog's ISO format"""
+    return datetime.utcnow().isoformat() + "Z"
+
+def section_for_type(component_type):
+    """Return the catalog section key for a submission type (e.g. "overlay" -> "overlays")"""
+    return TYPE_SECTIONS[component_type]
+
+def write_atomic(path, data):
+    """Write bytes to path via a temp file and os.replace, keeping the existing file's permissions"""
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{path.stem}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the permissions of the file being replaced
+        mode = os.stat(path).st_mode & 0o777 if path.exists() else 0o644
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class Catalog:
+    """Ordered, in-memory view of catalog.json with dirty tracking"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.shard_dir = self.path.parent / SHARD_DIR_NAME
+        self.change_log = ChangeLog(self.path.parent / CHANGE_LOG_NAME)
+        self._saved_hashes = {}  # (section, name) -> entry hash as last saved
+        self._min_sequence = None  # Set when compaction drops old removal records
+        self.last_updated = None
+        self.sections = OrderedDict((key, OrderedDict()) for key in SECTION_KEYS)
+        self.extra = OrderedDict()  # Unknown top-level keys, preserved on save
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        """Load a catalog from disk, or return an empty (dirty) catalog if the file is missing"""
+        catalog = cls(path)
+        if not catalog.path.exists():
+            catalog.last_updated = utc_timestamp()
+            catalog.dirty = True
+            return catalog
+
+        with open(catalog.path, "r", encoding="utf-8") as f:
+            data = json.load(f, object_pairs_hook=OrderedDict)
+
+        catalog.last_updated = data.pop("last_updated", None)
+        themes = data.pop("themes", {})
+        components = data.pop("components", {})
+        catalog.extra = data
+
+        catalog.sections["themes"] = OrderedDict(themes)
+        for key, items in components.items():
+            catalog.sections[key] = OrderedDict(items)
+        catalog._saved_hashes = catalog.entry_hashes()
+        return catalog
+
+    def section(self, key):
+        """Return the ordered name -> entry mapping for a section"""
+        if key not in self.sections:
+            self.sections[key] = OrderedDict()
+        return self.sections[key]
+
+    def items(self, key):
+        """Return (name, entry) pairs of a section in catalog order"""
+        return list(self.sections.get(key, {}).items())
+
+    def get(self, key, name):
+        """Return the entry for name in a section, or None"""
+        return self.sections.get(key, {}).get(name)
+
+    def put_first(self, key, name, entry):
+        """Insert or replace an entry and move it to the front of its section"""
+        section = self.section(key)
+        section[name] = entry
+        section.move_to_end(name, last=False)
+        self.touch()
+
+    def remove(self, key, name):
+        """Remove an entry from a section, returning it (or None if it was not present)"""
+        entry = self.sections.get(key, {}).pop(name, None)
+        if entry is not None:
+            self.touch()
+        return entry
+
+    def touch(self):
+        """Mark the catalog as modified and bump its last_updated timestamp"""
+        self.last_updated = utc_timestamp()
+        self.dirty = True
+
+    def mark_dirty(self):
+        """Mark the catalog as modified without changing last_updated (for in-place entry edits)"""
+        self.dirty = True
+
+    def to_dict(self):
+        """Return the catalog in its catalog.json layout"""
+        data = OrderedDict()
+        data["last_updated"] = self.last_updated
+        data["themes"] = self.sections["themes"]
+        data["components"] = OrderedDict(
+            (key, items) for key, items in self.sections.items() if key != "themes"
+        )
+        data.update(self.extra)
+        return data
+
+    def save(self, force=False):
+        """Atomically write the catalog (and its shards) if it changed; returns True if catalog.json was written"""
+        if not self.dirty and not force:
+            # Still produce the shards and change feed once for catalogs written before they existed
+            if self.path.exists():
+                if not self.change_log.exists():
+                    self.log_changes()
+                if not (self.shard_dir / SHARD_INDEX_NAME).exists():
+                    self.save_shards()
+            return False
+
+        write_atomic(self.path, json.dumps(self.to_dict(), indent=2).encode("utf-8"))
+        self.log_changes()
+        self.save_shards()
+        self.dirty = False
+        return True
+
+    def entry_hashes(self):
+        """Return {(section, name): entry hash} for every entry"""
+        return {
+            (key, name): entry_hash(entry)
+            for key, items in self.sections.items()
+            for name, entry in items.items()
+        }
+
+    def pending_changes(self):
+        """Return (op, section, name, type, sha256) for every entry changed since the last save"""
+        current = self.entry_hashes()
+        # A catalog without a change log yet starts it with every existing entry
+        saved = self._saved_hashes if self.change_log.exists() else {}
+        changes = []
+        for (key, name), sha256 in current.items():
+            old = saved.get((key, name))
+            if old != sha256:
+                changes.append(("add" if old is None else "update", key, name, SECTION_TYPES.get(key), sha256))
+        for (key, name) in saved:
+            if (key, name) not in current:
+                changes.append(("remove", key, name, SECTION_TYPES.get(key), None))
+        return changes
+
+    def log_changes(self):
+        """Append the pending changes to the change feed (compacting it when it grows large)"""
+        changes = self.pending_changes()
+        self.change_log.append(changes, self.last_updated or utc_timestamp())
+        self._saved_hashes = self.entry_hashes()
+        entries = len(self._saved_hashes)
+        if changes and self.change_log.needs_compaction(entries):
+            self.compact_changes()
+        return changes
+
+    def compact_changes(self, drop_removed_before=None):
+        """Compact the change feed and record the oldest sequence a client can still sync from"""
+        before, after = self.change_log.compact(drop_removed_before)
+        if drop_removed_before is not None:
+            # Clients holding a sequence below this may have missed a dropped removal
+            index = self.load_shard_index() or {}
+            min_sequence = index.get("changes", {}).get("min_sequence", 0)
+            self._min_sequence = max(min_sequence, drop_removed_before - 1)
+        self.save_shards()
+        return before, after
+
+    def load_shard_index(self):
+        """Return the current shard index, or None if there is none"""
+        try:
+            with open(self.shard_dir / SHARD_INDEX_NAME, "r", encoding="utf-8") as f:
+                return json.load(f, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError):
+            return None
+
+    def save_shards(self):
+        """Write each section whose content changed as a shard, then the index; returns the shards written"""
+        previous = self.load_shard_index() or {}
+        previous_shards = previous.get("shards", {})
+
+        shards = OrderedDict()
+        written = []
+        for key, items in self.sections.items():
+            data = json.dumps(items, indent=2).encode("utf-8")
+            sha256 = hashlib.sha256(data).hexdigest()
+            shard_path = self.shard_dir / f"{key}.json"
+            old = previous_shards.get(key, {})
+
+            if old.get("sha256") == sha256 and shard_path.exists():
+                last_updated = old.get("last_updated") or self.last_updated
+            else:
+                write_atomic(shard_path, data)
+                written.append(key)
+                last_updated = utc_timestamp()
+
+            shards[key] = OrderedDict([
+                ("path", f"{self.path.parent.name}/{SHARD_DIR_NAME}/{key}.json"),  # Repository-relative, like preview_path
+                ("sha256", sha256),
+                ("count", len(items)),
+                ("bytes", len(data)),
+                ("last_updated", last_updated)
+            ])
+
+        # Drop shards of sections that no longer exist
+        for key in previous_shards:
+            if key not in shards:
+                stale = self.shard_dir / f"{key}.json"
+                if stale.exists():
+                    stale.unlink()
+
+        # Where the change feed stands, so a client knows whether its sequence can catch up
+        previous_changes = previous.get("changes", {})
+        changes = OrderedDict([
+            ("path", f"{self.path.parent.name}/{CHANGE_LOG_NAME}"),
+            ("last_sequence", self.change_log.last_sequence()),
+            ("min_sequence", self._min_sequence if self._min_sequence is not None
+                             else previous_changes.get("min_sequence", 0))
+        ])
+
+        if written or list(previous_shards) != list(shards) or previous_changes != changes:
+            index = OrderedDict([
+                ("version", SHARD_INDEX_VERSION),
+                ("last_updated", self.last_updated),
+                ("shards", shards),
+                ("changes", changes)
+            ])
+            write_atomic(self.shard_dir / SHARD_INDEX_NAME, json.dumps(index, indent=2).encode("utf-8"))
+        return written
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Compact binary export of the catalog for the handheld Theme Manager.
+
+catalog.bin is written next to catalog.json and can be memory-mapped and read
+without a JSON parser. All integers are little-endian:
+
+    header     magic "NXCT", version, record size, section/record counts and the
+               offsets of the three tables below (HEADER)
+    sections   one SECTION per catalog section: name, first record, record count
+    records    one fixed-width RECORD per entry, in catalog order
+    strings    deduplicated UTF-8 strings, each a u32 length followed by the bytes
+
+String fields hold a byte offset into the string table (NO_STRING when absent).
+Each record also carries the entry's accent colors and LED settings, taken from
+its manifest, so the device does not have to fetch every manifest.
+
+Run directly to export, or with --verify to check a file against catalog.json
+and the manifests it was built from.
+"""
+
+import sys
+import json
+import mmap
+import struct
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+from catalog import Catalog, write_atomic
+
+MAGIC = b"NXCT"
+VERSION = 1
+
+# magic, version, record size, section count, record count,
+# sections offset, records offset, strings offset, strings size, last_updated, reserved
+HEADER = struct.Struct("<4sHHIIIIIIII")
+
+# name, first record, record count
+SECTION = struct.Struct("<III")
+
+# String fields of a record, in order
+STRING_FIELDS = [
+    "name", "description", "author", "URL", "preview_path", "manifest_path",
+    "last_updated", "repository", "commit", "branch", "systems", "thumbnail"
+]
+
+# One LED zone: effect, brightness, trigger, in_brightness, speed, color1, color2
+LED_ZONE = struct.Struct("<HHHHIII")
+LED_ZONES = ["f1_key", "f2_key", "top_bar", "lr_triggers"]
+LED_FIELDS = ["effect", "brightness", "trigger", "in_brightness", "speed"]
+
+ACCENT_COUNT = 6
+
+# Strings, thumbnail width/height, section index, flags, reserved, accent colors, LED zones
+RECORD = struct.Struct(
+    "<" + "I" * len(STRING_FIELDS) + "HHBBH" + "I" * ACCENT_COUNT + LED_ZONE.format[1:] * len(LED_ZONES)
+)
+
+# Sentinels for absent values
+NO_STRING = 0xFFFFFFFF
+NO_COLOR = 0xFFFFFFFF
+NO_VALUE16 = 0xFFFF
+NO_VALUE32 = 0xFFFFFFFF
+
+# Record flags
+FLAG_ACCENTS = 0x01
+FLAG_LEDS = 0x02
+
+# Value of each LED zone field when the manifest does not set it
+NO_ZONE = (NO_VALUE16, NO_VALUE16, NO_VALUE16, NO_VALUE16, NO_VALUE32, NO_COLOR, NO_COLOR)
+
+# Overlay systems are stored as one string joined with the ASCII unit separator
+SYSTEMS_SEPARATOR = "\x1f"
+
+
+class CatalogBinaryError(Exception):
+    """Raised for files that are not valid binary catalogs"""
+
+
+def parse_color(value):
+    """Convert "0xRRGGBB" to an integer (NO_COLOR for empty or malformed values)"""
+    if not isinstance(value, str) or not value.lower().startswith("0x"):
+        return NO_COLOR
+    try:
+        color = int(value, 16)
+    except ValueError:
+        return NO_COLOR
+    return color if 0 <= color <= 0xFFFFFF else NO_COLOR
+
+def format_color(value):
+    """Convert an integer color back to "0xRRGGBB" ("" for NO_COLOR)"""
+    return "" if value == NO_COLOR else f"0x{value:06X}"
+
+def _int_field(zone, key, limit):
+    """Return an integer LED field, or the sentinel for absent/out of range values"""
+    value = zone.get(key)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < limit:
+        return limit - 1
+    return value
+
+def load_manifest(repo_root, entry):
+    """Return the parsed manifest of an entry, or None"""
+    manifest_path = entry.get("manifest_path")
+    if not manifest_path:
+        return None
+    try:
+        with open(Path(repo_root) / manifest_path, "r", encoding="utf-8-sig") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+def manifest_colors(manifest):
+    """Return (accent colors, LED zones) of a manifest in their binary form, or None for each"""
+    accents = None
+    leds = None
+    if manifest:
+        accent_colors = manifest.get("accent_colors")
+        if isinstance(accent_colors, dict) and accent_colors:
+            accents = [parse_color(accent_colors.get(f"color{i}")) for i in range(1, ACCENT_COUNT + 1)]
+
+        led_settings = manifest.get("led_settings")
+        if isinstance(led_settings, dict) and led_settings:
+            leds = []
+            for zone_name in LED_ZONES:
+                zone = led_settings.get(zone_name)
+                if not isinstance(zone, dict):
+                    leds.append(None)
+                    continue
+                leds.append((
+                    _int_field(zone, "effect", 0x10000),
+                    _int_field(zone, "brightness", 0x10000),
+                    _int_field(zone, "trigger", 0x10000),
+                    _int_field(zone, "in_brightness", 0x10000),
+                    _int_field(zone, "speed", 0x100000000),
+                    parse_color(zone.get("color1")),
+                    parse_color(zone.get("color2"))
+                ))
+    return accents, leds
+
+def zone_settings(zone):
+    """Convert a binary LED zone back to its manifest form (None for a zone that is not set)"""
+    if zone is None or tuple(zone) == NO_ZONE:
+        return None
+    settings = {field: value for field, value, unset in zip(LED_FIELDS, zone[:5], NO_ZONE[:5]) if value != unset}
+    settings["color1"] = format_color(zone[5])
+    settings["color2"] = format_color(zone[6])
+    return settings
+
+def led_settings(zones):
+    """Convert binary LED zones back to a manifest led_settings dict"""
+    settings = {}
+    for zone_name, zone in zip(LED_ZONES, zones):
+        zone = zone_settings(zone)
+        if zone is not None:
+            settings[zone_name] = zone
+    return settings
+
+def smallest_thumbnail(entry):
+    """Return the smallest PNG thumbnail of an entry (the device decodes PNG natively), or None"""
+    thumbnails = [t for t in entry.get("thumbnails", []) if t.get("format") == "png"]
+    return min(thumbnails, key=lambda t: t["width"]) if thumbnails else None
+
+
+class StringTable:
+    """Deduplicated, length-prefixed UTF-8 strings"""
+
+    def __init__(self):
+        self.offsets = {}
+        self.data = bytearray()
+
+    def add(self, value):
+        """Return the offset of a string, adding it if needed (NO_STRING for None)"""
+        if value is None:
+            return NO_STRING
+        value = str(value)
+        offset = self.offsets.get(value)
+        if offset is None:
+            encoded = value.encode("utf-8")
+            offset = len(self.data)
+            self.data += struct.pack("<I", len(encoded)) + encoded
+            self.offsets[value] = offset
+        return offset
+
+
+def build(catalog, repo_root):
+    """Serialize a Catalog (and its entries' manifests) to bytes"""
+    strings = StringTable()
+    sections = []
+    records = bytearray()
+    record_count = 0
+
+    for section_index, (key, items) in enumerate(catalog.sections.items()):
+        sections.append((strings.add(key), record_count, len(items)))
+        for name, entry in items.items():
+            values = dict(entry, name=name)
+            systems = entry.get("systems")
+            values["systems"] = SYSTEMS_SEPARATOR.join(systems) if isinstance(systems, list) else None
+            thumbnail = smallest_thumbnail(entry)
+            values["thumbnail"] = thumbnail["path"] if thumbnail else None
+
+            accents, leds = manifest_colors(load_manifest(repo_root, entry))
+            flags = (FLAG_ACCENTS if accents else 0) | (FLAG_LEDS if leds else 0)
+
+            fields = [strings.add(values.get(field)) for field in STRING_FIELDS]
+            fields += [thumbnail["width"] if thumbnail else 0, thumbnail["height"] if thumbnail else 0]
+            fields += [section_index, flags, 0]
+            fields += accents or [NO_COLOR] * ACCENT_COUNT
+            for zone in leds or [None] * len(LED_ZONES):
+                fields += zone or NO_ZONE
+            records += RECORD.pack(*fields)
+            record_count += 1
+
+    last_updated = strings.add(catalog.last_updated)
+    sections_offset = HEADER.size
+    records_offset = sections_offset + SECTION.size * len(sections)
+    strings_offset = records_offset + len(records)
+    header = HEADER.pack(
+        MAGIC, VERSION, RECORD.size, len(sections), record_count,
+        sections_offset, records_offset, strings_offset, len(strings.data), last_updated, 0
+    )
+    return header + b"".join(SECTION.pack(*section) for section in sections) + bytes(records) + bytes(strings.data)
+
+def export(catalog, repo_root, path):
+    """Write the binary catalog if its content changed; returns True if the file was written"""
+    data = build(catalog, repo_root)
+    path = Path(path)
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    write_atomic(path, data)
+    return True
+
+
+class CatalogReader:
+    """Reference reader for catalog.bin (memory-mapped, decodes records on demand)"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self._file.close()
+            raise CatalogBinaryError(f"{path} is empty") from e
+
+        if len(self._data) < HEADER.size:
+            self.close()
+            raise CatalogBinaryError(f"{path} is too short")
+        (magic, version, record_size, section_count, self.record_count, sections_offset,
+         self._records_offset, self._strings_offset, strings_size, last_updated, _) = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise CatalogBinaryError(f"{path} is not a version {VERSION} binary catalog")
+
+        self.last_updated = self.string(last_updated)
+        self.sections = OrderedDict()
+        for i in range(section_count):
+            name, first, count = SECTION.unpack_from(self._data, sections_offset + i * SECTION.size)
+            self.sections[self.string(name)] = (first, count)
+
+    def string(self, offset):
+        """Return the string at an offset in the string table (None for NO_STRING)"""
+        if offset == NO_STRING:
+            return None
+        start = self._strings_offset + offset
+        (length,) = struct.unpack_from("<I", self._data, start)
+        return self._data[start + 4:start + 4 + length].decode("utf-8")
+
+    def record(self, index):
+        """Decode one record into a dict"""
+        if not 0 <= index < self.record_count:
+            raise IndexError(index)
+        values = RECORD.unpack_from(self._data, self._records_offset + index * RECORD.size)
+        count = len(STRING_FIELDS)
+        record = {field: self.string(offset) for field, offset in zip(STRING_FIELDS, values[:count])}
+        thumbnail_width, thumbnail_height, section_index, flags, _ = values[count:count + 5]
+        record["systems"] = record["systems"].split(SYSTEMS_SEPARATOR) if record["systems"] is not None else None
+        record["thumbnail_size"] = (thumbnail_width, thumbnail_height) if record["thumbnail"] else None
+        record["section"] = list(self.sections)[section_index]
+
+        position = count + 5
+        accents = values[position:position + ACCENT_COUNT]
+        position += ACCENT_COUNT
+        record["accent_colors"] = None
+        if flags & FLAG_ACCENTS:
+            record["accent_colors"] = {f"color{i + 1}": format_color(color) for i, color in enumerate(accents)}
+
+        record["led_settings"] = None
+        if flags & FLAG_LEDS:
+            zones = [values[position + i * 7:position + (i + 1) * 7] for i in range(len(LED_ZONES))]
+            record["led_settings"] = led_settings(zones)
+        return record
+
+    def entries(self, section):
+        """Yield the records of a section in catalog order"""
+        first, count = self.sections.get(section, (0, 0))
+        for index in range(first, first + count):
+            yield self.record(index)
+
+    def close(self):
+        """Release the mapping"""
+        if getattr(self, "_data", None) is not None:
+            self._data.close()
+            self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _color_matches(decoded, raw):
+    """Compare a decoded "0xRRGGBB" color with the value written in the manifest"""
+    if raw in (None, ""):
+        return decoded == ""
+    try:
+        return decoded != "" and int(decoded, 16) == int(raw, 16)
+    except (TypeError, ValueError):
+        return False
+
+def _verify_manifest(label, record, manifest):
+    """Compare a record's accent colors and LED settings with the raw manifest values"""
+    errors = []
+    manifest = manifest or {}
+
+    accent_colors = manifest.get("accent_colors")
+    if not isinstance(accent_colors, dict) or not accent_colors:
+        if record["accent_colors"] is not None:
+            errors.append(f"{label}.accent_colors: {record['accent_colors']!r} != None")
+    elif record["accent_colors"] is None:
+        errors.append(f"{label}.accent_colors: missing")
+    else:
+        for i in range(1, ACCENT_COUNT + 1):
+            key = f"color{i}"
+            if not _color_matches(record["accent_colors"][key], accent_colors.get(key)):
+                errors.append(f"{label}.accent_colors.{key}: {record['accent_colors'][key]!r} != {accent_colors.get(key)!r}")
+
+    settings = manifest.get("led_settings")
+    if not isinstance(settings, dict) or not settings:
+        if record["led_settings"] is not None:
+            errors.append(f"{label}.led_settings: {record['led_settings']!r} != None")
+        return errors
+    if record["led_settings"] is None:
+        errors.append(f"{label}.led_settings: missing")
+        return errors
+    for zone_name in LED_ZONES:
+        zone = settings.get(zone_name)
+        decoded = record["led_settings"].get(zone_name) or {}
+        if not isinstance(zone, dict):
+            if decoded:
+                errors.append(f"{label}.led_settings.{zone_name}: {decoded!r} != None")
+            continue
+        for field in LED_FIELDS:
+            value = zone.get(field)
+            expected = value if isinstance(value, int) and not isinstance(value, bool) else None
+            if decoded.get(field) != expected:
+                errors.append(f"{label}.led_settings.{zone_name}.{field}: {decoded.get(field)!r} != {value!r}")
+        for field in ("color1", "color2"):
+            if not _color_matches(decoded.get(field, ""), zone.get(field)):
+                errors.append(f"{label}.led_settings.{zone_name}.{field}: {decoded.get(field)!r} != {zone.get(field)!r}")
+    return errors
+
+def verify(catalog, repo_root, path):
+    """Check a binary catalog against the JSON catalog and the raw manifests; returns a list of mismatches"""
+    errors = []
+    with CatalogReader(path) as reader:
+        if reader.last_updated != catalog.last_updated:
+            errors.append(f"last_updated: {reader.last_updated!r} != {catalog.last_updated!r}")
+        if list(reader.sections) != list(catalog.sections):
+            errors.append(f"sections: {list(reader.sections)} != {list(catalog.sections)}")
+
+        for key, items in catalog.sections.items():
+            records = list(reader.entries(key))
+            if len(records) != len(items):
+                errors.append(f"{key}: {len(records)} record(s) != {len(items)} entries")
+                continue
+            for record, (name, entry) in zip(records, items.items()):
+                label = f"{key}/{name}"
+                expected = dict(entry, name=name)
+                for field in STRING_FIELDS:
+                    if field in ("systems", "thumbnail"):
+                        continue
+                    if record[field] != expected.get(field):
+                        errors.append(f"{label}.{field}: {record[field]!r} != {expected.get(field)!r}")
+                if record["systems"] != entry.get("systems"):
+                    errors.append(f"{label}.systems: {record['systems']!r} != {entry.get('systems')!r}")
+                thumbnail = smallest_thumbnail(entry)
+                if record["thumbnail"] != (thumbnail["path"] if thumbnail else None):
+                    errors.append(f"{label}.thumbnail: {record['thumbnail']!r}")
+                errors += _verify_manifest(label, record, load_manifest(repo_root, entry))
+    return errors
+
+def main(argv=None):
+    """Export catalog.json to catalog.bin, or verify an existing export"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Export the catalog in the compact binary format")
+    parser.add_argument("--catalog", default=str(repo_root / "Catalog" / "catalog.json"))
+    parser.add_argument("--output", default=None, help="Binary catalog path (default: catalog.bin next to the JSON)")
+    parser.add_argument("--verify", action="store_true", help="Round-trip check the binary file against the JSON")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog.load(args.catalog)
+    output = Path(args.output) if args.output else Path(args.catalog).with_suffix(".bin")
+
+    if not args.verify:
+        written = export(catalog, repo_root, output)
+        print(f"{'Wrote' if written else 'Unchanged'} {output} ({output.stat().st_size} bytes)")
+
+    try:
+        errors = verify(catalog, repo_root, output)
+    except (OSError, CatalogBinaryError) as e:
+        print(f"Error: {e}")
+        return False
+    for error in errors:
+        print(f"Error: {error}")
+    if not errors:
+        print(f"Verified {output} against {args.catalog}")
+    return not errors
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Append-only change feed for the catalog (Catalog/changes.jsonl).
+
+Every add, update or removal of a catalog entry is appended as one JSON line
+with a monotonic sequence number, the entry's section, name and type, and the
+SHA-256 of the new entry. Fields only ingest reads (the source fingerprint) are
+left out of that hash, so refreshing them is not a change. A device that last synced at sequence N only needs
+the lines after N to know which entries (and shards) to refetch.
+
+Compaction keeps only the newest record per entry, so the log stays as small
+as the catalog while every client that synced before still gets a correct delta.
+Removal records can optionally be dropped below a sequence number; clients
+older than that (the log's min_sequence) must do a full sync.
+
+Run directly to print the delta since a sequence number or to compact the log.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+# Compact automatically once the log holds this many times more records than live entries
+COMPACT_RATIO = 4
+
+# ... but never for logs smaller than this
+COMPACT_MIN_RECORDS = 1000
+
+# Entry fields only ingest reads; they are not part of the entry hash clients sync on
+INGEST_FIELDS = ("source",)
+
+
+def entry_hash(entry):
+    """Return the SHA-256 of an entry's canonical JSON form, without its ingest-only fields"""
+    entry = {key: value for key, value in entry.items() if key not in INGEST_FIELDS}
+    data = json.dumps(entry, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ChangeLog:
+    """JSON-lines change feed with sequence numbers and compaction"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._last_sequence = None
+        self._records = None
+
+    def exists(self):
+        """Return True if the log file exists"""
+        return self.path.exists()
+
+    def read(self):
+        """Return every record in the log, in sequence order"""
+        records = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        print(f"Warning: skipping malformed line in {self.path}")
+        except FileNotFoundError:
+            pass
+        return records
+
+    def last_sequence(self):
+        """Return the sequence number of the newest record (0 for an empty log), reading only the tail"""
+        if self._last_sequence is not None:
+            return self._last_sequence
+
+        self._last_sequence = 0
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                block = 4096
+                while end > 0:
+                    start = max(0, end - block)
+                    f.seek(start)
+                    lines = f.read(end - start).splitlines()
+                    # The first line of a partial block may be cut off, unless we reached the start
+                    candidates = lines if start == 0 else lines[1:]
+                    for line in reversed(candidates):
+                        try:
+                            self._last_sequence = json.loads(line)["seq"]
+                            return self._last_sequence
+                        except (ValueError, KeyError):
+                            continue
+                    if start == 0:
+                        break
+                    block *= 2
+        except FileNotFoundError:
+            pass
+        return self._last_sequence
+
+    def record_count(self):
+        """Return the number of records in the log"""
+        if self._records is None:
+            self._records = len(self.read())
+        return self._records
+
+    def append(self, changes, timestamp):
+        """Append (op, section, name, type, sha256) changes; returns the new last sequence number"""
+        if not changes:
+            return self.last_sequence()
+
+        sequence = self.last_sequence()
+        lines = []
+        for op, section, name, component_type, sha256 in changes:
+            sequence += 1
+            record = OrderedDict([
+                ("seq", sequence),
+                ("op", op),
+                ("section", section),
+                ("type", component_type),
+                ("name", name),
+                ("sha256", sha256),
+                ("time", timestamp)
+            ])
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._last_sequence = sequence
+        if self._records is not None:
+            self._records += len(lines)
+        return sequence
+
+    def since(self, sequence):
+        """Return the records newer than a sequence number"""
+        return [record for record in self.read() if record["seq"] > sequence]
+
+    def needs_compaction(self, live_entries):
+        """Return True when the log has grown well past the number of live entries"""
+        records = self.record_count()
+        return records >= COMPACT_MIN_RECORDS and records > COMPACT_RATIO * max(1, live_entries)
+
+    def compact(self, drop_removed_before=None):
+        """
+        Keep only the newest record per entry (optionally dropping removals older than a
+        sequence number); returns (records before, records after).
+        """
+        from catalog import write_atomic
+
+        records = self.read()
+        latest = {}
+        for record in records:
+            latest[(record["section"], record["name"])] = record
+
+        kept = sorted(latest.values(), key=lambda record: record["seq"])
+        if drop_removed_before is not None:
+            kept = [record for record in kept if not (record["op"] == "remove" and record["seq"] < drop_removed_before)]
+
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in kept)
+        write_atomic(self.path, data.encode("utf-8"))
+        self._records = len(kept)
+        return len(records), len(kept)
+
+
+def main(argv=None):
+    """Print the catalog changes since a sequence number, or compact the change log"""
+    from catalog import Catalog
+
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Inspect or compact the catalog change feed")
+    parser.add_argument("--catalog", default=str(repo_root / "Catalog" / "catalog.json"))
+    parser.add_argument("--since", type=int, default=None, help="Print the records after this sequence number")
+    parser.add_argument("--compact", action="store_true", help="Keep only the newest record per entry")
+    parser.add_argument("--drop-removed-before", type=int, default=None,
+                        help="When compacting, also drop removal records older than this sequence number")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog.load(args.catalog)
+    if args.compact:
+        before, after = catalog.compact_changes(args.drop_removed_before)
+        print(f"Compacted {catalog.change_log.path}: {before} -> {after} record(s)")
+    if args.since is not None:
+        for record in catalog.change_log.since(args.since):
+            print(json.dumps(record, ensure_ascii=False))
+    if not args.compact and args.since is None:
+        print(f"{catalog.change_log.path}: {catalog.change_log.record_count()} record(s), "
+              f"last sequence {catalog.change_log.last_sequence()}")
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Streaming download client for URL submissions.
+
+Downloads are streamed in chunks to <dest>.part while being hashed, resumed with
+Range requests when a retry happens mid-transfer, capped at a maximum size and
+renamed into place once complete. ETag/Last-Modified validators are cached on
+disk per URL, so re-submitting an unchanged URL costs a single 304 response.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import http.client
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Read size for streaming responses
+CHUNK_SIZE = 1024 * 1024
+
+# Defaults for URL submissions
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024  # 1 GiB
+DEFAULT_TIMEOUT = 60
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 2.0
+
+USER_AGENT = "NextUI-Themes-Ingest/1.0 (+https://github.com/Leviathanium/NextUI-Themes)"
+
+# HTTP statuses worth retrying; any other 4xx fails immediately
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """Raised when a download fails permanently"""
+
+
+def _cache_path(cache_dir, url):
+    """Return the validator cache file for a URL"""
+    return Path(cache_dir) / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+def load_cache_entry(cache_dir, url):
+    """Return the cached validators for a URL, or None"""
+    if not cache_dir:
+        return None
+    path = _cache_path(cache_dir, url)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_cache_entry(cache_dir, url, entry):
+    """Store the validators for a URL"""
+    if not cache_dir:
+        return
+    path = _cache_path(cache_dir, url)
+    os.makedirs(path.parent, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(temp_path, path)
+
+def _sha256_of(path):
+    """Return (sha256, size) of a file"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def _cached_copy_is_valid(entry, dest):
+    """Check that dest still holds exactly the bytes the cache entry describes"""
+    if not entry or not os.path.isfile(dest):
+        return False
+    if os.path.getsize(dest) != entry.get("size"):
+        return False
+    return _sha256_of(dest)[0] == entry.get("sha256")
+
+def _content_length(response, offset):
+    """Return the full size announced by a response (accounting for a resumed range), or None"""
+    content_range = response.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length) + offset
+    return None
+
+def download(url, dest, cache_dir=None, max_size=DEFAULT_MAX_SIZE, timeout=DEFAULT_TIMEOUT,
+             retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """
+    Download url to dest, returning a dict with path, sha256, size, etag, last_modified
+    and status ("downloaded" or "not_modified"). Raises DownloadError on failure.
+    """
+    dest = Path(dest)
+    part_path = Path(f"{dest}.part")
+    os.makedirs(dest.parent, exist_ok=True)
+
+    # Conditional GET when we still hold the exact bytes from the last download
+    cached = load_cache_entry(cache_dir, url)
+    if not _cached_copy_is_valid(cached, dest):
+        cached = None
+
+    # Never resume a .part left behind by an earlier run: its validator is unknown
+    if part_path.exists():
+        part_path.unlink()
+
+    digest = hashlib.sha256()
+    offset = 0
+    validator = None  # ETag/Last-Modified of the response that started the .part file
+    attempt = 0
+
+    while True:
+        attempt += 1
+        headers = {"User-Agent": USER_AGENT}
+        if offset and validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        elif cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                status = response.status
+                if status == 206 and offset:
+                    mode = "ab"
+                else:
+                    # Server ignored the range (or this is the first attempt): start over
+                    mode = "wb"
+                    offset = 0
+                    digest = hashlib.sha256()
+
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if mode == "wb":
+                    validator = etag if etag and not etag.startswith("W/") else last_modified
+
+                total = _content_length(response, offset)
+                if total is not None and total > max_size:
+                    raise DownloadError(f"{url} is {total} bytes, over the {max_size} byte limit")
+
+                with open(part_path, mode) as f:
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        offset += len(chunk)
+                        if offset > max_size:
+                            raise DownloadError(f"{url} exceeded the {max_size} byte limit")
+                        digest.update(chunk)
+                        f.write(chunk)
+
+                if total is not None and offset < total:
+                    raise ConnectionError(f"connection closed after {offset} of {total} bytes")
+            break
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached:
+                print(f"Not modified since last download: {url}")
+                return dict(cached, path=str(dest), status="not_modified")
+            if e.code == 416 and offset and attempt <= retries:
+                # Range no longer satisfiable: restart from scratch
+                offset = 0
+                validator = None
+            elif e.code not in RETRY_STATUSES or attempt > retries:
+                _discard(part_path)
+                raise DownloadError(f"HTTP {e.code} downloading {url}") from e
+        except DownloadError:
+            _discard(part_path)
+            raise
+        except (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError, OSError) as e:
+            if attempt > retries:
+                _discard(part_path)
+                raise DownloadError(f"Failed to download {url}: {e}") from e
+
+        delay = backoff * (2 ** (attempt - 1))
+        print(f"Download interrupted at {offset} bytes, retrying in {delay:.1f}s (attempt {attempt + 1}/{retries + 1})")
+        time.sleep(delay)
+
+    os.replace(part_path, dest)
+    result = {
+        "url": url,
+        "sha256": digest.hexdigest(),
+        "size": offset,
+        "etag": etag,
+        "last_modified": last_modified
+    }
+    save_cache_entry(cache_dir, url, result)
+    print(f"Download complete: {offset} bytes")
+    return dict(result, path=str(dest), status="downloaded")
+
+def check_not_modified(url, etag=None, last_modified=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Ask the server (with a conditional HEAD request) whether url changed since the given
+    validators, without downloading it. Returns True if it is unchanged, False if it
+    changed, and None when it cannot tell (no validators, or the request failed).
+    """
+    if not etag and not last_modified:
+        return None
+
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        request = urllib.request.Request(url, headers=headers, method="HEAD")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            # Some servers ignore conditional headers on HEAD; compare the validators ourselves
+            if etag and response.headers.get("ETag") == etag:
+                return True
+            if not etag and last_modified and response.headers.get("Last-Modified") == last_modified:
+                return True
+            return False
+    except urllib.error.HTTPError as e:
+        return True if e.code == 304 else None
+    except (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError, OSError):
+        return None
+
+def _discard(path):
+    """Remove a partial download if present"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def main(argv=None):
+    """Download a single URL (useful for checking hosting services by hand)"""
+    parser = argparse.ArgumentParser(description="Download a file with resume, size caps and conditional GET caching")
+    parser.add_argument("url")
+    parser.add_argument("dest")
+    parser.add_argument("--cache-dir", default=None, help="Directory for the ETag/Last-Modified cache")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE, help="Maximum size in bytes")
+    args = parser.parse_args(argv)
+
+    try:
+        result = download(args.url, args.dest, cache_dir=args.cache_dir, max_size=args.max_size)
+    except DownloadError as e:
+        print(f"Error: {e}")
+        return False
+    print(json.dumps(result, indent=2))
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Concurrent fetch stage for URL and repository submissions.
+
+All fetches are started up front on an asyncio event loop, limited by a
+global semaphore and a per-host semaphore (so one slow or rate-limiting host
+cannot take every slot). The downloads and git fetches themselves are
+blocking calls, so each runs on a thread of a dedicated pool while the loop
+only schedules them. As soon as a fetch lands, its callback is invoked so the
+caller can hand it to packaging while the other fetches are still running.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Fetches running at the same time, across all hosts
+DEFAULT_MAX_CONCURRENT = 8
+
+# Fetches running at the same time against one host
+DEFAULT_PER_HOST = 4
+
+
+def host_key(url):
+    """Return the host a URL is fetched from ("local" for file:// URLs and paths)"""
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "file"):
+        return "local"
+    return (parsed.hostname or parsed.netloc or url).lower()
+
+async def _fetch_all(jobs, fetch, on_fetched, max_concurrent, per_host):
+    """Run every (key, url) job under the limits, calling on_fetched(key, result, error) as each finishes"""
+    loop = asyncio.get_running_loop()
+    overall = asyncio.Semaphore(max_concurrent)
+    hosts = {}
+
+    with ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="fetch") as executor:
+        async def run_job(key, url):
+            host = hosts.setdefault(host_key(url), asyncio.Semaphore(per_host))
+            # Wait for the host first, so jobs queued behind a busy host don't hold global slots
+            async with host:
+                async with overall:
+                    try:
+                        result = await loop.run_in_executor(executor, fetch, key)
+                        error = None
+                    except Exception as e:
+                        result = None
+                        error = e
+            on_fetched(key, result, error)
+
+        await asyncio.gather(*(run_job(key, url) for key, url in jobs))
+
+def run_fetches(jobs, fetch, on_fetched, max_concurrent=DEFAULT_MAX_CONCURRENT, per_host=DEFAULT_PER_HOST):
+    """
+    Fetch every (key, url) job with fetch(key), at most max_concurrent at once and per_host
+    per host. on_fetched(key, result, error) is called from the event loop thread as soon as
+    each fetch finishes (error is the exception, or None). Blocks until all are done.
+    """
+    if not jobs:
+        return
+    asyncio.run(_fetch_all(jobs, fetch, on_fetched, max(1, max_concurrent), max(1, per_host)))
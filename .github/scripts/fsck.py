@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Consistency check of catalog.json against Packages/, Catalog/ and Catalog/.metadata.
+
+The tree is walked once with os.scandir and every file is classified against
+the catalog and the ownership registry:
+
+- every catalog entry is cross-checked: its package zip, extracted directory
+  (with manifest.json and preview.png), preview, manifest and thumbnails must
+  exist, and its registered files must still be there with the recorded size
+  (and, with --hashes, the recorded SHA-256)
+- every package zip is read in a process pool to verify each entry's CRC-32
+  and that the package carries a manifest and a preview
+- files no entry owns are reported as orphans, and OS/editor leftovers
+  (.DS_Store, .bak, temp files, __MACOSX) as junk; --gc deletes both
+
+The result is written as a JSON report (--report).
+"""
+
+import os
+import sys
+import json
+import zlib
+import shutil
+import zipfile
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from blobstore import file_sha256, format_bytes
+from catalog import Catalog, SECTION_TYPES, utc_timestamp
+from ownership import OwnershipRegistry, entry_key, remove_empty_dirs
+from package_index import PackageIndex, PackageIndexError
+from process_push import CATALOG_DIR_MAPPINGS
+
+REPORT_VERSION = 1
+
+# Read size when verifying CRCs
+CHUNK_SIZE = 1024 * 1024
+
+# Files the tools themselves keep in Catalog/
+KNOWN_FILES = {
+    "Catalog/catalog.json",
+    "Catalog/catalog.bin",
+    "Catalog/changes.jsonl",
+    "Catalog/.metadata/README.md",
+    "Catalog/.metadata/registry.json",
+    "Catalog/.metadata/image_hashes.json",
+    "Catalog/.metadata/colors.json"
+}
+KNOWN_PREFIXES = ("Catalog/shards/",)
+
+# Leftovers from operating systems, editors and interrupted writes
+JUNK_NAMES = {".DS_Store", "Thumbs.db", "desktop.ini", "Desktop.ini", ".directory"}
+JUNK_PREFIXES = ("._",)
+JUNK_SUFFIXES = (".bak", ".orig", ".tmp", ".part", ".swp", "~")
+JUNK_DIRS = {"__MACOSX"}
+
+# .metadata subdirectories whose files each belong to a catalog entry
+METADATA_SUBDIRS = {"previews", "manifests", "thumbnails"}
+
+
+def is_junk(name):
+    """Check whether a file name is an OS/editor leftover"""
+    return name in JUNK_NAMES or name.startswith(JUNK_PREFIXES) or name.endswith(JUNK_SUFFIXES)
+
+def scan_tree(root, top_dirs):
+    """
+    Walk the given top-level directories once with os.scandir. Returns ({relative path: size}
+    for every file, [relative paths of junk directories]); junk directories are not entered.
+    """
+    files = {}
+    junk_dirs = []
+    prefix_length = len(str(root)) + 1
+    stack = [str(root / top_dir) for top_dir in top_dirs if (root / top_dir).is_dir()]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                rel_path = entry.path[prefix_length:].replace(os.sep, "/")
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in JUNK_DIRS:
+                        junk_dirs.append(rel_path)
+                    else:
+                        stack.append(entry.path)
+                else:
+                    files[rel_path] = entry.stat(follow_symlinks=False).st_size
+    return files, junk_dirs
+
+def check_package(path):
+    """Verify every CRC-32 of a package zip and that it has a manifest and preview (runs in a worker process)"""
+    try:
+        with PackageIndex.open(path) as index:
+            errors = index.validate()
+            for entry in index.entries:
+                # zipfile checks the CRC once an entry has been read to its end
+                with index.open_entry(entry) as f:
+                    while f.read(CHUNK_SIZE):
+                        pass
+    except (PackageIndexError, zipfile.BadZipFile, EOFError, OSError, zlib.error) as e:
+        errors = [str(e)]
+    return errors
+
+def expected_paths(section, name, entry):
+    """Return (package path, extraction directory, metadata paths) a catalog entry should have"""
+    component_type = SECTION_TYPES[section]
+    package_path = f"Packages/{component_type}s/{name}.zip"
+    extract_dir = f"Catalog/{CATALOG_DIR_MAPPINGS[component_type]}/{name}"
+    metadata = [entry.get("preview_path"), entry.get("manifest_path")]
+    metadata += [thumbnail["path"] for thumbnail in entry.get("thumbnails", [])]
+    return package_path, extract_dir, [path for path in metadata if path]
+
+
+class Fsck:
+    """One check of a repository tree, producing a JSON-serializable report"""
+
+    def __init__(self, root, catalog, registry, workers=None, hashes=False):
+        self.root = Path(root)
+        self.catalog = catalog
+        self.registry = registry
+        self.workers = workers
+        self.hashes = hashes
+        self.problems = []
+        self.orphans = []
+        self.junk = []
+        self.unrecognized = []
+
+    def problem(self, check, path, message, entry=None):
+        """Record a problem found by a check"""
+        self.problems.append(OrderedDict([("check", check), ("entry", entry), ("path", path), ("message", message)]))
+
+    def run(self):
+        """Scan the tree, run every check and return the report"""
+        files, junk_dirs = scan_tree(self.root, ["Packages", "Catalog"])
+
+        # Paths each catalog entry claims, from the catalog itself and from the registry
+        claimed = {}  # relative path -> entry key
+        entry_dirs = {}  # extraction directory -> entry key
+        registered = set()
+        unregistered = []
+        for section, items in self.catalog.sections.items():
+            if section not in SECTION_TYPES:
+                continue
+            for name, entry in items.items():
+                key = entry_key(section, name)
+                package_path, extract_dir, metadata = expected_paths(section, name, entry)
+                entry_dirs[extract_dir] = key
+                for path in [package_path] + metadata:
+                    claimed[path] = key
+                owned = self.registry.files(section, name)
+                if owned is None:
+                    unregistered.append(key)
+                else:
+                    registered.add(key)
+                    for path in owned:
+                        claimed[path] = key
+                self.check_entry(key, files, package_path, extract_dir, metadata, owned)
+
+        stale_registrations = [key for key in self.registry.entries if key not in registered]
+        self.classify(files, junk_dirs, claimed, entry_dirs, registered)
+
+        # Orphaned zips are garbage whatever their contents, so only claimed packages are verified
+        zips = sorted(path for path in files if path.startswith("Packages/") and path.endswith(".zip") and path in claimed)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            paths = [str(self.root / path) for path in zips]
+            for path, errors in zip(zips, executor.map(check_package, paths, chunksize=4)):
+                for error in errors:
+                    self.problem("package", path, error, claimed[path])
+            if self.hashes:
+                self.check_hashes(executor, files)
+
+        return OrderedDict([
+            ("version", REPORT_VERSION),
+            ("checked_at", utc_timestamp()),
+            ("root", str(self.root)),
+            ("summary", OrderedDict([
+                ("files", len(files)),
+                ("bytes", sum(files.values())),
+                ("entries", len(entry_dirs)),
+                ("packages", len(zips)),
+                ("problems", len(self.problems)),
+                ("orphans", len(self.orphans)),
+                ("orphan_bytes", sum(item["size"] for item in self.orphans)),
+                ("junk", len(self.junk)),
+                ("unrecognized", len(self.unrecognized))
+            ])),
+            ("problems", self.problems),
+            ("orphans", self.orphans),
+            ("junk", self.junk),
+            ("unrecognized", self.unrecognized),
+            ("registry", OrderedDict([("unregistered", unregistered), ("stale", stale_registrations)])),
+            ("removed", [])
+        ])
+
+    def check_entry(self, key, files, package_path, extract_dir, metadata, owned):
+        """Cross-check one catalog entry against the scanned files"""
+        for path in metadata:
+            if path not in files:
+                self.problem("entry", path, "referenced file is missing", key)
+        if package_path not in files:
+            self.problem("entry", package_path, "package zip is missing", key)
+        for required in ("manifest.json", "preview.png"):
+            path = f"{extract_dir}/{required}"
+            if path not in files:
+                self.problem("entry", path, "extracted package has no " + required, key)
+        for path, record in (owned or {}).items():
+            if path not in files:
+                self.problem("registry", path, "registered file is missing", key)
+            elif files[path] != record["size"]:
+                self.problem("registry", path, f"size is {files[path]}, registered as {record['size']}", key)
+
+    def classify(self, files, junk_dirs, claimed, entry_dirs, registered):
+        """Sort every file nobody claims into orphans, junk and unrecognized files"""
+        orphan_dirs = OrderedDict()
+        for path in sorted(files):
+            if path in claimed or path in KNOWN_FILES or path.startswith(KNOWN_PREFIXES):
+                continue
+            size = files[path]
+            parts = path.split("/")
+            if is_junk(parts[-1]):
+                self.junk.append(OrderedDict([("path", path), ("kind", "file"), ("size", size)]))
+            elif parts[0] == "Catalog" and len(parts) > 3 and parts[1] in CATALOG_DIR_MAPPINGS.values():
+                directory = "/".join(parts[:3])
+                key = entry_dirs.get(directory)
+                if key is None:
+                    orphan_dirs[directory] = orphan_dirs.get(directory, 0) + size
+                elif key in registered:
+                    self.orphan(path, "file", size, f"inside {directory} but not owned by {key}")
+                # Files in the directory of an unregistered entry cannot be told apart; leave them
+            elif parts[0] == "Packages" and len(parts) == 3 and parts[-1].endswith(".zip"):
+                self.orphan(path, "file", size, "package with no catalog entry")
+            elif path.startswith("Catalog/.metadata/") and len(parts) == 4 and parts[2] in METADATA_SUBDIRS:
+                self.orphan(path, "file", size, "metadata file with no catalog entry")
+            else:
+                self.unrecognized.append(OrderedDict([("path", path), ("size", size)]))
+
+        for directory, size in orphan_dirs.items():
+            self.orphan(directory, "directory", size, "extracted directory with no catalog entry")
+        for directory in junk_dirs:
+            self.junk.append(OrderedDict([("path", directory), ("kind", "directory"), ("size", 0)]))
+
+    def orphan(self, path, kind, size, reason):
+        """Record a file or directory no catalog entry owns"""
+        self.orphans.append(OrderedDict([("path", path), ("kind", kind), ("size", size), ("reason", reason)]))
+
+    def check_hashes(self, executor, files):
+        """Compare registered files against their recorded SHA-256, hashing in the process pool"""
+        records = [(key, path, record) for key, entry in self.registry.entries.items()
+                   for path, record in entry["files"].items() if files.get(path) == record["size"]]
+        paths = [str(self.root / path) for _, path, _ in records]
+        for (key, path, record), sha256 in zip(records, executor.map(file_sha256, paths, chunksize=16)):
+            if sha256 != record["sha256"]:
+                self.problem("registry", path, "contents differ from the registered SHA-256", key)
+
+
+def collect_garbage(root, report, registry):
+    """Delete the orphans and junk of a report and forget stale registrations; returns the paths removed"""
+    removed = []
+    for item in report["orphans"] + report["junk"]:
+        path = root / item["path"]
+        try:
+            if item["kind"] == "directory":
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            print(f"Warning: Could not remove {path}: {e}")
+            continue
+        removed.append(item["path"])
+        remove_empty_dirs(path.parent, root / item["path"].split("/")[0])
+
+    for key in report["registry"]["stale"]:
+        section, name = key.split("/", 1)
+        registry.remove(section, name)
+    registry.save()
+    return removed
+
+def main(argv=None):
+    """Check the catalog against the tree, optionally removing orphans and junk"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Check catalog.json against Packages/ and Catalog/ and find orphaned files")
+    parser.add_argument("--root", default=str(repo_root), help="Repository root to check")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used to verify package CRCs (and hashes)")
+    parser.add_argument("--hashes", action="store_true",
+                        help="Also verify the SHA-256 of every registered file")
+    parser.add_argument("--gc", action="store_true",
+                        help="Delete orphaned files and directories and junk files")
+    parser.add_argument("--report", metavar="PATH",
+                        help="Write the JSON report to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    root = Path(args.root).resolve()
+    try:
+        catalog = Catalog.load(root / "Catalog" / "catalog.json")
+    except Exception as e:
+        print(f"Error loading catalog: {e}")
+        return False
+    registry = OwnershipRegistry.load(root / "Catalog" / ".metadata" / "registry.json", root)
+
+    report = Fsck(root, catalog, registry, max(1, args.workers), args.hashes).run()
+    if args.gc:
+        report["removed"] = collect_garbage(root, report, registry)
+
+    if args.report == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        summary = report["summary"]
+        print(f"Checked {summary['entries']} entries, {summary['packages']} packages and "
+              f"{summary['files']} files ({format_bytes(summary['bytes'])})")
+        for problem in report["problems"]:
+            print(f"Error: {problem['path']}: {problem['message']}" +
+                  (f" ({problem['entry']})" if problem["entry"] else ""))
+        print(f"{summary['orphans']} orphan(s) ({format_bytes(summary['orphan_bytes'])}), "
+              f"{summary['junk']} junk file(s), {summary['unrecognized']} unrecognized file(s)")
+        if report["registry"]["unregistered"]:
+            print(f"{len(report['registry']['unregistered'])} entry(ies) not in the ownership registry "
+                  "(run ownership.py --rebuild)")
+        if args.gc:
+            print(f"Removed {len(report['removed'])} orphan/junk path(s)")
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Wrote report to {args.report}")
+
+    return not report["problems"]
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -6,12 +6,12 @@ Simplified gallery generation script that only creates a Featured Themes section
 
 import os
 import glob
-import json
 import re
 import shutil
 from string import Template
 from datetime import datetime
-from urllib.parse import quote
+
+from catalog import Catalog
 
 # Configuration
 REPO_URL = "https://github.com/Leviathanium/NextUI-Themes"
@@ -22,6 +22,9 @@ TEMPLATES_DIR = ".github/templates"
 README_PATH = "README.md"
 FEATURED_COUNT = 20  # Increased from 3 to 6 since this will be our only section
 COLUMNS_PER_ROW = 3
+CARD_IMAGE_WIDTH = 480  # Display width of gallery card images
+SYSTEM_IMAGE_WIDTH = 240  # Display width of overlay system previews
+PREFERRED_THUMBNAIL_FORMAT = "webp"
 README_GALLERY_PATTERN = r"<!-- GALLERY_START -->.*?<!-- GALLERY_END -->"
 
 # Component types
@@ -61,8 +64,7 @@ def load_template(template_name):
 def load_catalog():
     """Load the catalog.json file"""
     try:
-        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return Catalog.load(CATALOG_PATH) if os.path.exists(CATALOG_PATH) else None
     except Exception as e:
         print(f"Error loading catalog: {e}")
         return None
@@ -79,6 +81,14 @@ def format_date(date_str):
     except:
         return date_str
 
+def select_preview(item, display_width):
+    """Return the smallest preview image at least display_width wide (the full preview if none is)"""
+    candidates = [t for t in item.get("thumbnails", []) if t.get("width", 0) >= display_width]
+    if not candidates:
+        return item.get("preview_path", "")
+    best = min(candidates, key=lambda t: (t["width"], t.get("format") != PREFERRED_THUMBNAIL_FORMAT))
+    return best["path"]
+
 def generate_item_card(item, type_key, width=None):
     """Generate a card for a theme or component"""
     item_template = load_template("item_template.md")
@@ -89,7 +99,7 @@ def generate_item_card(item, type_key, width=None):
     updated = format_date(item.get("last_updated", ""))
 
     # URLs
-    preview_url = f"{RAW_URL}/{item.get('preview_path', '')}"
+    preview_url = f"{RAW_URL}/{select_preview(item, CARD_IMAGE_WIDTH)}"
     download_url = item.get("URL", "")
 
     # Update history URL to use new path structure
@@ -151,7 +161,7 @@ def is_valid_item(item):
 def get_valid_themes(catalog):
     """Get valid themes from the catalog, preserving catalog.json order"""
     # Get items as list of (key, value) pairs to preserve order
-    theme_items = list(catalog.get("themes", {}).items())
+    theme_items = catalog.items("themes")
     # Extract only the values (theme objects) while preserving order
     valid_themes = [item[1] for item in theme_items if is_valid_item(item[1])]
     # No sorting - preserve the insertion order from catalog.json
@@ -258,10 +268,10 @@ def generate_component_index(component_type, valid_items):
             content += f"<div align='center'><a href='{download_url}' style='display: inline-block; padding: 10px 20px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 4px;'>Download {overlay_name}</a></div>\n\n"
 
             # Add preview image
-            preview_path = item.get("preview_path", "")
+            preview_path = select_preview(item, CARD_IMAGE_WIDTH)
             if preview_path:
                 preview_url = f"https://github.com/Leviathanium/NextUI-Themes/raw/main/{preview_path}"
-                content += f"<div align='center'><a href='{download_url}'><img src='{preview_url}' width='480px' alt='{overlay_name}'></a></div>\n\n"
+                content += f"<div align='center'><a href='{download_url}'><img src='{preview_url}' width='{CARD_IMAGE_WIDTH}px' alt='{overlay_name}'></a></div>\n\n"
 
             # Show supported systems
             if "systems" in item and item["systems"]:
@@ -296,7 +306,8 @@ def generate_component_index(component_type, valid_items):
                                 content += f"<br/><b>{system}</b>\n"
                             else:
                                 # Fall back to preview image if specific system image not found
-                                content += f"<img src='{preview_url}' width='240px' alt='{overlay_name} for {system}'>\n"
+                                small_preview_url = f"https://github.com/Leviathanium/NextUI-Themes/raw/main/{select_preview(item, SYSTEM_IMAGE_WIDTH)}"
+                                content += f"<img src='{small_preview_url}' width='{SYSTEM_IMAGE_WIDTH}px' alt='{overlay_name} for {system}'>\n"
                                 content += f"<br/><b>{system}</b> (Preview)\n"
 
                             content += "</a>\n</td>\n"
@@ -405,7 +416,7 @@ def main():
         else:
             # For other components, get their valid items
             # Preserve catalog.json order by getting items as list
-            component_items = list(catalog.get("components", {}).get(component_type, {}).items())
+            component_items = catalog.items(component_type)
             # Extract values while preserving order
             valid_items = [item[1] for item in component_items if is_valid_item(item[1])]
             # REMOVED: No sorting by last_updated
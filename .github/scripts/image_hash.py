@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash index of catalog previews and wallpapers (Catalog/.metadata/image_hashes.json).
+
+Every preview and wallpaper PNG gets a 64-bit dHash (brightness gradients of a
+9x8 thumbnail) and a 64-bit pHash (signs of the low frequencies of a 32x32
+DCT), both computed with NumPy. Near-identical images -- the same theme
+resubmitted under a new name, a fork, a theme and an overlay sharing artwork --
+end up a few bits apart, so looking a new submission up against the whole
+catalog is one vectorized XOR and popcount per hash.
+
+The index is keyed by path and remembers each image's SHA-256, so ingest only
+hashes images whose bytes were never seen before. NumPy and Pillow are
+optional: without them no index is kept.
+
+Run directly to rebuild the index from the ownership registry, list
+near-duplicates across entries, or look up an image file.
+"""
+
+import sys
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+from image_index import ImageIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Images are reduced to this size before hashing (a fast first step for large wallpapers)
+PREPARE_SIZE = 256
+
+# Side of the image whose DCT gives the pHash, and of the low-frequency block kept
+PHASH_SIZE = 32
+PHASH_LOW = 8
+
+# Hashes at most this many bits apart (out of 64) count as near-duplicates
+DEFAULT_MAX_DISTANCE = 10
+
+# Rows compared at once when searching the whole index for duplicate pairs
+PAIR_CHUNK = 256
+
+# Set bits of every byte value, for NumPy versions without bitwise_count
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32) if np is not None else None
+
+
+def hashing_available():
+    """Return True when NumPy and Pillow can be imported"""
+    return np is not None and Image is not None
+
+def _dct_matrix(size):
+    """Return the orthonormal DCT-II matrix of the given size"""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+def _pack_bits(bits):
+    """Pack 64 booleans into an int (first bit most significant)"""
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def compute_hashes(path):
+    """Return the (dHash, pHash) of an image as 64-bit ints (runs in a worker process)"""
+    with Image.open(path) as image:
+        gray = image.convert("L")
+    gray.thumbnail((PREPARE_SIZE, PREPARE_SIZE), Image.BILINEAR)
+
+    small = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    dhash = _pack_bits(small[:, 1:] > small[:, :-1])
+
+    pixels = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(PHASH_SIZE)
+    low = (dct @ pixels @ dct.T)[:PHASH_LOW, :PHASH_LOW].ravel()
+    # The DC term only reflects overall brightness, so it is left out of the median
+    phash = _pack_bits(low > np.median(low[1:]))
+    return dhash, phash
+
+def hamming(hashes, value):
+    """Return the bit distance between every hash of a uint64 array and one value"""
+    x = np.bitwise_xor(hashes, np.uint64(value))
+    return _popcount(x)
+
+def _popcount(x):
+    """Count the set bits of each uint64 in an array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int32)
+    return POPCOUNT_TABLE[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+class ImageHashIndex(ImageIndex):
+    """Perceptual hashes of every indexed image, by repository-relative path (values are (dHash, pHash))"""
+
+    compute = staticmethod(compute_hashes)
+
+    def row_fields(self, value):
+        """Store both hashes as 16-digit hex strings"""
+        dhash, phash = value
+        return OrderedDict([("dhash", f"{dhash:016x}"), ("phash", f"{phash:016x}")])
+
+    def row_value(self, row):
+        """Read both hashes back as ints"""
+        return int(row["dhash"], 16), int(row["phash"], 16)
+
+    def arrays(self):
+        """Return (paths, entries, dhashes, phashes), the hashes as uint64 arrays"""
+        if self._arrays is None:
+            paths = list(self.images)
+            rows = list(self.images.values())
+            self._arrays = (
+                paths,
+                [row["entry"] for row in rows],
+                np.array([int(row["dhash"], 16) for row in rows], dtype=np.uint64),
+                np.array([int(row["phash"], 16) for row in rows], dtype=np.uint64)
+            )
+        return self._arrays
+
+    def query(self, dhash, phash, max_distance=DEFAULT_MAX_DISTANCE, exclude_entry=None):
+        """
+        Return (path, entry, dHash distance, pHash distance) for every indexed image within
+        max_distance bits on both hashes, closest first
+        """
+        paths, entries, dhashes, phashes = self.arrays()
+        if not paths:
+            return []
+        d_distance = hamming(dhashes, dhash)
+        p_distance = hamming(phashes, phash)
+        matches = np.nonzero((d_distance <= max_distance) & (p_distance <= max_distance))[0]
+        results = [(paths[i], entries[i], int(d_distance[i]), int(p_distance[i]))
+                   for i in matches if entries[i] != exclude_entry]
+        return sorted(results, key=lambda match: (match[2] + match[3], match[0]))
+
+    def duplicates(self, max_distance=DEFAULT_MAX_DISTANCE):
+        """Return every pair of images of different entries within max_distance bits on both hashes"""
+        paths, entries, dhashes, phashes = self.arrays()
+        entry_ids = np.unique(np.array(entries, dtype=object), return_inverse=True)[1] if paths else None
+        pairs = []
+        for start in range(0, len(paths), PAIR_CHUNK):
+            stop = min(start + PAIR_CHUNK, len(paths))
+            # Compare this block of rows against every later row in one broadcast
+            d_distance = _popcount(dhashes[start:stop, None] ^ dhashes[None, :])
+            p_distance = _popcount(phashes[start:stop, None] ^ phashes[None, :])
+            close = (d_distance <= max_distance) & (p_distance <= max_distance)
+            close &= np.arange(len(paths))[None, :] > np.arange(start, stop)[:, None]
+            close &= entry_ids[start:stop, None] != entry_ids[None, :]
+            for i, j in zip(*np.nonzero(close)):
+                pairs.append((paths[start + i], paths[j], int(d_distance[i, j]), int(p_distance[i, j])))
+        return sorted(pairs, key=lambda pair: (pair[2] + pair[3], pair[0], pair[1]))
+
+
+def report_near_duplicates(index, key, hashes, max_distance=DEFAULT_MAX_DISTANCE):
+    """Print the images of other entries that look like the given ones; returns the matches"""
+    found = []
+    for path, (_, (dhash, phash)) in hashes.items():
+        for match in index.query(dhash, phash, max_distance, exclude_entry=key):
+            found.append((path,) + match)
+            print(f"Warning: {path} looks like {match[0]} from {match[1]} "
+                  f"(dHash distance {match[2]}, pHash distance {match[3]})")
+    return found
+
+
+def main(argv=None):
+    """Rebuild the index, list near-duplicates, or look up an image"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Perceptual-hash index of catalog previews and wallpapers")
+    parser.add_argument("--index", default=str(repo_root / "Catalog" / ".metadata" / "image_hashes.json"))
+    parser.add_argument("--registry", default=str(repo_root / "Catalog" / ".metadata" / "registry.json"))
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Hash the previews and wallpapers of every registered entry")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="List near-duplicate images across different entries")
+    parser.add_argument("--query", metavar="IMAGE", help="List indexed images that look like IMAGE")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="Largest bit distance (of 64, on both hashes) counted as a near-duplicate")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if not hashing_available():
+        print("Error: NumPy and Pillow are required (pip install numpy Pillow)")
+        return False
+
+    index = ImageHashIndex.load(args.index)
+
+    if args.rebuild:
+        from ownership import OwnershipRegistry
+        index.rebuild(OwnershipRegistry.load(args.registry, repo_root), repo_root, args.workers)
+        if index.save():
+            print(f"Saved {index.path}")
+        print(f"{len(index.images)} image(s) indexed")
+
+    if args.duplicates:
+        pairs = index.duplicates(args.max_distance)
+        for first, second, d_distance, p_distance in pairs:
+            print(f"{d_distance:>2} {p_distance:>2}  {first}  ~  {second}")
+        print(f"{len(pairs)} near-duplicate pair(s)")
+
+    if args.query:
+        dhash, phash = compute_hashes(args.query)
+        for path, entry, d_distance, p_distance in index.query(dhash, phash, args.max_distance):
+            print(f"{d_distance:>2} {p_distance:>2}  {path} ({entry})")
+
+    if not (args.rebuild or args.duplicates or args.query):
+        print(index.summary())
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
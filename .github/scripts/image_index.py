@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Shared base of the per-image indexes in Catalog/.metadata (image_hashes.json,
+colors.json).
+
+Each index maps the repository-relative path of every preview and wallpaper
+PNG to the catalog entry that owns it, the image's SHA-256 and the values
+computed from it. Values are reused for any path whose bytes were seen before,
+so ingest only decodes new images; those are computed in a process pool.
+Subclasses provide the computation and how its result is stored in a row.
+"""
+
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from catalog import write_atomic
+
+INDEX_VERSION = 1
+
+# Where previews live; everything else indexed is a wallpaper
+PREVIEW_PREFIX = "Catalog/.metadata/previews/"
+
+
+def is_indexed_image(rel_path):
+    """Check whether a repository-relative path is a preview or wallpaper PNG"""
+    if not rel_path.lower().endswith(".png"):
+        return False
+    if rel_path.startswith(PREVIEW_PREFIX):
+        return True
+    # The extracted preview.png is the same image as the one in .metadata
+    parts = rel_path.split("/")
+    return parts[-1] != "preview.png" and any("wallpaper" in part.lower() for part in parts[:-1])
+
+
+class ImageIndex:
+    """Values computed from every indexed image, by repository-relative path"""
+
+    # Keyword arguments of json.dumps when saving
+    JSON_OPTIONS = {"indent": 1}
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.images = OrderedDict()  # path -> {"entry", "sha256", ...row_fields(value)}
+        self.dirty = False
+        self._by_sha = None
+        self._arrays = None
+
+    @classmethod
+    def load(cls, path):
+        """Load the index, or return an empty one if the file is missing or unreadable"""
+        index = cls(path)
+        try:
+            with open(index.path, "r", encoding="utf-8") as f:
+                index.images = json.load(f, object_pairs_hook=OrderedDict).get("images", OrderedDict())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {index.path}, starting a new index: {e}")
+        return index
+
+    @staticmethod
+    def compute(path):
+        """Compute the value of an image file (runs in a worker process)"""
+        raise NotImplementedError
+
+    def row_fields(self, value):
+        """Return the fields that store a computed value in a row"""
+        raise NotImplementedError
+
+    def row_value(self, row):
+        """Return the computed value stored in a row"""
+        raise NotImplementedError
+
+    def cached(self, sha256):
+        """Return the value of an image already indexed under any path, or None"""
+        if self._by_sha is None:
+            self._by_sha = {row["sha256"]: self.row_value(row) for row in self.images.values()}
+        return self._by_sha.get(sha256)
+
+    def entries(self):
+        """Return the keys of the catalog entries that have indexed images"""
+        return {row["entry"] for row in self.images.values()}
+
+    def set_entry(self, key, values):
+        """Replace the images of a catalog entry with {path: (sha256, value)}"""
+        rows = OrderedDict()
+        for path, (sha256, value) in sorted(values.items()):
+            rows[path] = OrderedDict([("entry", key), ("sha256", sha256)])
+            rows[path].update(self.row_fields(value))
+        current = OrderedDict((path, row) for path, row in self.images.items() if row["entry"] == key)
+        if current == rows:
+            return
+        for path in current:
+            del self.images[path]
+        self.images.update(rows)
+        self.dirty = True
+        self._by_sha = None
+        self._arrays = None
+
+    def remove_entry(self, key):
+        """Drop every image of a catalog entry"""
+        self.set_entry(key, {})
+
+    def index_owned(self, owned, repo_root, executor=None):
+        """
+        Return {path: (sha256, value)} for the indexed images among an entry's owned files
+        ({path: {"size", "sha256"}}), computing in executor only the ones the index has not seen
+        """
+        values = OrderedDict()
+        pending = []
+        for rel_path, record in owned.items():
+            if not is_indexed_image(rel_path):
+                continue
+            cached = self.cached(record["sha256"])
+            if cached is not None:
+                values[rel_path] = (record["sha256"], cached)
+            else:
+                pending.append((rel_path, record["sha256"]))
+
+        paths = [str(Path(repo_root) / rel_path) for rel_path, _ in pending]
+        if executor is not None:
+            futures = [executor.submit(self.compute, path) for path in paths]
+            results = [future.exception() or future.result() for future in futures]
+        else:
+            results = []
+            for path in paths:
+                try:
+                    results.append(self.compute(path))
+                except Exception as e:
+                    results.append(e)
+
+        for (rel_path, sha256), result in zip(pending, results):
+            if isinstance(result, Exception):
+                print(f"Warning: Could not index {rel_path} in {self.path.name}: {result}")
+                continue
+            values[rel_path] = (sha256, result)
+        return values
+
+    def rebuild(self, registry, repo_root, workers=None):
+        """Index the images of every entry in an ownership registry and drop entries it no longer has"""
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for key, entry in registry.entries.items():
+                self.set_entry(key, self.index_owned(entry["files"], repo_root, executor))
+            for key in self.entries() - set(registry.entries):
+                self.remove_entry(key)
+
+    def save(self):
+        """Write the index if it changed; returns True if it was written"""
+        if not self.dirty:
+            return False
+        data = OrderedDict([("version", INDEX_VERSION), ("images", OrderedDict(sorted(self.images.items())))])
+        write_atomic(self.path, json.dumps(data, **self.JSON_OPTIONS).encode("utf-8"))
+        self.dirty = False
+        return True
+
+    def summary(self):
+        """Return a one-line description of the index"""
+        return f"{self.path}: {len(self.images)} image(s) from {len(self.entries())} entry(ies)"
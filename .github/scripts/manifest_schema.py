@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Schema validation for package manifest.json files.
+
+Each component type's schema is compiled once into a tree of small checker
+functions, so validating a manifest is a single walk with no re-parsing of the
+schema. Unknown keys are allowed (newer exporters may add fields); known keys
+must have the right type and shape.
+
+Run directly to validate every manifest in Catalog/.metadata/manifests in
+parallel and write a JSON report.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Accent and LED colors are stored as "0xRRGGBB"
+HEX_COLOR = re.compile(r"^0x[0-9A-Fa-f]{6}$")
+
+# LED zones written by the theme manager
+LED_ZONES = ["f1_key", "f2_key", "top_bar", "lr_triggers"]
+
+# Validators compiled in each batch worker process
+_WORKER_VALIDATORS = None
+
+
+def _type_name(value):
+    """Return the JSON type name of a value for error messages"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    return "object"
+
+def _join(path, key):
+    """Append a key to a dotted error path"""
+    return f"{path}.{key}" if path else key
+
+def string():
+    """Compile a check for a string"""
+    def check(value, path, errors):
+        if not isinstance(value, str):
+            errors.append(f"{path}: expected string, got {_type_name(value)}")
+    return check
+
+def integer(minimum=None):
+    """Compile a check for an integer (booleans are rejected)"""
+    def check(value, path, errors):
+        if not isinstance(value, int) or isinstance(value, bool):
+            errors.append(f"{path}: expected integer, got {_type_name(value)}")
+        elif minimum is not None and value < minimum:
+            errors.append(f"{path}: must be at least {minimum}, got {value}")
+    return check
+
+def boolean():
+    """Compile a check for a boolean"""
+    def check(value, path, errors):
+        if not isinstance(value, bool):
+            errors.append(f"{path}: expected boolean, got {_type_name(value)}")
+    return check
+
+def hex_color(allow_empty=False):
+    """Compile a check for a "0xRRGGBB" color string"""
+    def check(value, path, errors):
+        if allow_empty and value == "":
+            return
+        if not isinstance(value, str) or not HEX_COLOR.match(value):
+            errors.append(f"{path}: expected a color like 0xRRGGBB, got {value!r}")
+    return check
+
+def equals(expected):
+    """Compile a check for a fixed string value"""
+    def check(value, path, errors):
+        if value != expected:
+            errors.append(f"{path}: expected {expected!r}, got {value!r}")
+    return check
+
+def array(item=None):
+    """Compile a check for an array, optionally checking every item"""
+    def check(value, path, errors):
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected array, got {_type_name(value)}")
+        elif item is not None:
+            for i, element in enumerate(value):
+                item(element, f"{path}[{i}]", errors)
+    return check
+
+def obj(required=None, optional=None):
+    """Compile a check for an object with required and optional keys"""
+    required = list((required or {}).items())
+    optional = list((optional or {}).items())
+
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path or 'manifest'}: expected object, got {_type_name(value)}")
+            return
+        for key, child in required:
+            if key not in value:
+                errors.append(f"{_join(path, key)}: missing required key")
+            else:
+                child(value[key], _join(path, key), errors)
+        for key, child in optional:
+            if key in value:
+                child(value[key], _join(path, key), errors)
+    return check
+
+def any_of(*checks):
+    """Compile a check that passes when any of the given checks passes"""
+    def check(value, path, errors):
+        attempts = []
+        for candidate in checks:
+            candidate_errors = []
+            candidate(value, path, candidate_errors)
+            if not candidate_errors:
+                return
+            attempts.append(candidate_errors)
+        errors.extend(min(attempts, key=len))
+    return check
+
+
+def _info_fields():
+    """Fields shared by theme_info and component_info"""
+    return (
+        {"name": string(), "author": string()},
+        {"version": string(), "creation_date": string(), "exported_by": string()}
+    )
+
+def _accent_colors():
+    """Compile the accent_colors check (color1..color6)"""
+    return obj(optional={f"color{i}": hex_color() for i in range(1, 7)})
+
+def _led_settings():
+    """Compile the led_settings check (may be empty when LEDs are not included)"""
+    # Unset LED colors are exported as empty strings
+    zone = obj(optional={
+        "effect": integer(0),
+        "color1": hex_color(allow_empty=True),
+        "color2": hex_color(allow_empty=True),
+        "speed": integer(0),
+        "brightness": integer(0),
+        "trigger": integer(0),
+        "in_brightness": integer(0)
+    })
+    return obj(optional={key: zone for key in LED_ZONES})
+
+def _theme_schema():
+    """Compile the schema for a full .theme manifest"""
+    required, optional = _info_fields()
+    content = obj(optional={
+        "wallpapers": obj(optional={"present": boolean(), "count": integer(0)}),
+        "icons": obj(optional={
+            "present": boolean(),
+            "system_count": integer(0),
+            "tool_count": integer(0),
+            "collection_count": integer(0)
+        }),
+        "overlays": obj(optional={"present": boolean(), "systems": array(string())}),
+        "fonts": obj(optional={"present": boolean(), "og_replaced": boolean(), "next_replaced": boolean()}),
+        "settings": obj(optional={"accents_included": boolean(), "leds_included": boolean()})
+    })
+    return obj(
+        required={"theme_info": obj(required, optional), "content": content},
+        optional={
+            "path_mappings": any_of(obj(), array()),
+            "accent_colors": _accent_colors(),
+            "led_settings": _led_settings()
+        }
+    )
+
+def _component_schema(component_type):
+    """Compile the schema for a single-component manifest"""
+    required, optional = _info_fields()
+    required = dict(required, type=equals(component_type))
+
+    if component_type == "wallpaper":
+        content = obj(optional={
+            "count": integer(0),
+            "system_wallpapers": array(string()),
+            "collection_wallpapers": array(string())
+        })
+    elif component_type == "overlay":
+        content = obj(optional={"systems": array(string())})
+    else:
+        content = obj()
+
+    fields = {"content": content, "path_mappings": any_of(array(), obj())}
+    if component_type == "accent":
+        fields["accent_colors"] = _accent_colors()
+    elif component_type == "led":
+        fields["led_settings"] = _led_settings()
+    return obj(required={"component_info": obj(required, optional)}, optional=fields)
+
+def compile_validators(component_types):
+    """Compile one validator per component type (keys of a type -> extension mapping)"""
+    validators = {}
+    for component_type in component_types:
+        if component_type == "theme":
+            validators[component_type] = _theme_schema()
+        else:
+            validators[component_type] = _component_schema(component_type)
+    return validators
+
+def validate_manifest(validators, manifest, component_type):
+    """Return a list of schema errors for a parsed manifest (empty when valid)"""
+    validator = validators.get(component_type)
+    if validator is None:
+        return [f"no manifest schema for component type {component_type!r}"]
+    errors = []
+    validator(manifest, "", errors)
+    return errors
+
+
+def _init_worker(component_types):
+    """Compile the validators once per batch worker process"""
+    global _WORKER_VALIDATORS
+    _WORKER_VALIDATORS = compile_validators(component_types)
+
+def _validate_file(path, component_type):
+    """Validate a single manifest file in a batch worker"""
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return [f"cannot read manifest: {e}"]
+    return validate_manifest(_WORKER_VALIDATORS, manifest, component_type)
+
+def validate_directory(manifest_dir, component_types, workers=None):
+    """Validate every <name>.<ext>.json manifest in a directory in parallel; returns a report dict"""
+    extension_types = {extension: component_type for component_type, extension in component_types.items()}
+    results = {}
+    jobs = []
+    for path in sorted(Path(manifest_dir).glob("*.json")):
+        extension = os.path.splitext(path.stem)[1]
+        component_type = extension_types.get(extension)
+        if component_type is None:
+            results[path.name] = {"type": None, "errors": [f"unknown component extension {extension!r}"]}
+        else:
+            jobs.append((path, component_type))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(list(component_types),)) as executor:
+            futures = [executor.submit(_validate_file, str(path), component_type) for path, component_type in jobs]
+            for (path, component_type), future in zip(jobs, futures):
+                results[path.name] = {"type": component_type, "errors": future.result()}
+
+    invalid = sum(1 for result in results.values() if result["errors"])
+    return {
+        "checked": len(results),
+        "valid": len(results) - invalid,
+        "invalid": invalid,
+        "manifests": dict(sorted(results.items()))
+    }
+
+def main(argv=None):
+    """Validate every manifest in Catalog/.metadata/manifests"""
+    from process_push import COMPONENT_TYPES, METADATA_DIR
+
+    parser = argparse.ArgumentParser(description="Validate catalog manifests against the per-type schema")
+    parser.add_argument("--manifest-dir", default=str(METADATA_DIR / "manifests"))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = validate_directory(args.manifest_dir, COMPONENT_TYPES, workers=args.workers)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        for name, result in report["manifests"].items():
+            for error in result["errors"]:
+                print(f"Error: {name}: {error}")
+        print(f"Checked {report['checked']} manifest(s): {report['valid']} valid, {report['invalid']} invalid")
+    else:
+        print(json.dumps(report, indent=2))
+    return report["invalid"] == 0
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
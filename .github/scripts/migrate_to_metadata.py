@@ -5,16 +5,22 @@ and update catalog.json references accordingly.
 """
 
 import os
-import json
 import shutil
 from pathlib import Path
 
+from blobstore import BlobStore
+from catalog import Catalog
+
 # Base paths
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
 CATALOG_DIR = REPO_ROOT / "Catalog"
 METADATA_DIR = CATALOG_DIR / ".metadata"
 CATALOG_PATH = CATALOG_DIR / "catalog.json"
 
+# Extracted previews and manifests may already be hardlinked into .metadata, so they are
+# placed through the blob store (never copied onto themselves or written in place)
+BLOB_STORE = BlobStore(Path(os.environ.get("NEXTUI_CACHE_DIR", REPO_ROOT / ".cache")) / "blobs")
+
 # Component types and their directories
 COMPONENT_DIRS = {
     "Themes": ".theme",
@@ -60,15 +66,14 @@ def migrate_previews_and_manifests():
         return
 
     try:
-        with open(CATALOG_PATH, "r") as f:
-            catalog = json.load(f)
+        catalog = Catalog.load(CATALOG_PATH)
     except Exception as e:
         print(f"Error loading catalog.json: {e}")
         return
 
     # Process themes
     migrated_count = 0
-    for theme_name, theme_info in catalog.get("themes", {}).items():
+    for theme_name, theme_info in catalog.items("themes"):
         # Get source paths
         theme_dir = CATALOG_DIR / "Themes" / theme_name
         if not theme_dir.exists():
@@ -86,9 +91,9 @@ def migrate_previews_and_manifests():
         preview_dest = METADATA_DIR / "previews" / f"{theme_name}.png"
         manifest_dest = METADATA_DIR / "manifests" / f"{theme_name}.json"
 
-        # Copy files
-        shutil.copy2(preview_src, preview_dest)
-        shutil.copy2(manifest_src, manifest_dest)
+        # Link files
+        BLOB_STORE.link_file(preview_src, preview_dest)
+        BLOB_STORE.link_file(manifest_src, manifest_dest)
 
         # Update catalog paths
         theme_info["preview_path"] = str(preview_dest.relative_to(REPO_ROOT))
@@ -97,7 +102,10 @@ def migrate_previews_and_manifests():
         migrated_count += 1
 
     # Process components
-    for comp_type, comp_items in catalog.get("components", {}).items():
+    for comp_type, comp_items in catalog.sections.items():
+        if comp_type == "themes":
+            continue
+
         # Find corresponding component directory
         component_dir_name = None
         for dir_name, extension in COMPONENT_DIRS.items():
@@ -127,9 +135,9 @@ def migrate_previews_and_manifests():
             preview_dest = METADATA_DIR / "previews" / f"{comp_name}.png"
             manifest_dest = METADATA_DIR / "manifests" / f"{comp_name}.json"
 
-            # Copy files
-            shutil.copy2(preview_src, preview_dest)
-            shutil.copy2(manifest_src, manifest_dest)
+            # Link files
+            BLOB_STORE.link_file(preview_src, preview_dest)
+            BLOB_STORE.link_file(manifest_src, manifest_dest)
 
             # Update catalog paths
             comp_info["preview_path"] = str(preview_dest.relative_to(REPO_ROOT))
@@ -138,10 +146,11 @@ def migrate_previews_and_manifests():
             migrated_count += 1
 
     # Save updated catalog
+    if migrated_count:
+        catalog.mark_dirty()
     try:
-        with open(CATALOG_PATH, "w") as f:
-            json.dump(catalog, f, indent=2)
-        print(f"Updated catalog.json with new metadata paths")
+        if catalog.save():
+            print(f"Updated catalog.json with new metadata paths")
     except Exception as e:
         print(f"Error saving catalog.json: {e}")
 
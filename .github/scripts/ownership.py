@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Registry of the files each catalog entry owns (Catalog/.metadata/registry.json).
+
+For every entry it records each file the entry put in Packages/, Catalog/ and
+Catalog/.metadata -- the package zip, the extracted files, the preview,
+manifest and thumbnails -- with its size and SHA-256. It is updated when a
+submission is ingested, so cleaning up or replacing an entry is an exact
+lookup instead of guessing paths from URLs and directory names.
+
+Run directly to rebuild the registry from the catalog and the current tree
+(once, for entries ingested before the registry existed), or to show the
+files an entry owns.
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+from blobstore import file_sha256
+from catalog import Catalog, write_atomic
+
+REGISTRY_VERSION = 1
+
+
+def entry_key(section, name):
+    """Return the registry key of a catalog entry"""
+    return f"{section}/{name}"
+
+def file_record(path):
+    """Return the size and SHA-256 of a file"""
+    return OrderedDict([("size", os.path.getsize(path)), ("sha256", file_sha256(path))])
+
+def is_linked_blob(path, record, blob_store):
+    """Check that a file is a hardlink of the stored blob a record names (so its hash is known)"""
+    blob = blob_store.blob_path(record["sha256"])
+    try:
+        return os.path.getsize(path) == record["size"] and os.path.samefile(path, blob)
+    except OSError:
+        return False
+
+
+class OwnershipRegistry:
+    """Maps each catalog entry to the repository-relative files it owns"""
+
+    def __init__(self, path, repo_root):
+        self.path = Path(path)
+        self.repo_root = Path(repo_root)
+        self.entries = OrderedDict()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path, repo_root):
+        """Load the registry, or return an empty one if the file is missing or unreadable"""
+        registry = cls(path, repo_root)
+        try:
+            with open(registry.path, "r", encoding="utf-8") as f:
+                data = json.load(f, object_pairs_hook=OrderedDict)
+            registry.entries = data.get("entries", OrderedDict())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {registry.path}, starting a new registry: {e}")
+        return registry
+
+    def relative(self, path):
+        """Return a path relative to the repository root, as stored in the registry"""
+        return Path(path).resolve().relative_to(self.repo_root.resolve()).as_posix()
+
+    def files(self, section, name):
+        """Return {relative path: record} for an entry, or None if the entry is not registered"""
+        entry = self.entries.get(entry_key(section, name))
+        return entry["files"] if entry is not None else None
+
+    def files_under(self, section, name, directory):
+        """Return the registered files of an entry inside a directory (relative to it), or None"""
+        files = self.files(section, name)
+        if files is None:
+            return None
+        prefix = self.relative(directory) + "/"
+        return {path[len(prefix):] for path in files if path.startswith(prefix)}
+
+    def records_for(self, paths, previous=None, blob_store=None):
+        """
+        Return {relative path: record} for the given files (skipping missing ones). A file still
+        linked to the blob of its previous record keeps that record instead of being hashed again.
+        """
+        previous = previous or {}
+        records = OrderedDict()
+        for path in sorted(set(Path(p) for p in paths)):
+            if not path.is_file():
+                continue
+            rel_path = self.relative(path)
+            record = previous.get(rel_path)
+            if not (record and blob_store is not None and is_linked_blob(path, record, blob_store)):
+                record = file_record(path)
+            records[rel_path] = record
+        return records
+
+    def set(self, section, name, records):
+        """Record the files an entry owns, replacing what it owned before"""
+        key = entry_key(section, name)
+        entry = OrderedDict([("files", records)])
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self.dirty = True
+
+    def remove(self, section, name):
+        """Forget an entry, returning the files it owned (or None)"""
+        entry = self.entries.pop(entry_key(section, name), None)
+        if entry is not None:
+            self.dirty = True
+            return entry["files"]
+        return None
+
+    def owner_of(self):
+        """Return {relative path: entry key} for every registered file"""
+        owners = {}
+        for key, entry in self.entries.items():
+            for path in entry["files"]:
+                owners[path] = key
+        return owners
+
+    def blob_hashes(self):
+        """Return the SHA-256 of every registered file"""
+        return {record["sha256"] for entry in self.entries.values() for record in entry["files"].values()}
+
+    def save(self):
+        """Write the registry if it changed; returns True if it was written"""
+        if not self.dirty:
+            return False
+        data = OrderedDict([
+            ("version", REGISTRY_VERSION),
+            ("entries", OrderedDict(sorted(self.entries.items())))
+        ])
+        write_atomic(self.path, json.dumps(data, indent=2).encode("utf-8"))
+        self.dirty = False
+        return True
+
+
+def remove_owned_files(registry, files, keep_under=None):
+    """
+    Delete registered files (relative paths), except those inside keep_under, then drop
+    directories left empty. Returns the paths removed.
+    """
+    removed = []
+    keep_prefix = registry.relative(keep_under) + "/" if keep_under is not None else None
+    for rel_path in files:
+        if keep_prefix and rel_path.startswith(keep_prefix):
+            continue
+        path = registry.repo_root / rel_path
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed.append(rel_path)
+        remove_empty_dirs(path.parent, registry.repo_root)
+    return removed
+
+def remove_empty_dirs(directory, stop):
+    """Remove directory and its parents while they are empty, never going above stop"""
+    directory = Path(directory)
+    stop = Path(stop)
+    while directory != stop and stop in directory.parents:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return  # Not empty (or already gone)
+        directory = directory.parent
+
+def entry_paths(repo_root, section, name, entry, extract_dir, package_path):
+    """Return every path an entry is expected to own, found from the catalog and the tree"""
+    paths = [package_path]
+    for key in ("preview_path", "manifest_path"):
+        if entry.get(key):
+            paths.append(repo_root / entry[key])
+    paths += [repo_root / thumbnail["path"] for thumbnail in entry.get("thumbnails", [])]
+    if extract_dir.is_dir():
+        for root, _, files in os.walk(extract_dir):
+            paths += [Path(root) / file_name for file_name in files]
+    return paths
+
+
+def main(argv=None):
+    """Rebuild the registry from the catalog, or show the files an entry owns"""
+    from process_push import CATALOG_DIR_MAPPINGS, PACKAGES_DIR, CATALOG_DIR, REPO_ROOT
+    from catalog import SECTION_TYPES
+
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the file ownership registry")
+    parser.add_argument("--catalog", default=str(CATALOG_DIR / "catalog.json"))
+    parser.add_argument("--registry", default=str(CATALOG_DIR / ".metadata" / "registry.json"))
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Register every catalog entry that is not registered yet, from the current tree")
+    parser.add_argument("--show", metavar="NAME", help="Print the files an entry owns")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog.load(args.catalog)
+    registry = OwnershipRegistry.load(args.registry, REPO_ROOT)
+
+    if args.rebuild:
+        added = 0
+        for section, items in catalog.sections.items():
+            component_type = SECTION_TYPES.get(section)
+            if component_type is None:
+                continue
+            for name, entry in items.items():
+                if registry.files(section, name) is not None:
+                    continue
+                extract_dir = CATALOG_DIR / CATALOG_DIR_MAPPINGS[component_type] / name
+                package_path = PACKAGES_DIR / f"{component_type}s" / f"{name}.zip"
+                paths = entry_paths(REPO_ROOT, section, name, entry, extract_dir, package_path)
+                registry.set(section, name, registry.records_for(paths))
+                added += 1
+        registry.save()
+        print(f"Registered {added} entry(ies) in {registry.path}")
+
+    if args.show:
+        found = False
+        for key, entry in registry.entries.items():
+            if key.split("/", 1)[1] == args.show:
+                found = True
+                for path, record in entry["files"].items():
+                    print(f"{record['sha256'][:12]} {record['size']:>10}  {path}")
+        if not found:
+            print(f"Error: {args.show} is not registered")
+            return False
+
+    if not args.rebuild and not args.show:
+        files = sum(len(entry["files"]) for entry in registry.entries.values())
+        print(f"{registry.path}: {len(registry.entries)} entry(ies), {files} file(s)")
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+One-pass index of a package's contents.
+
+A PackageIndex is built from a single read of a zip's central directory (or
+from a git tree listing) and is then shared by validation, extraction and
+metadata extraction, so no stage has to reopen or rescan the archive.
+
+Packages come from untrusted submissions, so an index can be checked against
+PackageLimits (total size, file count, path depth, compression ratio and path
+traversal) using only the central-directory sizes, before anything is written.
+Entries are then streamed through a BoundedReader that aborts as soon as an
+entry produces more bytes than its header declared.
+"""
+
+import sys
+import json
+import mmap
+import zipfile
+import argparse
+import posixpath
+from pathlib import Path
+
+# Files every package must carry at its root
+MANIFEST_NAME = "manifest.json"
+PREVIEW_NAME = "preview.png"
+
+# Top-level files added by Finder and Explorer that don't count when detecting the package root
+JUNK_NAMES = {".DS_Store", "Thumbs.db", "desktop.ini"}
+
+# Default resource limits for a single package
+DEFAULT_MAX_TOTAL_BYTES = 2 * 1024 * 1024 * 1024  # 2 GiB uncompressed
+DEFAULT_MAX_FILES = 10000
+DEFAULT_MAX_DEPTH = 16  # Path components below the package root
+DEFAULT_MAX_RATIO = 200  # Uncompressed / compressed size of one entry
+
+# Largest manifest.json parsed in memory
+MAX_MANIFEST_SIZE = 1024 * 1024
+
+# Entries smaller than this are never rejected for their ratio (tiny text files compress very well)
+RATIO_MIN_SIZE = 1024 * 1024
+
+
+class PackageIndexError(Exception):
+    """Raised when a package cannot be indexed"""
+
+
+class PackageLimitError(PackageIndexError):
+    """Raised when a package exceeds its resource limits while being read"""
+
+
+class PackageLimits:
+    """Resource limits a package must stay within"""
+
+    def __init__(self, max_total_bytes=DEFAULT_MAX_TOTAL_BYTES, max_files=DEFAULT_MAX_FILES,
+                 max_depth=DEFAULT_MAX_DEPTH, max_ratio=DEFAULT_MAX_RATIO):
+        self.max_total_bytes = max_total_bytes
+        self.max_files = max_files
+        self.max_depth = max_depth
+        self.max_ratio = max_ratio
+
+
+class BoundedReader:
+    """File wrapper that raises PackageLimitError once more than `limit` bytes have been read"""
+
+    def __init__(self, source, limit, name):
+        self.source = source
+        self.limit = limit
+        self.name = name
+        self.count = 0
+
+    def read(self, size=-1):
+        # Never ask for more than one byte past the limit, so a bomb is caught without inflating it
+        remaining = self.limit - self.count + 1
+        data = self.source.read(remaining if size is None or size < 0 else min(size, remaining))
+        self.count += len(data)
+        if self.count > self.limit:
+            raise PackageLimitError(f"{self.name} expands past its declared size of {self.limit} bytes")
+        return data
+
+    def close(self):
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _MappedFile(mmap.mmap):
+    """Read-only mapping that zipfile can use as a seekable file"""
+
+    def seekable(self):
+        return True
+
+
+def is_junk_name(name):
+    """Check whether a file name is operating system clutter (Finder/Explorer metadata)"""
+    return name in JUNK_NAMES or name.startswith("._")
+
+def is_safe_path(name):
+    """Check that a normalized path stays inside the directory it is extracted to"""
+    return not (name.startswith("/") or name == ".." or name.startswith("../") or ":" in name.split("/")[0])
+
+def normalize_path(name):
+    """Normalize an archive member name to a clean relative POSIX path (or None for junk/directories)"""
+    name = name.replace("\\", "/")
+    if not name or name.endswith("/"):
+        return None
+    name = posixpath.normpath(name.lstrip("/"))
+    if name in (".", "") or name.split("/")[0] == "__MACOSX":
+        return None
+    return name
+
+
+class PackageEntry:
+    """A single file in a package"""
+
+    __slots__ = ("name", "rel_path", "size", "compressed_size", "crc", "info")
+
+    def __init__(self, name, size, crc=None, compressed_size=None, info=None):
+        self.name = name  # Normalized path inside the archive
+        self.rel_path = name  # Path relative to the detected root (set by PackageIndex)
+        self.size = size
+        self.compressed_size = compressed_size if compressed_size is not None else size
+        self.crc = crc
+        self.info = info  # zipfile.ZipInfo for zip-backed indexes
+
+    def __repr__(self):
+        return f"PackageEntry({self.name!r}, size={self.size})"
+
+
+class PackageIndex:
+    """Normalized listing of a package with its detected root, manifest and preview"""
+
+    def __init__(self, package_name, entries, source=None):
+        self.package_name = str(package_name)
+        self.source = source
+        self.entries = entries
+        self.root = self._detect_root()
+        self.by_rel_path = {}
+        for entry in entries:
+            if self.root and entry.name.startswith(self.root + "/"):
+                entry.rel_path = entry.name[len(self.root) + 1:]
+            self.by_rel_path[entry.rel_path] = entry
+
+        self.manifest_entry = self.by_rel_path.get(MANIFEST_NAME)
+        self.preview_entry = self.by_rel_path.get(PREVIEW_NAME)
+        self.manifest = None
+        self.manifest_error = None
+        self._zip = None
+        self._file = None
+        self._mmap = None
+
+    @classmethod
+    def open(cls, path, package_name=None, use_mmap=True):
+        """Index a zip from a single read of its central directory, parsing the manifest in memory"""
+        path = Path(path)
+        f = open(path, "rb")
+        mapped = None
+        try:
+            if use_mmap:
+                try:
+                    mapped = _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    mapped = None  # Empty files and some filesystems cannot be mapped
+            archive = zipfile.ZipFile(mapped if mapped is not None else f)
+        except (zipfile.BadZipFile, ValueError) as e:
+            # A mapped file shorter than a zip's end record fails its seek with ValueError
+            if mapped is not None:
+                mapped.close()
+            f.close()
+            raise PackageIndexError(f"{path} is not a valid zip file: {e}") from e
+        except BaseException:
+            if mapped is not None:
+                mapped.close()
+            f.close()
+            raise
+
+        entries = []
+        for info in archive.infolist():
+            name = normalize_path(info.filename)
+            if name is None or info.is_dir():
+                continue
+            entries.append(PackageEntry(name, info.file_size, info.CRC, info.compress_size, info))
+
+        index = cls(package_name or path.name, entries, source=path)
+        index._zip = archive
+        index._file = f
+        index._mmap = mapped
+        if index.manifest_entry is not None and index.manifest_entry.size <= MAX_MANIFEST_SIZE:
+            index.load_manifest(index.read(index.manifest_entry))
+        return index
+
+    @classmethod
+    def from_listing(cls, package_name, files):
+        """Index a package from (path, size) pairs, e.g. a git tree listing (no zip, no CRCs)"""
+        entries = []
+        for path, size in files:
+            name = normalize_path(path)
+            if name is not None:
+                entries.append(PackageEntry(name, size))
+        return cls(package_name, entries)
+
+    def _detect_root(self):
+        """Return the single top-level directory that wraps every file, or None"""
+        roots = set()
+        for entry in self.entries:
+            parts = entry.name.split("/", 1)
+            if len(parts) == 1:
+                if is_junk_name(parts[0]):
+                    continue  # A stray .DS_Store next to the wrapping directory doesn't unwrap it
+                return None  # A file at the top level means there is no wrapping directory
+            roots.add(parts[0])
+            if len(roots) > 1:
+                return None
+        root = roots.pop() if roots else None
+
+        # Don't strip the "Systems" directory for overlay components
+        if root == "Systems" and ".over" in self.package_name:
+            return None
+        return root
+
+    def load_manifest(self, data):
+        """Parse manifest bytes into self.manifest (recording the error instead of raising)"""
+        try:
+            self.manifest = json.loads(data.decode("utf-8-sig"))
+            self.manifest_error = None
+        except (UnicodeDecodeError, ValueError) as e:
+            self.manifest = None
+            self.manifest_error = str(e)
+        return self.manifest
+
+    def validate(self):
+        """Return a list of problems with the package's required files (empty when valid)"""
+        errors = []
+        if self.manifest_entry is None:
+            errors.append(f"missing {MANIFEST_NAME}")
+        elif self.manifest_entry.size > MAX_MANIFEST_SIZE:
+            errors.append(f"{MANIFEST_NAME} is {self.manifest_entry.size} bytes, over the {MAX_MANIFEST_SIZE} byte limit")
+        elif self.manifest_error:
+            errors.append(f"{MANIFEST_NAME} is not valid JSON: {self.manifest_error}")
+        if self.preview_entry is None:
+            errors.append(f"missing {PREVIEW_NAME}")
+        return errors
+
+    def check_limits(self, limits):
+        """Return a list of limit violations, from the indexed (central directory) sizes alone"""
+        errors = []
+        if len(self.entries) > limits.max_files:
+            errors.append(f"has {len(self.entries)} files, over the limit of {limits.max_files}")
+        if self.total_size > limits.max_total_bytes:
+            errors.append(f"expands to {self.total_size} bytes, over the limit of {limits.max_total_bytes}")
+
+        for entry in self.entries:
+            if not is_safe_path(entry.name):
+                errors.append(f"{entry.name} points outside the package")
+            elif entry.rel_path.count("/") + 1 > limits.max_depth:
+                errors.append(f"{entry.rel_path} is nested deeper than {limits.max_depth} levels")
+            if entry.size >= RATIO_MIN_SIZE and entry.size > limits.max_ratio * max(1, entry.compressed_size):
+                errors.append(f"{entry.name} has a compression ratio over {limits.max_ratio}:1 "
+                              f"({entry.compressed_size} -> {entry.size} bytes)")
+        return errors
+
+    @property
+    def total_size(self):
+        """Total uncompressed size of all files"""
+        return sum(entry.size for entry in self.entries)
+
+    def open_entry(self, entry):
+        """Open an entry of a zip-backed index for streaming (bounded by its declared size)"""
+        if self._zip is None:
+            raise PackageIndexError(f"{self.package_name} is not backed by a zip file")
+        return BoundedReader(self._zip.open(entry.info), entry.size, entry.name)
+
+    def read(self, entry):
+        """Read an entry of a zip-backed index into memory"""
+        with self.open_entry(entry) as f:
+            return f.read()
+
+    def close(self):
+        """Release the underlying archive"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def main(argv=None):
+    """Print the index of a package zip"""
+    parser = argparse.ArgumentParser(description="Show what a package zip contains")
+    parser.add_argument("zip_path")
+    args = parser.parse_args(argv)
+
+    try:
+        with PackageIndex.open(args.zip_path) as index:
+            print(f"Root: {index.root or '(none)'}")
+            print(f"Files: {len(index.entries)}, {index.total_size} bytes uncompressed")
+            for entry in index.entries:
+                print(f"  {entry.crc:08x} {entry.size:>10}  {entry.rel_path}")
+            errors = index.validate() + index.check_limits(PackageLimits())
+    except (PackageIndexError, OSError) as e:
+        print(f"Error: {e}")
+        return False
+
+    for error in errors:
+        print(f"Error: {error}")
+    return not errors
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
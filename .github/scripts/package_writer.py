@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Deterministic, content-aware zip writer for Packages/.
+
+The same input always produces a byte-identical zip: entries are written in
+sorted order with a fixed timestamp and fixed permissions. Formats that are
+already compressed (PNG, JPEG, WebP, audio, nested archives) are STORED;
+everything else (JSON, TTF, text) is DEFLATEd at a configurable level, and
+falls back to STORED when compression would not help. Entries are compressed
+in parallel (zlib releases the GIL) and written in order as they complete.
+"""
+
+import os
+import sys
+import zlib
+import struct
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Extensions whose content is already compressed and only gets STORED
+STORED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp",
+    ".zip", ".gz", ".bz2", ".xz", ".7z",
+    ".mp3", ".ogg", ".opus", ".m4a", ".mp4"
+}
+
+# Default DEFLATE level for compressible entries
+DEFAULT_LEVEL = 9
+
+# Fixed DOS timestamp for every entry: 1980-01-01 00:00:00
+DOS_TIME = 0
+DOS_DATE = (0 << 9) | (1 << 5) | 1
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Largest values representable without zip64 extensions
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+
+class PackageWriterError(Exception):
+    """Raised for invalid input or packages that exceed the plain zip limits"""
+
+
+def compress_entry(name, data, level):
+    """Return (method, crc32, payload) for one entry"""
+    crc = zlib.crc32(data)
+    if level <= 0 or os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return ZIP_STORED, crc, data
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = compressor.compress(data) + compressor.flush()
+    if len(payload) >= len(data):
+        return ZIP_STORED, crc, data
+    return ZIP_DEFLATED, crc, payload
+
+
+class PackageWriter:
+    """Write a reproducible zip; entries must be added in sorted arcname order"""
+
+    def __init__(self, path, level=DEFAULT_LEVEL, workers=None):
+        self.path = Path(path)
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self._temp_path = Path(f"{self.path}.tmp")
+        self._file = open(self._temp_path, "wb")
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = deque()
+        self._central = []
+        self._last_name = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def entry_count(self):
+        """Number of entries added so far"""
+        return len(self._central) + len(self._pending)
+
+    def add(self, arcname, data, mode=0o644):
+        """Queue an entry for compression; it is written once all earlier entries are"""
+        arcname = arcname.replace(os.sep, "/")
+        if self._last_name is not None and arcname <= self._last_name:
+            raise PackageWriterError(f"Entries must be added in sorted order: {arcname!r} after {self._last_name!r}")
+        if len(data) > ZIP_MAX_SIZE or self.entry_count >= ZIP_MAX_ENTRIES:
+            raise PackageWriterError(f"{self.path} exceeds the plain zip limits (no zip64 support)")
+        self._last_name = arcname
+
+        future = self._executor.submit(compress_entry, arcname, data, self.level)
+        self._pending.append((arcname, len(data), mode, future))
+
+        # Bound the number of compressed entries held in memory
+        while len(self._pending) > self.workers * 2:
+            self._write_next()
+
+    def add_file(self, arcname, file_path):
+        """Queue a file from disk"""
+        with open(file_path, "rb") as f:
+            data = f.read()
+        mode = 0o755 if os.access(file_path, os.X_OK) and not os.path.isdir(file_path) else 0o644
+        self.add(arcname, data, mode)
+
+    def _write_next(self):
+        """Write the oldest queued entry to the archive"""
+        arcname, size, mode, future = self._pending.popleft()
+        method, crc, payload = future.result()
+
+        offset = self._file.tell()
+        if offset > ZIP_MAX_SIZE:
+            raise PackageWriterError(f"{self.path} exceeds the plain zip limits (no zip64 support)")
+
+        name = arcname.encode("utf-8")
+        flags = 0x0800 if not arcname.isascii() else 0
+        version = 20 if method == ZIP_DEFLATED else 10
+        self._file.write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, version, flags, method, DOS_TIME, DOS_DATE,
+            crc, len(payload), size, len(name), 0
+        ))
+        self._file.write(name)
+        self._file.write(payload)
+
+        self._central.append((name, flags, version, method, crc, len(payload), size, mode, offset))
+        self.bytes_in += size
+        self.bytes_out += len(payload)
+
+    def close(self):
+        """Finish the archive and move it into place atomically"""
+        try:
+            while self._pending:
+                self._write_next()
+
+            central_offset = self._file.tell()
+            for name, flags, version, method, crc, compressed, size, mode, offset in self._central:
+                self._file.write(struct.pack(
+                    "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 20, version, flags, method,
+                    DOS_TIME, DOS_DATE, crc, compressed, size, len(name), 0, 0, 0, 0,
+                    (0o100000 | mode) << 16, offset
+                ))
+                self._file.write(name)
+            central_size = self._file.tell() - central_offset
+            if central_offset > ZIP_MAX_SIZE:
+                raise PackageWriterError(f"{self.path} exceeds the plain zip limits (no zip64 support)")
+
+            self._file.write(struct.pack(
+                "<IHHHHIIH", 0x06054B50, 0, 0, len(self._central), len(self._central),
+                central_size, central_offset, 0
+            ))
+            self._file.close()
+            os.replace(self._temp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self):
+        """Discard a partially written archive"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if not self._file.closed:
+            self._file.close()
+        if self._temp_path.exists():
+            self._temp_path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_directory(source_dir, zip_path, level=DEFAULT_LEVEL, workers=None):
+    """Zip every file under source_dir (sorted, relative paths) into zip_path"""
+    files = []
+    for root, dirs, names in os.walk(source_dir):
+        for file in names:
+            file_path = os.path.join(root, file)
+            if os.path.isfile(file_path):
+                files.append((os.path.relpath(file_path, source_dir).replace(os.sep, "/"), file_path))
+    files.sort()
+
+    with PackageWriter(zip_path, level=level, workers=workers) as writer:
+        for arcname, file_path in files:
+            writer.add_file(arcname, file_path)
+    return writer
+
+def main(argv=None):
+    """Zip a directory reproducibly"""
+    parser = argparse.ArgumentParser(description="Write a deterministic, content-aware zip of a directory")
+    parser.add_argument("source_dir")
+    parser.add_argument("zip_path")
+    parser.add_argument("--level", type=int, default=DEFAULT_LEVEL, help="DEFLATE level for compressible files (0-9)")
+    parser.add_argument("--workers", type=int, default=None, help="Compression threads (default: all cores)")
+    args = parser.parse_args(argv)
+
+    writer = write_directory(args.source_dir, args.zip_path, level=args.level, workers=args.workers)
+    print(f"Wrote {args.zip_path}: {writer.entry_count} entries, {writer.bytes_in} -> {writer.bytes_out} bytes")
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Dominant palettes and luminance statistics of catalog previews and wallpapers
+(Catalog/.metadata/colors.json).
+
+Each preview and wallpaper PNG is downsampled to at most 64x64 pixels, its
+opaque pixels converted to CIELAB and clustered with a vectorized k-means, so
+the palette follows perceived color rather than raw RGB. Every palette color
+is stored as "0xRRGGBB" (the format manifests use for accent colors) with its
+share of the image and its Lab coordinates, next to the image's relative
+luminance (mean, spread and 10th/90th percentiles).
+
+The index is keyed by path and remembers each image's SHA-256, so ingest only
+decodes images whose bytes were never seen before. Because the Lab values are
+precomputed, "find themes like this color" is a distance computation over the
+index alone -- no image is decoded at query time. NumPy and Pillow are
+optional: without them no index is kept.
+
+Run directly to rebuild the index from the ownership registry or to search it
+by color.
+"""
+
+import sys
+import argparse
+from collections import OrderedDict
+from pathlib import Path
+
+from image_index import ImageIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Colors kept per image
+PALETTE_SIZE = 5
+
+# Images are downsampled to at most this size before clustering
+SAMPLE_SIZE = 64
+
+# Pixels more transparent than this are left out (overlays and icons are mostly transparent)
+MIN_ALPHA = 128
+
+# k-means stops after this many iterations, or once no center moves more than KMEANS_TOLERANCE (Lab units)
+KMEANS_ITERATIONS = 20
+KMEANS_TOLERANCE = 0.5
+
+# Palette colors covering less of an image than this are ignored by color searches
+DEFAULT_MIN_WEIGHT = 0.05
+
+# sRGB (linear) -> CIE XYZ, and the D65 white point
+SRGB_TO_XYZ = [[0.4124, 0.3576, 0.1805],
+               [0.2126, 0.7152, 0.0722],
+               [0.0193, 0.1192, 0.9505]]
+D65_WHITE = [0.95047, 1.0, 1.08883]
+
+
+def palettes_available():
+    """Return True when NumPy and Pillow can be imported"""
+    return np is not None and Image is not None
+
+def parse_hex_color(value):
+    """Convert "0xRRGGBB" or "#RRGGBB" to an (r, g, b) tuple, or None"""
+    value = value.strip().lower()
+    for prefix in ("0x", "#"):
+        if value.startswith(prefix):
+            value = value[len(prefix):]
+    if len(value) != 6:
+        return None
+    try:
+        color = int(value, 16)
+    except ValueError:
+        return None
+    return (color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF
+
+def _linearize(rgb):
+    """Convert sRGB values in 0..1 to linear light"""
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+def srgb_to_lab(rgb):
+    """Convert an (..., 3) array of sRGB values in 0..1 to CIELAB"""
+    xyz = _linearize(rgb) @ np.array(SRGB_TO_XYZ).T / np.array(D65_WHITE)
+    epsilon = (6 / 29) ** 3
+    f = np.where(xyz > epsilon, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+def sample_pixels(path):
+    """Return the opaque pixels of a downsampled image as an (N, 3) array of sRGB values in 0..1"""
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+    image.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR)
+    pixels = np.asarray(image, dtype=np.float64).reshape(-1, 4)
+    opaque = pixels[pixels[:, 3] >= MIN_ALPHA]
+    # A fully transparent image still gets a palette, from its color channels
+    return (opaque if len(opaque) else pixels)[:, :3] / 255.0
+
+def kmeans(points, k, iterations=KMEANS_ITERATIONS):
+    """
+    Cluster an (N, D) array into at most k groups, seeded deterministically with k-means++.
+    Returns (labels, number of clusters).
+    """
+    rng = np.random.default_rng(0)
+    centers = points[[rng.integers(len(points))]]
+    distances = ((points - centers[0]) ** 2).sum(axis=1)
+    while len(centers) < k and distances.sum() > 0:
+        chosen = rng.choice(len(points), p=distances / distances.sum())
+        centers = np.vstack([centers, points[chosen]])
+        distances = np.minimum(distances, ((points - points[chosen]) ** 2).sum(axis=1))
+
+    for _ in range(iterations):
+        labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=points[:, d], minlength=len(centers))
+                         for d in range(points.shape[1])], axis=1)
+        moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        shift = np.abs(moved - centers).max()
+        centers = moved
+        if shift < KMEANS_TOLERANCE:
+            break
+    labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return labels, len(centers)
+
+def compute_palette(path, size=PALETTE_SIZE):
+    """Return the palette and luminance statistics of an image (runs in a worker process)"""
+    rgb = sample_pixels(path)
+    lab = srgb_to_lab(rgb)
+    labels, clusters = kmeans(lab, size)
+
+    # Report each cluster as the mean sRGB color of its pixels, largest share first
+    counts = np.bincount(labels, minlength=clusters)
+    means = np.stack([np.bincount(labels, weights=rgb[:, c], minlength=clusters) for c in range(3)], axis=1)
+    means /= np.maximum(counts, 1)[:, None]
+    palette = []
+    for i in np.argsort(-counts, kind="stable"):
+        if counts[i] == 0:
+            continue
+        r, g, b = (int(round(v * 255)) for v in means[i])
+        palette.append(OrderedDict([
+            ("color", f"0x{r:02X}{g:02X}{b:02X}"),
+            ("weight", round(float(counts[i]) / len(labels), 3)),
+            ("lab", [round(float(v), 1) for v in srgb_to_lab(means[i])])
+        ]))
+
+    luminance = _linearize(rgb) @ np.array(SRGB_TO_XYZ[1])
+    p10, p90 = np.percentile(luminance, [10, 90])
+    return OrderedDict([
+        ("palette", palette),
+        ("luminance", OrderedDict([
+            ("mean", round(float(luminance.mean()), 3)),
+            ("std", round(float(luminance.std()), 3)),
+            ("p10", round(float(p10), 3)),
+            ("p90", round(float(p90), 3))
+        ]))
+    ])
+
+
+class ColorIndex(ImageIndex):
+    """Palettes and luminance statistics of every indexed image, by repository-relative path"""
+
+    JSON_OPTIONS = {"separators": (",", ":")}
+    compute = staticmethod(compute_palette)
+
+    def row_fields(self, value):
+        """Store the palette and luminance as they were computed"""
+        return value
+
+    def row_value(self, row):
+        """Read the palette and luminance back"""
+        return OrderedDict([("palette", row["palette"]), ("luminance", row["luminance"])])
+
+    def arrays(self):
+        """Return (paths, entries, row of each color, colors, weights, (M, 3) Lab array) over every palette color"""
+        if self._arrays is None:
+            paths = list(self.images)
+            entries = [row["entry"] for row in self.images.values()]
+            rows, colors, weights, lab = [], [], [], []
+            for i, row in enumerate(self.images.values()):
+                for color in row["palette"]:
+                    rows.append(i)
+                    colors.append(color["color"])
+                    weights.append(color["weight"])
+                    lab.append(color["lab"])
+            self._arrays = (paths, entries, np.array(rows, dtype=np.int64), colors,
+                            np.array(weights, dtype=np.float64), np.array(lab, dtype=np.float64).reshape(-1, 3))
+        return self._arrays
+
+    def search(self, rgb, limit=10, min_weight=DEFAULT_MIN_WEIGHT):
+        """
+        Return up to limit (entry, path, color, distance) matches for an (r, g, b) color, one per
+        entry, closest first (distance is the CIE76 delta E to the entry's nearest palette color)
+        """
+        paths, entries, rows, colors, weights, lab = self.arrays()
+        if not len(rows):
+            return []
+        target = srgb_to_lab(np.array(rgb, dtype=np.float64) / 255.0)
+        distance = np.sqrt(((lab - target) ** 2).sum(axis=1))
+        distance[weights < min_weight] = np.inf
+
+        results = []
+        seen = set()
+        for i in np.argsort(distance, kind="stable"):
+            if not np.isfinite(distance[i]) or len(results) >= limit:
+                break
+            entry = entries[rows[i]]
+            if entry not in seen:
+                seen.add(entry)
+                results.append((entry, paths[rows[i]], colors[i], round(float(distance[i]), 1)))
+        return results
+
+
+def main(argv=None):
+    """Rebuild the color index or search it"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Palette and luminance index of catalog previews and wallpapers")
+    parser.add_argument("--index", default=str(repo_root / "Catalog" / ".metadata" / "colors.json"))
+    parser.add_argument("--registry", default=str(repo_root / "Catalog" / ".metadata" / "registry.json"))
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Extract the palettes of every registered entry's previews and wallpapers")
+    parser.add_argument("--search", metavar="COLOR", help="List entries with a color close to COLOR (0xRRGGBB or #RRGGBB)")
+    parser.add_argument("--limit", type=int, default=10, help="Most entries listed by --search")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if not palettes_available():
+        print("Error: NumPy and Pillow are required (pip install numpy Pillow)")
+        return False
+
+    index = ColorIndex.load(args.index)
+
+    if args.rebuild:
+        from ownership import OwnershipRegistry
+        index.rebuild(OwnershipRegistry.load(args.registry, repo_root), repo_root, args.workers)
+        if index.save():
+            print(f"Saved {index.path}")
+        print(f"{len(index.images)} image(s) indexed")
+
+    if args.search:
+        rgb = parse_hex_color(args.search)
+        if rgb is None:
+            print(f"Error: {args.search} is not a color (use 0xRRGGBB or #RRGGBB)")
+            return False
+        for entry, path, color, distance in index.search(rgb, args.limit):
+            print(f"{distance:>6.1f}  {color}  {entry}  ({path})")
+
+    if not (args.rebuild or args.search):
+        print(index.summary())
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
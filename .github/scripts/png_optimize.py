@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Lossless PNG optimization for Catalog/ and Packages/.
+
+Every PNG is recompressed without touching its pixels: the IDAT stream is
+inflated and deflated again at the highest level with the strategy that gives
+the smallest result (stdlib only). When Pillow is installed, images with at
+most 256 colors are also tried as palette PNGs, and that version is kept only
+if it decodes back to exactly the same pixels. Results are cached by the
+source's SHA-256, so an image is only ever optimized once.
+
+Run directly to optimize the existing catalog and report the savings per package.
+"""
+
+import io
+import os
+import sys
+import json
+import zlib
+import struct
+import hashlib
+import argparse
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from blobstore import BlobStore, format_bytes
+from package_writer import PackageWriter, DEFAULT_LEVEL as DEFAULT_ZIP_LEVEL
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# zlib settings tried for the IDAT stream; the smallest output wins
+DEFLATE_STRATEGIES = [zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED]
+
+# Chunks that make a palette conversion unsafe (color management, animation or a transparent color)
+PALETTE_BLOCKING_CHUNKS = {b"iCCP", b"gAMA", b"cHRM", b"sRGB", b"sBIT", b"acTL", b"tRNS"}
+
+# IHDR color types that can be converted to a palette (truecolor, truecolor with alpha)
+PALETTE_COLOR_TYPES = {2, 6}
+
+
+class PngError(Exception):
+    """Raised for data that is not a well-formed PNG"""
+
+
+def read_chunks(data):
+    """Split PNG data into a list of (type, payload) chunks"""
+    if data[:8] != PNG_SIGNATURE:
+        raise PngError("missing PNG signature")
+    chunks = []
+    offset = 8
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[offset:offset + 8])
+        payload = data[offset + 8:offset + 8 + length]
+        if len(payload) != length:
+            raise PngError(f"truncated {chunk_type!r} chunk")
+        chunks.append((chunk_type, payload))
+        offset += 12 + length
+        if chunk_type == b"IEND":
+            return chunks
+    raise PngError("missing IEND chunk")
+
+def write_chunks(chunks):
+    """Join (type, payload) chunks into PNG data"""
+    parts = [PNG_SIGNATURE]
+    for chunk_type, payload in chunks:
+        parts.append(struct.pack(">I4s", len(payload), chunk_type))
+        parts.append(payload)
+        parts.append(struct.pack(">I", zlib.crc32(payload, zlib.crc32(chunk_type))))
+    return b"".join(parts)
+
+def recompress_idat(data):
+    """Return the PNG with its image data deflated as small as zlib allows (pixels untouched)"""
+    chunks = read_chunks(data)
+    idat = b"".join(payload for chunk_type, payload in chunks if chunk_type == b"IDAT")
+    if not idat:
+        raise PngError("no IDAT chunk")
+    raw = zlib.decompress(idat)
+
+    best = idat
+    for strategy in DEFLATE_STRATEGIES:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidate = compressor.compress(raw) + compressor.flush()
+        if len(candidate) < len(best):
+            best = candidate
+    if best is idat:
+        return data
+
+    # Replace the IDAT run with a single chunk, keeping every other chunk in place
+    result = []
+    for chunk_type, payload in chunks:
+        if chunk_type == b"IDAT":
+            if best is not None:
+                result.append((b"IDAT", best))
+                best = None
+        else:
+            result.append((chunk_type, payload))
+    return write_chunks(result)
+
+def palette_version(data, chunks):
+    """Return the image as an exact palette PNG, or None when that is not possible"""
+    if Image is None or {chunk_type for chunk_type, _ in chunks} & PALETTE_BLOCKING_CHUNKS:
+        return None
+
+    # Pillow decodes 16-bit channels to 8 bits, so only 8-bit truecolor images can be compared exactly
+    ihdr = next((payload for chunk_type, payload in chunks if chunk_type == b"IHDR"), b"")
+    if len(ihdr) < 10 or ihdr[8] != 8 or ihdr[9] not in PALETTE_COLOR_TYPES:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            return None  # Grayscale and palette images are already one byte per pixel or less
+        image.load()
+        colors = image.getcolors(256)
+        if colors is None:
+            return None
+
+        method = Image.Quantize.FASTOCTREE if image.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        palette_image = image.quantize(colors=len(colors), method=method, dither=Image.Dither.NONE)
+        if palette_image.convert(image.mode).tobytes() != image.tobytes():
+            return None  # Quantization was not exact
+
+        output = io.BytesIO()
+        palette_image.save(output, "PNG", optimize=True)
+        return output.getvalue()
+
+def optimize_png(data):
+    """Return the smallest lossless version of PNG data, or None if nothing smaller was found"""
+    try:
+        chunks = read_chunks(data)
+        candidates = [recompress_idat(data)]
+    except (PngError, zlib.error, OSError, ValueError) as e:
+        print(f"Warning: skipping PNG that could not be optimized: {e}")
+        return None
+
+    # The palette attempt is optional; a failure keeps the recompressed candidate
+    try:
+        palette = palette_version(data, chunks)
+        if palette is not None:
+            candidates.append(recompress_idat(palette))
+    except (PngError, zlib.error, OSError, ValueError) as e:
+        print(f"Warning: palette conversion failed, keeping the recompressed PNG: {e}")
+
+    best = min(candidates, key=len)
+    return best if len(best) < len(data) else None
+
+def optimize_data(data):
+    """Optimize in-memory PNG data in a worker; returns (sha256 of input, optimized bytes or None)"""
+    return hashlib.sha256(data).hexdigest(), optimize_png(data)
+
+
+class PngCache:
+    """
+    Maps the SHA-256 of every PNG seen to the SHA-256 of its optimized version
+    (itself when it was already optimal). The optimized bytes live in the blob store.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.records = {}
+        self._by_crc = {}
+        self.dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.records = json.load(f)
+        except (OSError, ValueError):
+            self.records = {}
+        for record in self.records.values():
+            self._by_crc[(record["size"], record["crc"])] = record
+
+    def get(self, sha256):
+        """Return the record for a source hash, or None"""
+        return self.records.get(sha256)
+
+    def put(self, sha256, data, optimized_sha256, optimized):
+        """Record the optimization result of a source (and mark the result itself as optimal)"""
+        record = {
+            "size": len(data),
+            "crc": zlib.crc32(data),
+            "optimized": optimized_sha256,
+            "optimized_size": len(optimized),
+            "optimized_crc": zlib.crc32(optimized)
+        }
+        with self._lock:
+            self.records[sha256] = record
+            self._by_crc[(record["size"], record["crc"])] = record
+            if optimized_sha256 != sha256:
+                optimal = {
+                    "size": len(optimized), "crc": record["optimized_crc"], "optimized": optimized_sha256,
+                    "optimized_size": len(optimized), "optimized_crc": record["optimized_crc"]
+                }
+                self.records[optimized_sha256] = optimal
+                self._by_crc[(optimal["size"], optimal["crc"])] = optimal
+            self.dirty = True
+
+    def optimized_for(self, size, crc):
+        """Return (size, crc) of the optimized version of a source known by its size and CRC32, or None"""
+        record = self._by_crc.get((size, crc))
+        if record is None:
+            return None
+        return record["optimized_size"], record["optimized_crc"]
+
+    def blob_hashes(self):
+        """Return the SHA-256 of every optimized version (their bytes live in the blob store)"""
+        with self._lock:
+            return {record["optimized"] for record in self.records.values()}
+
+    def save(self):
+        """Write the cache if it changed"""
+        if not self.dirty:
+            return
+        os.makedirs(self.path.parent, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.records, f)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+
+class PngOptimizer:
+    """Optimizes PNG files and zip members through a process pool, a PngCache and a BlobStore"""
+
+    def __init__(self, cache, store, pool):
+        self.cache = cache
+        self.store = store
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.files_optimized = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def _count(self, before, after):
+        with self._lock:
+            self.bytes_before += before
+            self.bytes_after += after
+            if after < before:
+                self.files_optimized += 1
+
+    def _cached_bytes(self, sha256):
+        """Return the optimized bytes for a source hash if both the record and the blob exist"""
+        record = self.cache.get(sha256)
+        if record is None:
+            return None
+        if record["optimized"] == sha256:
+            return b""  # Already optimal
+        blob = self.store.blob_path(record["optimized"])
+        try:
+            with open(blob, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def optimize_files(self, paths):
+        """Optimize PNG files in place (atomically, through the blob store); returns bytes saved"""
+        saved = 0
+        pending = []
+        for path in paths:
+            data = Path(path).read_bytes()
+            sha256 = hashlib.sha256(data).hexdigest()
+            cached = self._cached_bytes(sha256)
+            if cached == b"":
+                self._count(len(data), len(data))
+            elif cached is not None:
+                self.store.write_bytes(cached, path)
+                self._count(len(data), len(cached))
+                saved += len(data) - len(cached)
+            else:
+                pending.append((path, data, self.pool.submit(optimize_data, data)))
+
+        for path, data, future in pending:
+            sha256, optimized = future.result()
+            if optimized is None:
+                self.cache.put(sha256, data, sha256, data)
+                self._count(len(data), len(data))
+                continue
+            optimized_sha256 = self.store.write_bytes(optimized, path)
+            self.cache.put(sha256, data, optimized_sha256, optimized)
+            self._count(len(data), len(optimized))
+            saved += len(data) - len(optimized)
+        return saved
+
+    def optimize_tree(self, directory):
+        """Optimize every PNG under a directory; returns bytes saved"""
+        paths = []
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.lower().endswith(".png"):
+                    paths.append(os.path.join(root, file))
+        return self.optimize_files(sorted(paths))
+
+    def optimize_package(self, package_path, level=DEFAULT_ZIP_LEVEL):
+        """Rewrite a package zip with optimized PNG members (reproducibly); returns bytes saved"""
+        with zipfile.ZipFile(package_path) as archive:
+            infos = sorted((info for info in archive.infolist() if not info.is_dir()), key=lambda i: i.filename)
+            members = []
+            pending = {}
+            archive_data = {}
+            for info in infos:
+                data = archive_data[info.filename] = archive.read(info)
+                if info.filename.lower().endswith(".png"):
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    cached = self._cached_bytes(sha256)
+                    if cached is None:
+                        pending[info.filename] = self.pool.submit(optimize_data, data)
+                    elif cached:
+                        data = cached
+                members.append((info, data))
+
+        changed = False
+        optimized_members = []
+        for info, data in members:
+            future = pending.get(info.filename)
+            if future is not None:
+                sha256, optimized = future.result()
+                if optimized is None:
+                    self.cache.put(sha256, data, sha256, data)
+                else:
+                    self.cache.put(sha256, data, hashlib.sha256(optimized).hexdigest(), optimized)
+                    data = optimized
+            changed = changed or data is not archive_data[info.filename]
+            optimized_members.append((info, data))
+        if not changed:
+            return 0
+
+        # The writer renames the new zip into place, so a hardlinked package is never modified
+        before = os.path.getsize(package_path)
+        with PackageWriter(package_path, level=level) as writer:
+            for info, data in optimized_members:
+                mode = (info.external_attr >> 16) & 0o777
+                writer.add(info.filename, data, 0o755 if mode & 0o111 else 0o644)
+        self.store.adopt(package_path)
+        self._count(before, os.path.getsize(package_path))
+        return before - os.path.getsize(package_path)
+
+    def summary(self):
+        """Return a one-line summary of this run"""
+        return (f"PNG optimization: {self.files_optimized} file(s) smaller, "
+                f"{format_bytes(self.bytes_before - self.bytes_after)} saved")
+
+
+def main(argv=None):
+    """Optimize the PNGs of every extracted package (and optionally every package zip)"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    catalog_dir = repo_root / "Catalog"
+    parser = argparse.ArgumentParser(description="Losslessly optimize the PNGs in Catalog/ (and Packages/)")
+    parser.add_argument("--cache-dir", default=str(repo_root / ".cache"))
+    parser.add_argument("--packages", action="store_true", help="Also rewrite the zips in Packages/")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--report", default=None, help="Write the per-package savings as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print("Pillow is not installed, palette conversion is disabled (IDAT recompression only)")
+
+    # Every extracted package directory, plus the shared previews
+    groups = [catalog_dir / ".metadata" / "previews"]
+    for type_dir in sorted(catalog_dir.iterdir()):
+        if type_dir.is_dir() and not type_dir.name.startswith("."):
+            groups.extend(sorted(path for path in type_dir.iterdir() if path.is_dir()))
+    packages = sorted((repo_root / "Packages").glob("*/*.zip")) if args.packages else []
+
+    cache = PngCache(Path(args.cache_dir) / "png" / "cache.json")
+    store = BlobStore(Path(args.cache_dir) / "blobs")
+    report = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        optimizer = PngOptimizer(cache, store, pool)
+        for group in groups:
+            before = optimizer.bytes_before
+            saved = optimizer.optimize_tree(group)
+            label = str(group.relative_to(repo_root))
+            report[label] = {"png_bytes": optimizer.bytes_before - before, "bytes_saved": saved}
+            print(f"{label}: {format_bytes(saved)} saved")
+        for package in packages:
+            try:
+                saved = optimizer.optimize_package(package)
+            except (zipfile.BadZipFile, OSError) as e:
+                print(f"Error: could not optimize {package}: {e}")
+                continue
+            label = str(package.relative_to(repo_root))
+            report[label] = {"bytes_saved": saved}
+            print(f"{label}: {format_bytes(saved)} saved")
+        cache.save()
+
+    total = sum(item["bytes_saved"] for item in report.values())
+    print(f"{optimizer.summary()} (total {format_bytes(total)} across {len(report)} package(s))")
+    print(store.summary())
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"total_bytes_saved": total, "packages": report}, f, indent=2)
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -7,15 +7,26 @@ Updated to use the .metadata folder structure for previews and manifests.
 import os
 import json
 import shutil
-import tempfile
-import zipfile
-import subprocess
-import re
+import zlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime
-import urllib.request
-import tempfile
-import ssl
+
+from blobstore import BlobStore, file_sha256
+from catalog import Catalog, section_for_type, utc_timestamp
+import catalog_binary
+from download import download, check_not_modified, DEFAULT_MAX_SIZE
+from image_hash import ImageHashIndex, report_near_duplicates, hashing_available
+from fetch_scheduler import run_fetches, DEFAULT_MAX_CONCURRENT as DEFAULT_FETCH_CONCURRENCY, DEFAULT_PER_HOST as DEFAULT_FETCH_PER_HOST
+from manifest_schema import compile_validators, validate_manifest
+from ownership import OwnershipRegistry, entry_key, remove_owned_files, remove_empty_dirs
+from package_index import PackageIndex, PackageIndexError, PackageLimits, normalize_path, MAX_MANIFEST_SIZE
+from palette import ColorIndex, palettes_available
+from package_writer import PackageWriter, DEFAULT_LEVEL as DEFAULT_ZIP_LEVEL
+from repo_cache import MirrorCache, COMMIT_PATTERN, DEFAULT_MAX_BYTES as DEFAULT_MIRROR_CACHE_BYTES
+from png_optimize import PngCache, PngOptimizer
+from profiling import PROFILER
+from thumbnails import render_derivatives, place_derivatives, pillow_available
 
 # Base paths
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -24,6 +35,57 @@ PACKAGES_DIR = REPO_ROOT / "Packages"
 CATALOG_DIR = REPO_ROOT / "Catalog"
 METADATA_DIR = CATALOG_DIR / ".metadata"
 PUSH_JSON_PATH = UPLOAD_DIR / "push.json"
+CATALOG_PATH = CATALOG_DIR / "catalog.json"
+CATALOG_BINARY_PATH = CATALOG_DIR / "catalog.bin"
+REGISTRY_PATH = METADATA_DIR / "registry.json"
+IMAGE_HASHES_PATH = METADATA_DIR / "image_hashes.json"
+COLORS_PATH = METADATA_DIR / "colors.json"
+
+# Local, uncommitted cache (kept between workflow runs by actions/cache)
+CACHE_DIR = Path(os.environ.get("NEXTUI_CACHE_DIR", REPO_ROOT / ".cache"))
+
+# Content-addressed store that every file written to Packages/, Catalog/ and .metadata goes through
+BLOB_STORE = BlobStore(CACHE_DIR / "blobs")
+
+# Bare mirrors of submitted repositories, bounded in size with LRU eviction
+MIRROR_CACHE = MirrorCache(CACHE_DIR / "mirrors", DEFAULT_MIRROR_CACHE_BYTES)
+
+# Largest package accepted from a URL submission (bytes)
+MAX_DOWNLOAD_SIZE = DEFAULT_MAX_SIZE
+
+# DEFLATE level for compressible files in packages built from repositories
+ZIP_LEVEL = DEFAULT_ZIP_LEVEL
+
+# Resource limits every package is checked against before anything is written (zip-bomb guard)
+PACKAGE_LIMITS = PackageLimits()
+
+# Re-extract resubmitted packages in place, only touching files whose size/CRC32 changed
+INCREMENTAL_EXTRACT = True
+
+# Process pool for CPU-bound image work: thumbnails and PNG optimization (set up in main)
+PROCESS_POOL = None
+
+# Render resized preview thumbnails (needs Pillow)
+MAKE_THUMBNAILS = False
+
+# Lossless PNG optimizer for extracted files and package zips (None unless --optimize-png)
+PNG_OPTIMIZER = None
+
+# Downloads and git fetches running at the same time, overall and per host
+FETCH_CONCURRENCY = DEFAULT_FETCH_CONCURRENCY
+FETCH_PER_HOST = DEFAULT_FETCH_PER_HOST
+
+# Files owned by each catalog entry (loaded in main, updated in the serial catalog phase)
+REGISTRY = None
+
+# Perceptual hashes of previews and wallpapers (None when disabled or NumPy/Pillow are missing)
+IMAGE_INDEX = None
+
+# Palettes and luminance of previews and wallpapers (None when disabled or NumPy/Pillow are missing)
+COLOR_INDEX = None
+
+# Number of submissions packaged and extracted at the same time
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
 
 # Component types and their extensions
 COMPONENT_TYPES = {
@@ -36,16 +98,8 @@ COMPONENT_TYPES = {
     "overlay": ".over"
 }
 
-# Mapping for catalog.json component keys
-CATALOG_COMPONENT_KEYS = {
-    "theme": "themes",  # Not actually used in components section
-    "wallpaper": "wallpapers",
-    "icon": "icons",
-    "accent": "accents",
-    "led": "leds",
-    "font": "fonts",
-    "overlay": "overlays"
-}
+# Manifest schema validators, compiled once per component type
+MANIFEST_VALIDATORS = compile_validators(COMPONENT_TYPES)
 
 # Directory name mappings for catalog (capitalized)
 CATALOG_DIR_MAPPINGS = {
@@ -59,6 +113,26 @@ CATALOG_DIR_MAPPINGS = {
 }
 
 
+def configure_paths(repo_root, cache_dir=None):
+    """Point ingest at another repository root and cache (e.g. a benchmark's scratch tree)"""
+    global REPO_ROOT, UPLOAD_DIR, PACKAGES_DIR, CATALOG_DIR, METADATA_DIR, PUSH_JSON_PATH, CATALOG_PATH
+    global CATALOG_BINARY_PATH, REGISTRY_PATH, IMAGE_HASHES_PATH, COLORS_PATH, CACHE_DIR, BLOB_STORE, MIRROR_CACHE
+
+    REPO_ROOT = Path(repo_root).resolve()
+    UPLOAD_DIR = REPO_ROOT / "Upload"
+    PACKAGES_DIR = REPO_ROOT / "Packages"
+    CATALOG_DIR = REPO_ROOT / "Catalog"
+    METADATA_DIR = CATALOG_DIR / ".metadata"
+    PUSH_JSON_PATH = UPLOAD_DIR / "push.json"
+    CATALOG_PATH = CATALOG_DIR / "catalog.json"
+    CATALOG_BINARY_PATH = CATALOG_DIR / "catalog.bin"
+    REGISTRY_PATH = METADATA_DIR / "registry.json"
+    IMAGE_HASHES_PATH = METADATA_DIR / "image_hashes.json"
+    COLORS_PATH = METADATA_DIR / "colors.json"
+    CACHE_DIR = Path(cache_dir) if cache_dir is not None else REPO_ROOT / ".cache"
+    BLOB_STORE = BlobStore(CACHE_DIR / "blobs")
+    MIRROR_CACHE = MirrorCache(CACHE_DIR / "mirrors", DEFAULT_MIRROR_CACHE_BYTES)
+
 def load_push_json():
     """Load the push.json file"""
     if not PUSH_JSON_PATH.exists():
@@ -114,6 +188,10 @@ def validate_submission(submission):
             print(f"Error: 'commit' is required for repository submissions")
             return False
 
+        if not isinstance(submission["commit"], str) or not COMMIT_PATTERN.fullmatch(submission["commit"]):
+            print(f"Error: Invalid commit '{submission['commit']}'. Must be a 7-40 character hexadecimal SHA")
+            return False
+
         # Branch is optional, but if provided should not be "None"
         if "branch" not in submission:
             submission["branch"] = "main"  # Default to main if not specified
@@ -138,71 +216,39 @@ def validate_submission(submission):
 
     return True
 
-def clean_existing_entry(submission):
+@PROFILER.stage()
+def clean_existing_entry(submission, catalog):
     """Clean up existing entry with the same name from catalog and packages"""
     name = submission["name"]
     component_type = submission["type"]
 
-    # Load catalog.json
-    catalog_path = CATALOG_DIR / "catalog.json"
-    if not catalog_path.exists():
-        print(f"Note: No catalog.json found, skipping cleanup")
-        return
-
     try:
-        with open(catalog_path, 'r') as f:
-            catalog = json.load(f)
-
         # Check if entry exists in catalog
-        entry_exists = False
-        if component_type == "theme":
-            if name in catalog.get("themes", {}):
-                entry_exists = True
-                entry_info = catalog["themes"][name]
-        else:
-            comp_type_key = COMPONENT_TYPES[component_type][1:]  # Remove the dot
-            if comp_type_key in catalog.get("components", {}) and name in catalog["components"][comp_type_key]:
-                entry_exists = True
-                entry_info = catalog["components"][comp_type_key][name]
+        entry_info = catalog.get(section_for_type(component_type), name)
+        entry_exists = entry_info is not None
 
         if entry_exists:
             print(f"Found existing entry for {name}, cleaning up...")
-
-            # Remove preview file from .metadata
-            if "preview_path" in entry_info:
-                preview_path = REPO_ROOT / entry_info["preview_path"]
-                if preview_path.exists():
-                    os.remove(preview_path)
-                    print(f"Removed {preview_path}")
-
-            # Remove manifest file from .metadata
-            if "manifest_path" in entry_info:
-                manifest_path = REPO_ROOT / entry_info["manifest_path"]
-                if manifest_path.exists():
-                    os.remove(manifest_path)
-                    print(f"Removed {manifest_path}")
-
-            # Remove package file
-            if "URL" in entry_info:
-                url = entry_info["URL"]
-                # Extract the package path from the URL
-                package_path_match = re.search(r'raw/main/(.+?)\.zip', url)
-                if package_path_match:
-                    package_rel_path = package_path_match.group(1) + ".zip"
-                    package_path = REPO_ROOT / package_rel_path
-                    if package_path.exists():
-                        os.remove(package_path)
-                        print(f"Removed {package_path}")
-
-            # Remove extracted directory in Catalog
-            if component_type == "theme":
-                extracted_dir = CATALOG_DIR / "Themes" / name
+            extracted_dir = extract_dir_for(submission)
+
+            owned = REGISTRY.files(section_for_type(component_type), name) if REGISTRY is not None else None
+            if owned is not None:
+                # Remove exactly the files the entry owns (incremental extraction updates its
+                # extracted files in place instead, removing the stale ones itself)
+                removed = remove_owned_files(REGISTRY, owned, extracted_dir if INCREMENTAL_EXTRACT else None)
+                print(f"Removed {len(removed)} file(s) owned by {name}")
             else:
-                extracted_dir = CATALOG_DIR / CATALOG_DIR_MAPPINGS[component_type] / name
-
-            if extracted_dir.exists() and extracted_dir.is_dir():
-                shutil.rmtree(extracted_dir)
-                print(f"Removed {extracted_dir}")
+                # Entry ingested before the registry: remove the files its catalog entry names
+                paths = [entry_info.get("preview_path"), entry_info.get("manifest_path")]
+                paths += [thumbnail["path"] for thumbnail in entry_info.get("thumbnails", [])]
+                for path in [REPO_ROOT / path for path in paths if path] + [package_path_for(submission)]:
+                    if path.exists():
+                        os.remove(path)
+                        print(f"Removed {path}")
+
+                if not INCREMENTAL_EXTRACT and extracted_dir.exists() and extracted_dir.is_dir():
+                    shutil.rmtree(extracted_dir)
+                    print(f"Removed {extracted_dir}")
 
             print(f"Cleanup complete for {name}")
         else:
@@ -211,144 +257,229 @@ def clean_existing_entry(submission):
     except Exception as e:
         print(f"Error during cleanup: {e}")
 
-def clone_repository(repo_url, commit_hash, branch, target_dir):
-    """Clone a repository at a specific commit and branch"""
-    print(f"Cloning {repo_url} (branch: {branch}, commit: {commit_hash})")
+def package_path_for(submission):
+    """Return the Packages/ zip path of a submission"""
+    return PACKAGES_DIR / f"{submission['type']}s" / f"{submission['name']}.zip"
 
-    # Create target directory
-    os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+def extract_dir_for(submission):
+    """Return the Catalog/ extraction directory of a submission"""
+    return CATALOG_DIR / CATALOG_DIR_MAPPINGS[submission["type"]] / submission["name"]
 
-    try:
-        # Clone repository
-        subprocess.run(['git', 'clone', '--no-checkout', repo_url, target_dir], check=True)
-
-        # Change to repository directory
-        cwd = os.getcwd()
-        os.chdir(target_dir)
-
-        try:
-            # Fetch branch if specified
-            if branch and branch != "None" and branch != "main":
-                subprocess.run(['git', 'fetch', 'origin', branch], check=True)
-                subprocess.run(['git', 'checkout', branch], check=True)
-            else:
-                subprocess.run(['git', 'checkout', 'main'], check=True)
-
-            # Checkout specific commit
-            subprocess.run(['git', 'checkout', commit_hash], check=True)
-
-            # Remove .git directory
-            shutil.rmtree('.git', ignore_errors=True)
-        finally:
-            # Return to original directory
-            os.chdir(cwd)
-
-        print(f"Repository cloned successfully at {target_dir}")
-        return True
-    except Exception as e:
-        print(f"Error cloning repository: {e}")
+def owned_files(submission, directory):
+    """Return the registered files of a submission's entry inside directory (relative to it), or None"""
+    if REGISTRY is None:
+        return None
+    return REGISTRY.files_under(section_for_type(submission["type"]), submission["name"], directory)
+
+def owned_records(submission, index, preview_path, manifest_path, thumbnails):
+    """Hash every file a processed submission owns, for the registry (safe to run in a worker thread)"""
+    extract_dir = extract_dir_for(submission)
+    paths = [package_path_for(submission), REPO_ROOT / preview_path, REPO_ROOT / manifest_path]
+    paths += [REPO_ROOT / thumbnail["path"] for thumbnail in thumbnails or []]
+    paths += [extract_dir / rel_path for rel_path in index.by_rel_path]
+    previous = REGISTRY.files(section_for_type(submission["type"]), submission["name"])
+    return REGISTRY.records_for(paths, previous, BLOB_STORE)
+
+def stored_source(entry):
+    """Return the source fingerprint of a catalog entry (older repository entries fall back to their commit)"""
+    if entry.get("source"):
+        return entry["source"]
+    if entry.get("commit") and entry.get("repository"):
+        return {"method": "repository", "url": entry["repository"], "commit": entry["commit"]}
+    return None
+
+def outputs_present(submission, entry):
+    """Check that the package, extraction and metadata files of an entry are still on disk"""
+    paths = [entry.get("preview_path"), entry.get("manifest_path")]
+    paths += [thumbnail["path"] for thumbnail in entry.get("thumbnails", [])]
+    if not all(path and (REPO_ROOT / path).exists() for path in paths):
         return False
-
-def create_zip_file(source_dir, zip_path):
-    """Create a ZIP file from a directory"""
-    try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(source_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arc_name = os.path.relpath(file_path, source_dir)
-                    zipf.write(file_path, arc_name)
-
-        print(f"Created ZIP file: {zip_path}")
-        return True
-    except Exception as e:
-        print(f"Error creating ZIP file: {e}")
+    if MAKE_THUMBNAILS and not entry.get("thumbnails"):
         return False
+    return package_path_for(submission).exists() and extract_dir_for(submission).is_dir()
 
-def validate_package_contents(package_path):
-    """Validate that the package zip file contains required files"""
-    try:
-        with zipfile.ZipFile(package_path, 'r') as zip_ref:
-            file_list = zip_ref.namelist()
-
-            # Check if manifest.json exists (at any level)
-            manifest_exists = any('manifest.json' in f for f in file_list)
-
-            # Check if preview.png exists (at any level)
-            preview_exists = any('preview.png' in f for f in file_list)
-
-            if not manifest_exists:
-                print(f"Error: {package_path} is missing manifest.json")
+def previous_source(submission, catalog):
+    """Return the stored fingerprint a submission can be compared against, or None"""
+    entry = catalog.get(section_for_type(submission["type"]), submission["name"])
+    if entry is None or not outputs_present(submission, entry):
+        return None
+    source = stored_source(entry)
+    if source is None or source.get("method") != submission["submission_method"]:
+        return None
+    return source
+
+def unchanged_source(submission, previous):
+    """
+    Return the fingerprint of a repository or zip submission if it matches the stored one
+    (local checks only, nothing is fetched), else None
+    """
+    if previous is None:
+        return None
+    if submission["submission_method"] == "repository":
+        commit = submission["commit"]
+        stored = previous.get("commit", "")
+        if previous.get("url") != submission["url"]:
+            return None
+        # Submissions may use an abbreviated SHA; the stored commit is the full one
+        if commit == stored or (len(commit) >= 7 and stored.startswith(commit)):
+            return previous
+    elif submission["submission_method"] == "zip":
+        source_zip = UPLOAD_DIR / f"{submission['name']}.zip"
+        if previous.get("sha256") == file_sha256(source_zip):
+            return previous
+    return None
+
+@PROFILER.stage()
+def validate_package_contents(index, component_type):
+    """Validate that an indexed package has the required files and a manifest matching its type's schema"""
+    errors = index.validate() + index.check_limits(PACKAGE_LIMITS)
+    if index.manifest is not None:
+        errors += [f"manifest.json {error}" for error in
+                   validate_manifest(MANIFEST_VALIDATORS, index.manifest, component_type)]
+    for error in errors:
+        print(f"Error: {index.package_name} {error}")
+    return not errors
+
+def new_extract_stats():
+    """Return zeroed counters for an extraction"""
+    return {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+
+def needs_write(target_path, size, crc, stats):
+    """Decide whether an extracted file must be (re)written, updating the stats"""
+    if os.path.isfile(target_path):
+        if INCREMENTAL_EXTRACT and file_matches(target_path, size, crc):
+            stats["unchanged"] += 1
+            return False
+        # An optimized PNG left in place by an earlier run also counts as unchanged
+        if INCREMENTAL_EXTRACT and PNG_OPTIMIZER is not None and target_path.lower().endswith(".png"):
+            optimized = PNG_OPTIMIZER.cache.optimized_for(size, crc)
+            if optimized and file_matches(target_path, *optimized):
+                stats["unchanged"] += 1
                 return False
+        stats["changed"] += 1
+    else:
+        stats["added"] += 1
+    return True
 
-            if not preview_exists:
-                print(f"Error: {package_path} is missing preview.png")
-                return False
+def remove_stale_files(dest_dir, targets, stats, owned=None):
+    """
+    Remove files from a previous extraction that are no longer in the package: exactly the
+    registered ones when the entry's owned files are known, else found by walking dest_dir
+    """
+    if owned is not None:
+        for rel_path in owned:
+            if rel_path in targets:
+                continue
+            file_path = os.path.join(dest_dir, rel_path)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                stats["removed"] += 1
+                remove_empty_dirs(os.path.dirname(file_path), dest_dir)
+        return
 
-            return True
+    for root, dirs, files in os.walk(dest_dir, topdown=False):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.relpath(file_path, dest_dir) not in targets:
+                os.remove(file_path)
+                stats["removed"] += 1
+        if root != str(dest_dir) and not os.listdir(root):
+            os.rmdir(root)
+
+    # Remove any __MACOSX directory that might have been created
+    macosx_dir = os.path.join(dest_dir, "__MACOSX")
+    if os.path.exists(macosx_dir):
+        shutil.rmtree(macosx_dir)
+
+def print_extract_stats(dest_dir, stats):
+    """Print the per-package extraction summary"""
+    print(f"Extracted package to {dest_dir} "
+          f"(added {stats['added']}, changed {stats['changed']}, removed {stats['removed']}, unchanged {stats['unchanged']})")
+
+def index_tree(mirror, sha, name):
+    """List a fetched commit's tree and index it as a package (with its manifest), without writing anything"""
+    try:
+        tree = {}
+        for path, mode, size, blob_sha in MIRROR_CACHE.list_tree(mirror, sha):
+            if mode != "120000":  # Skip symlinks
+                tree[path] = (mode, size, blob_sha)
+
+        index = PackageIndex.from_listing(name, [(path, size) for path, (_, size, _) in tree.items()])
+        if index.manifest_entry is not None and index.manifest_entry.size <= MAX_MANIFEST_SIZE:
+            _, manifest_data = next(MIRROR_CACHE.iter_blobs(mirror, [tree[index.manifest_entry.name][2]]))
+            index.load_manifest(manifest_data)
+        return tree, index
     except Exception as e:
-        print(f"Error validating package contents: {e}")
-        return False
+        print(f"Error listing {mirror} at {sha}: {e}")
+        return None, None
 
-def extract_package(package_path, dest_dir):
-    """Extract package without nested directories"""
+def build_package_from_tree(mirror, sha, tree, index, package_path, dest_dir, owned=None):
+    """Build the package zip and the Catalog extraction from a fetched commit's indexed tree in a single pass"""
     try:
-        with zipfile.ZipFile(package_path, 'r') as zip_ref:
-            file_list = zip_ref.namelist()
-
-            # Identify if there's a common parent directory in the zip
-            common_parent = None
-            for item in file_list:
-                # Skip __MACOSX entries
-                if "__MACOSX" in item:
-                    continue
-
-                parts = item.split('/')
-                if len(parts) > 1 and parts[0] and not common_parent:
-                    common_parent = parts[0]
-                elif len(parts) > 1 and parts[0] and parts[0] != common_parent:
-                    common_parent = None
-                    break
-
-            # Don't strip the "Systems" directory for overlay components
-            if common_parent == "Systems" and ".over" in str(package_path):
-                common_parent = None
-
-            # Extract files
-            for item in file_list:
-                # Skip __MACOSX entries
-                if "__MACOSX" in item:
-                    continue
-
-                # Determine the correct extraction path
-                if common_parent and item.startswith(common_parent + '/'):
-                    # Strip the common parent directory
-                    target_path = os.path.join(dest_dir, item[len(common_parent) + 1:])
-                else:
-                    target_path = os.path.join(dest_dir, item)
-
-                # Skip directories
-                if item.endswith('/'):
-                    continue
-
-                # Create the directory structure
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-
-                # Extract the file
-                with zip_ref.open(item) as source_file, open(target_path, 'wb') as target_file:
-                    shutil.copyfileobj(source_file, target_file)
-
-        # Remove any __MACOSX directory that might have been created
-        macosx_dir = os.path.join(dest_dir, "__MACOSX")
-        if os.path.exists(macosx_dir):
-            shutil.rmtree(macosx_dir)
-
-        print(f"Extracted package to {dest_dir}")
+        # Stream each blob once into both the zip and the extracted tree
+        with PROFILER.span("build_package"):
+            entries_by_name = {entry.name: entry for entry in index.entries}
+            stats = new_extract_stats()
+            targets = set()
+            blobs = MIRROR_CACHE.iter_blobs(mirror, [blob_sha for _, _, blob_sha in tree.values()])
+            with PackageWriter(package_path, level=ZIP_LEVEL) as writer:
+                for (path, (mode, size, _)), (_, data) in zip(tree.items(), blobs):
+                    writer.add(path, data, 0o755 if mode == "100755" else 0o644)
+
+                    entry = entries_by_name.get(normalize_path(path))
+                    if entry is None:
+                        continue  # __MACOSX and other junk is packaged but not extracted
+                    targets.add(entry.rel_path)
+                    target_path = os.path.join(dest_dir, entry.rel_path)
+                    if needs_write(target_path, size, zlib.crc32(data), stats):
+                        BLOB_STORE.write_bytes(data, target_path)
+
+            # The writer renames the finished zip into place, so a previous (possibly
+            # hardlinked) package is never truncated in place
+            BLOB_STORE.adopt(package_path)
+            print(f"Created ZIP file: {package_path}")
+
+        remove_stale_files(dest_dir, targets, stats, owned)
+        print_extract_stats(dest_dir, stats)
         return True
+    except Exception as e:
+        print(f"Error building package from {mirror} at {sha}: {e}")
+        return None
+
+@PROFILER.stage()
+def extract_package(index, dest_dir, owned=None):
+    """Extract an indexed package without nested directories, only writing files that changed"""
+    try:
+        # Extract files, skipping the ones whose size and CRC32 already match
+        stats = new_extract_stats()
+        for entry in index.entries:
+            target_path = os.path.join(dest_dir, entry.rel_path)
+            if not needs_write(target_path, entry.size, entry.crc, stats):
+                continue
+
+            # Extract the file through the blob store (identical files become hardlinks)
+            with index.open_entry(entry) as source_file:
+                BLOB_STORE.write_stream(source_file, target_path)
+
+        remove_stale_files(dest_dir, index.by_rel_path, stats, owned)
+        print_extract_stats(dest_dir, stats)
+        return stats
     except Exception as e:
         print(f"Error extracting package: {e}")
+        return None
+
+def file_matches(path, size, crc):
+    """Check whether a file on disk has the given size and CRC32"""
+    if os.path.getsize(path) != size:
         return False
 
+    file_crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_crc = zlib.crc32(chunk, file_crc)
+    return file_crc == crc
+
+@PROFILER.stage()
 def copy_to_metadata(src_dir, component_type, name):
     """Copy preview.png and manifest.json to the .metadata directory"""
     try:
@@ -358,11 +489,11 @@ def copy_to_metadata(src_dir, component_type, name):
 
         if not os.path.exists(preview_src):
             print(f"Error: preview.png not found in {src_dir}")
-            return None, None
+            return None, None, None
 
         if not os.path.exists(manifest_src):
             print(f"Error: manifest.json not found in {src_dir}")
-            return None, None
+            return None, None, None
 
         # Determine destination paths
         catalog_type_dir = CATALOG_DIR_MAPPINGS[component_type]
@@ -374,41 +505,84 @@ def copy_to_metadata(src_dir, component_type, name):
         os.makedirs(os.path.dirname(preview_dest), exist_ok=True)
         os.makedirs(os.path.dirname(manifest_dest), exist_ok=True)
 
-        # Copy files
-        shutil.copy2(preview_src, preview_dest)
-        shutil.copy2(manifest_src, manifest_dest)
+        # Hardlink the extracted copies (no bytes are copied on the same filesystem)
+        BLOB_STORE.link_file(preview_src, preview_dest)
+        BLOB_STORE.link_file(manifest_src, manifest_dest)
 
         print(f"Copied preview and manifest to .metadata directory")
 
+        # Resized previews for the gallery and the Theme Manager
+        thumbnails = make_thumbnails(preview_src, name)
+
         # Return relative paths from REPO_ROOT
         preview_rel_path = str(preview_dest.relative_to(REPO_ROOT))
         manifest_rel_path = str(manifest_dest.relative_to(REPO_ROOT))
 
-        return preview_rel_path, manifest_rel_path
+        return preview_rel_path, manifest_rel_path, thumbnails
     except Exception as e:
         print(f"Error copying to metadata: {e}")
-        return None, None
+        return None, None, None
 
-def extract_metadata_from_manifest(manifest_path):
-    """Extract author and description from manifest.json"""
+@PROFILER.stage()
+def optimize_pngs(extract_dir, package_path=None):
+    """Losslessly optimize the PNGs of an extraction (and of a package zip we host)"""
+    if PNG_OPTIMIZER is None:
+        return
+    try:
+        saved = PNG_OPTIMIZER.optimize_tree(extract_dir)
+        if package_path is not None:
+            saved += PNG_OPTIMIZER.optimize_package(package_path, level=ZIP_LEVEL)
+        print(f"Optimized PNGs in {extract_dir.name}: {saved} bytes saved")
+    except Exception as e:
+        # Optimization is optional; the unoptimized files are still valid
+        print(f"Warning: PNG optimization failed for {extract_dir}: {e}")
+
+@PROFILER.stage()
+def make_thumbnails(preview_src, name):
+    """Render resized PNG/WebP previews in the process pool and place them in .metadata/thumbnails"""
+    if not MAKE_THUMBNAILS:
+        return []
     try:
-        with open(manifest_path, 'r') as f:
-            manifest_data = json.load(f)
+        derivatives = PROCESS_POOL.submit(render_derivatives, str(preview_src), str(CACHE_DIR / "thumbnails")).result()
+        thumbnails = place_derivatives(derivatives, name, METADATA_DIR / "thumbnails", BLOB_STORE, REPO_ROOT)
+    except Exception as e:
+        # Thumbnails are an optimization; the full-size preview still works
+        print(f"Warning: could not create thumbnails for {name}: {e}")
+        return []
+    print(f"Created {len(thumbnails)} thumbnail(s) for {name}")
+    return thumbnails
+
+@PROFILER.stage()
+def hash_images(owned):
+    """Perceptual hashes of the previews and wallpapers a submission owns (new images are hashed in the process pool)"""
+    if IMAGE_INDEX is None:
+        return None
+    return IMAGE_INDEX.index_owned(owned, REPO_ROOT, PROCESS_POOL)
+
+@PROFILER.stage()
+def extract_palettes(owned):
+    """Palettes and luminance of the previews and wallpapers a submission owns (new images are decoded in the process pool)"""
+    if COLOR_INDEX is None:
+        return None
+    return COLOR_INDEX.index_owned(owned, REPO_ROOT, PROCESS_POOL)
 
+def extract_metadata_from_manifest(manifest_data, name):
+    """Extract author and description from parsed manifest.json data"""
+    try:
         # Check if it's a theme or component
         if "theme_info" in manifest_data:
             author = manifest_data.get("theme_info", {}).get("author", "Unknown")
-            description = manifest_data.get("theme_info", {}).get("name", os.path.basename(manifest_path).replace(".json", ""))
+            description = manifest_data.get("theme_info", {}).get("name", name)
         else:
             author = manifest_data.get("component_info", {}).get("author", "Unknown")
-            description = manifest_data.get("component_info", {}).get("name", os.path.basename(manifest_path).replace(".json", ""))
+            description = manifest_data.get("component_info", {}).get("name", name)
 
         # Extract systems for overlays
         systems = None
         if "content" in manifest_data and "systems" in manifest_data["content"]:
             systems = manifest_data["content"]["systems"]
             if isinstance(systems, list):
-                systems.sort()
+                systems = sorted(systems)
 
         return {
             "author": author,
@@ -419,43 +593,13 @@ def extract_metadata_from_manifest(manifest_path):
         print(f"Error extracting metadata from manifest: {e}")
         return {
             "author": "Unknown",
-            "description": os.path.basename(manifest_path).replace(".json", ""),
+            "description": name,
             "systems": None
         }
 
-def update_catalog(submission, preview_path, manifest_path, package_url):
-    """Update catalog.json with the new entry"""
-    catalog_path = CATALOG_DIR / "catalog.json"
-
-    # Create catalog.json if it doesn't exist
-    if not catalog_path.exists():
-        initial_catalog = {
-            "last_updated": datetime.utcnow().isoformat() + "Z",
-            "themes": {},
-            "components": {
-                "accents": {},
-                "leds": {},
-                "icons": {},
-                "fonts": {},
-                "wallpapers": {},
-                "overlays": {}
-            }
-        }
-        with open(catalog_path, 'w') as f:
-            json.dump(initial_catalog, f, indent=2)
-
-    # Load existing catalog
-    try:
-        with open(catalog_path, 'r') as f:
-            catalog = json.load(f)
-    except Exception as e:
-        print(f"Error loading catalog: {e}")
-        return False
-
-    # Extract metadata from manifest (but use submission author as primary source)
-    manifest_full_path = REPO_ROOT / manifest_path
-    metadata = extract_metadata_from_manifest(manifest_full_path)
-
+@PROFILER.stage()
+def update_catalog(catalog, submission, preview_path, manifest_path, package_url, metadata, thumbnails=None, source=None):
+    """Update the in-memory catalog with the new entry"""
     # Create entry - Use author from submission (prioritize it over manifest)
     entry = {
         "preview_path": preview_path,
@@ -463,7 +607,7 @@ def update_catalog(submission, preview_path, manifest_path, package_url):
         "author": submission["author"],  # Use author from submission
         "description": metadata["description"],
         "URL": package_url,
-        "last_updated": datetime.utcnow().isoformat() + "Z"
+        "last_updated": utc_timestamp()
     }
 
     # Add repository info if it's a repository submission
@@ -475,59 +619,74 @@ def update_catalog(submission, preview_path, manifest_path, package_url):
         else:
             entry["branch"] = "main"
 
+    # Add resized previews (smallest first) so clients can pick the smallest image that fits
+    if thumbnails:
+        entry["thumbnails"] = sorted(thumbnails, key=lambda t: (t["width"], t["format"]))
+
     # Add systems for overlays
     if submission["type"] == "overlay" and metadata["systems"]:
         entry["systems"] = metadata["systems"]
 
-    # Update catalog
-    name = submission["name"]
-    component_type = submission["type"]
-
-    if component_type == "theme":
-        # Add to themes section at the beginning
-        themes = catalog.get("themes", {})
-
-        # Create a new dictionary with the new entry first
-        new_themes = {name: entry}
-
-        # Add all other entries
-        for theme_name, theme_info in themes.items():
-            if theme_name != name:  # Skip the current one if it exists
-                new_themes[theme_name] = theme_info
+    # Fingerprint of what was ingested, so an unchanged resubmission can be skipped
+    if source:
+        entry["source"] = source
 
-        catalog["themes"] = new_themes
-    else:
-        # Add to components section at the beginning
-        # Use the consistent mapping instead of deriving from file extension
-        comp_type_key = CATALOG_COMPONENT_KEYS[component_type]
-        components = catalog.get("components", {}).get(comp_type_key, {})
-
-        # Create a new dictionary with the new entry first
-        new_components = {name: entry}
-
-        # Add all other entries
-        for comp_name, comp_info in components.items():
-            if comp_name != name:  # Skip the current one if it exists
-                new_components[comp_name] = comp_info
-
-        catalog["components"][comp_type_key] = new_components
+    # Add to the beginning of its section (themes or components)
+    name = submission["name"]
+    catalog.put_first(section_for_type(submission["type"]), name, entry)
+    print(f"Updated catalog with {name}")
+    return True
 
-    # Update last_updated timestamp
-    catalog["last_updated"] = datetime.utcnow().isoformat() + "Z"
+def fetch_submission(submission, previous=None):
+    """
+    Fetch the network part of a submission (safe to run on a fetch thread): a URL is downloaded
+    into the cache, a repository commit is fetched into its mirror. Zip uploads need no fetch.
+    Returns a dict for the packaging step, with "unchanged" set when the source matches the
+    previous fingerprint; raises on failure.
+    """
+    url = submission.get("url")
+    if submission["submission_method"] == "url":
+        # Ask the server first, so an unchanged URL is not even downloaded
+        if previous is not None and previous.get("url") == url:
+            if check_not_modified(url, previous.get("etag"), previous.get("last_modified")):
+                print(f"Not modified since last ingest: {url}")
+                return {"unchanged": True, "source": previous}
+
+        # Downloads live in the cache so an unchanged URL is revalidated with a conditional GET
+        staged_path = CACHE_DIR / "downloads" / f"{submission['name']}.zip"
+        print(f"Starting download from {url}")
+        result = download(url, staged_path, cache_dir=CACHE_DIR / "http", max_size=MAX_DOWNLOAD_SIZE)
+        source = {"method": "url", "url": url, "sha256": result["sha256"],
+                  "etag": result.get("etag"), "last_modified": result.get("last_modified")}
+        if previous is not None and previous.get("sha256") == result["sha256"]:
+            print(f"Download of {url} is identical to the last ingest")
+            return {"unchanged": True, "source": source}
+        return dict(result, source=source)
 
-    # Save catalog
-    try:
-        with open(catalog_path, 'w') as f:
-            json.dump(catalog, f, indent=2)
-        print(f"Updated catalog.json with {name}")
-        return True
-    except Exception as e:
-        print(f"Error saving catalog: {e}")
-        return False
+    if submission["submission_method"] == "repository":
+        # Fetch only the requested commit (depth 1) into the cached bare mirror
+        mirror, sha = MIRROR_CACHE.fetch(url, submission["commit"], submission["branch"])
+        return {"mirror": mirror, "sha": sha, "source": {"method": "repository", "url": url, "commit": sha}}
+
+    return {}
+
+def refresh_entry(catalog, submission, source):
+    """Update the fields of an unchanged entry that come from the submission rather than the package"""
+    entry = catalog.get(section_for_type(submission["type"]), submission["name"])
+    if entry["author"] != submission["author"]:
+        entry["author"] = submission["author"]
+        entry["last_updated"] = utc_timestamp()
+        catalog.touch()
+        print(f"Updated author of {submission['name']}")
+    if entry.get("source") != source:
+        # Same bytes, new validators (or a fingerprint recorded for an older entry); the
+        # fingerprint is not part of the entry hash, so this is saved without a change record
+        entry["source"] = source
+        catalog.mark_dirty()
 
 # Add a new function to process URL-based submissions
-def process_url_submission(submission):
-    """Process a submission with a direct download URL"""
+def process_url_submission(submission, catalog, fetched):
+    """Process a submission with a direct download URL (already downloaded by fetch_submission)"""
     name = submission["name"]
     component_type = submission["type"]
     download_url = submission["url"]
@@ -535,175 +694,289 @@ def process_url_submission(submission):
     print(f"Processing URL submission: {name}")
     print(f"Download URL: {download_url}")
 
-    # Clean up existing entry
-    clean_existing_entry(submission)
-
-    # Create a temporary file to download the zip
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-        temp_path = temp_file.name
-        print(f"Downloading to temporary file: {temp_path}")
-
-        try:
-            # Create SSL context that ignores certificate validation for some hosting services
-            context = ssl._create_unverified_context()
-
-            # Download the file
-            print(f"Starting download from {download_url}")
-            urllib.request.urlretrieve(download_url, temp_path)
-            print(f"Download complete: {os.path.getsize(temp_path)} bytes")
-
+    try:
+        with PackageIndex.open(fetched["path"], package_name=name) as index:
             # Validate package contents
-            if not validate_package_contents(temp_path):
-                os.unlink(temp_path)
-                return False
+            if not validate_package_contents(index, component_type):
+                return None
 
+            # Clean up existing entry
+            clean_existing_entry(submission, catalog)
 
-            # Copy to Packages directory
+            # Link the download into the Packages directory through the blob store (no copy)
             package_dir = PACKAGES_DIR / (component_type + "s")  # Add 's' to get themes, wallpapers, etc.
             os.makedirs(package_dir, exist_ok=True)
-
             package_path = package_dir / f"{name}.zip"
-            shutil.copy2(temp_path, package_path)
-            print(f"Copied to {package_path}")
+            BLOB_STORE.link(BLOB_STORE.adopt(fetched["path"]), package_path)
 
             # Extract package to Catalog
             catalog_type_dir = CATALOG_DIR_MAPPINGS[component_type]
             extract_dir = CATALOG_DIR / catalog_type_dir / name
             os.makedirs(extract_dir, exist_ok=True)
 
-            if not extract_package(package_path, extract_dir):
-                os.unlink(temp_path)
-                return False
+            if extract_package(index, extract_dir, owned_files(submission, extract_dir)) is None:
+                return None
 
-            # Copy to .metadata directory
-            preview_path, manifest_path = copy_to_metadata(extract_dir, component_type, name)
-            if not preview_path or not manifest_path:
-                os.unlink(temp_path)
-                return False
+        # The package itself stays byte-identical to the download, so only the extraction is optimized
+        optimize_pngs(extract_dir)
 
-            # Generate package URL (use the original download URL)
-            package_url = download_url
+        # Copy to .metadata directory
+        preview_path, manifest_path, thumbnails = copy_to_metadata(extract_dir, component_type, name)
+        if not preview_path or not manifest_path:
+            return None
 
-            # Update catalog
-            if not update_catalog(submission, preview_path, manifest_path, package_url):
-                os.unlink(temp_path)
-                return False
+        # Generate package URL (use the original download URL)
+        package_url = download_url
 
-            print(f"Successfully processed zip_url submission: {name}")
-            os.unlink(temp_path)
-            return True
-        except Exception as e:
-            print(f"Error processing zip_url submission: {e}")
-            os.unlink(temp_path)
-            return False
+        print(f"Successfully processed zip_url submission: {name}")
+        return make_result(submission, index, preview_path, manifest_path, package_url, thumbnails, fetched["source"])
+    except PackageIndexError as e:
+        print(f"Error: {e}")
+        return None
+    except Exception as e:
+        print(f"Error processing zip_url submission: {e}")
+        return None
 
-def process_repository_submission(submission):
-    """Process a repository submission"""
+def process_repository_submission(submission, catalog, fetched):
+    """Process a repository submission (its commit already fetched by fetch_submission)"""
     name = submission["name"]
     component_type = submission["type"]
-    repo_url = submission["url"]  # Changed from repository_url to url
-    commit = submission["commit"]
-    branch = submission["branch"]
 
     print(f"Processing repository submission: {name}")
 
-    # Clean up existing entry
-    clean_existing_entry(submission)
-
-    # Create a temporary directory for cloning
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Clone repository
-        if not clone_repository(repo_url, commit, branch, temp_dir):
-            return False
-
-        # Create a package file
-        package_dir = PACKAGES_DIR / (component_type + "s")  # Add 's' to get themes, wallpapers, etc.
-        os.makedirs(package_dir, exist_ok=True)
+    # Validate package contents from the tree listing, before touching the existing entry
+    tree, index = index_tree(fetched["mirror"], fetched["sha"], name)
+    if index is None or not validate_package_contents(index, component_type):
+        return None
 
-        package_path = package_dir / f"{name}.zip"
-        if not create_zip_file(temp_dir, package_path):
-            return False
+    # Clean up existing entry
+    clean_existing_entry(submission, catalog)
 
-        # Validate package contents
-        if not validate_package_contents(package_path):
-            return False
+    # Build the package zip and the Catalog extraction straight from the commit's tree
+    package_dir = PACKAGES_DIR / (component_type + "s")  # Add 's' to get themes, wallpapers, etc.
+    os.makedirs(package_dir, exist_ok=True)
+    package_path = package_dir / f"{name}.zip"
 
-        # Extract package to Catalog
-        catalog_type_dir = CATALOG_DIR_MAPPINGS[component_type]
-        extract_dir = CATALOG_DIR / catalog_type_dir / name
-        os.makedirs(extract_dir, exist_ok=True)
+    catalog_type_dir = CATALOG_DIR_MAPPINGS[component_type]
+    extract_dir = CATALOG_DIR / catalog_type_dir / name
+    os.makedirs(extract_dir, exist_ok=True)
 
-        if not extract_package(package_path, extract_dir):
-            return False
+    if not build_package_from_tree(fetched["mirror"], fetched["sha"], tree, index, package_path, extract_dir,
+                                   owned_files(submission, extract_dir)):
+        return None
 
-        # Copy to .metadata directory
-        preview_path, manifest_path = copy_to_metadata(extract_dir, component_type, name)
-        if not preview_path or not manifest_path:
-            return False
+    optimize_pngs(extract_dir, package_path)
 
-        # Generate package URL
-        package_url = f"https://github.com/Leviathanium/NextUI-Themes/raw/main/Packages/{component_type}s/{name}.zip"
+    # Copy to .metadata directory
+    preview_path, manifest_path, thumbnails = copy_to_metadata(extract_dir, component_type, name)
+    if not preview_path or not manifest_path:
+        return None
 
-        # Update catalog
-        if not update_catalog(submission, preview_path, manifest_path, package_url):
-            return False
+    # Generate package URL
+    package_url = f"https://github.com/Leviathanium/NextUI-Themes/raw/main/Packages/{component_type}s/{name}.zip"
 
-        print(f"Successfully processed repository submission: {name}")
-        return True
+    print(f"Successfully processed repository submission: {name}")
+    return make_result(submission, index, preview_path, manifest_path, package_url, thumbnails, fetched["source"])
 
-def process_zip_submission(submission):
+def process_zip_submission(submission, catalog, fetched=None):
     """Process a zip submission"""
     name = submission["name"]
     component_type = submission["type"]
 
     print(f"Processing zip submission: {name}")
 
-    # Clean up existing entry
-    clean_existing_entry(submission)
-
     # Source zip file
     source_zip = UPLOAD_DIR / f"{name}.zip"
 
-    # Validate package contents
-    if not validate_package_contents(source_zip):
-        return False
+    try:
+        index = PackageIndex.open(source_zip, package_name=name)
+    except (PackageIndexError, OSError) as e:
+        print(f"Error: {e}")
+        return None
 
-    # Copy to Packages directory
-    package_dir = PACKAGES_DIR / (component_type + "s")  # Add 's' to get themes, wallpapers, etc.
-    os.makedirs(package_dir, exist_ok=True)
+    with index:
+        # Validate package contents
+        if not validate_package_contents(index, component_type):
+            return None
 
-    package_path = package_dir / f"{name}.zip"
-    shutil.copy2(source_zip, package_path)
-    print(f"Copied {source_zip} to {package_path}")
+        # Clean up existing entry
+        clean_existing_entry(submission, catalog)
 
-    # Extract package to Catalog
-    catalog_type_dir = CATALOG_DIR_MAPPINGS[component_type]
-    extract_dir = CATALOG_DIR / catalog_type_dir / name
-    os.makedirs(extract_dir, exist_ok=True)
+        # Hardlink the upload into the Packages directory (copied only across filesystems); the
+        # upload is unlinked once the catalog is updated, leaving the package as the single copy
+        package_dir = PACKAGES_DIR / (component_type + "s")  # Add 's' to get themes, wallpapers, etc.
+        os.makedirs(package_dir, exist_ok=True)
 
-    if not extract_package(package_path, extract_dir):
-        return False
+        package_path = package_dir / f"{name}.zip"
+        source = {"method": "zip", "sha256": BLOB_STORE.link_file(source_zip, package_path)}
+        print(f"Placed {source_zip} at {package_path}")
+
+        # Extract package to Catalog (the index maps the upload, which is the same file as the package)
+        catalog_type_dir = CATALOG_DIR_MAPPINGS[component_type]
+        extract_dir = CATALOG_DIR / catalog_type_dir / name
+        os.makedirs(extract_dir, exist_ok=True)
+
+        if extract_package(index, extract_dir, owned_files(submission, extract_dir)) is None:
+            return None
+
+    optimize_pngs(extract_dir, package_path)
 
     # Copy to .metadata directory
-    preview_path, manifest_path = copy_to_metadata(extract_dir, component_type, name)
+    preview_path, manifest_path, thumbnails = copy_to_metadata(extract_dir, component_type, name)
     if not preview_path or not manifest_path:
-        return False
+        return None
 
     # Generate package URL
     package_url = f"https://github.com/Leviathanium/NextUI-Themes/raw/main/Packages/{component_type}s/{name}.zip"
 
-    # Update catalog
-    if not update_catalog(submission, preview_path, manifest_path, package_url):
-        return False
+    print(f"Successfully processed zip submission: {name}")
+    return make_result(submission, index, preview_path, manifest_path, package_url, thumbnails, source)
 
-    # Remove the original zip file from the Upload directory after successful processing
+def make_result(submission, index, preview_path, manifest_path, package_url, thumbnails, source):
+    """Bundle the output of a processed submission for the catalog phase"""
+    owned = owned_records(submission, index, preview_path, manifest_path, thumbnails)
+    return {
+        "submission": submission,
+        "preview_path": preview_path,
+        "manifest_path": manifest_path,
+        "package_url": package_url,
+        "thumbnails": thumbnails,
+        "source": source,
+        "metadata": extract_metadata_from_manifest(index.manifest, submission["name"]),
+        "owned": owned,
+        "images": hash_images(owned),
+        "colors": extract_palettes(owned)
+    }
+
+def make_unchanged_result(submission, source):
+    """Result for a submission whose source matches its catalog entry (nothing was rewritten)"""
+    print(f"Skipping {submission['name']}: source unchanged since the last ingest")
+    return {"submission": submission, "unchanged": True, "source": source}
+
+def ingest_submission(submission, catalog, fetched=None):
+    """Package, validate and extract a single submission, fetching it first if needed (safe to run in a worker thread)"""
     try:
-        os.remove(source_zip)
-        print(f"Removed original zip file from Upload directory: {source_zip}")
+        # Process submission based on method
+        with PROFILER.span("submission", submission=submission["name"]):
+            if fetched is None:
+                with PROFILER.span("fetch"):
+                    fetched = fetch_submission(submission)
+            if fetched.get("unchanged"):
+                result = make_unchanged_result(submission, fetched["source"])
+            elif submission["submission_method"] == "repository":
+                result = process_repository_submission(submission, catalog, fetched)
+            elif submission["submission_method"] == "zip":
+                result = process_zip_submission(submission, catalog, fetched)
+            elif submission["submission_method"] == "url":
+                result = process_url_submission(submission, catalog, fetched)
+            else:
+                result = None
+
+        if not result:
+            print(f"Failed to process {submission['submission_method']} submission: {submission['name']}")
+        return result
     except Exception as e:
-        print(f"Warning: Could not remove original zip file {source_zip}: {e}")
+        # Never let one submission take down the rest of the batch
+        print(f"Error processing submission {submission['name']}: {e}")
+        return None
+
+def ingest_all(submissions, catalog, workers, force=False):
+    """
+    Fetch every submission concurrently and package each one in the worker pool as soon as
+    its fetch lands; returns the results in submission order. Submissions whose source
+    fingerprint matches their catalog entry are not cleaned, packaged or extracted again.
+    """
+    previous = [None if force else previous_source(submission, catalog) for submission in submissions]
+
+    def fetch(i):
+        with PROFILER.span("fetch", submission=submissions[i]["name"]):
+            return fetch_submission(submissions[i], previous[i])
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+
+        def package(i, fetched, error):
+            if error is not None:
+                print(f"Error fetching {submissions[i]['name']}: {error}")
+                print(f"Failed to process {submissions[i]['submission_method']} submission: {submissions[i]['name']}")
+                return
+            futures[i] = executor.submit(ingest_submission, submissions[i], catalog, fetched)
+
+        # Unchanged commits and uploads need neither a fetch nor packaging; zip uploads
+        # are already on disk and go straight to packaging
+        jobs = []
+        for i, submission in enumerate(submissions):
+            source = unchanged_source(submission, previous[i])
+            if source is not None:
+                results[i] = make_unchanged_result(submission, source)
+            elif submission["submission_method"] in ("url", "repository"):
+                jobs.append((i, submission["url"]))
+            else:
+                package(i, {}, None)
+
+        run_fetches(jobs, fetch, package, FETCH_CONCURRENCY, FETCH_PER_HOST)
+        for i, future in futures.items():
+            results[i] = future.result()
+    return [results.get(i) for i in range(len(submissions))]
+
+def plan_submission(submission, catalog, force=False):
+    """Return (action, reason) describing what ingesting a submission would do, without writing anything"""
+    entry = catalog.get(section_for_type(submission["type"]), submission["name"])
+    if entry is None:
+        return "add", "not in the catalog"
+    if force:
+        return "update", "--force"
+    previous = previous_source(submission, catalog)
+    if previous is None:
+        stored = stored_source(entry)
+        if stored is not None and stored.get("method") == submission["submission_method"]:
+            return "update", "files of the existing entry are missing"
+        return "update", "no comparable source fingerprint"
+    if unchanged_source(submission, previous) is not None:
+        return "skip", "source unchanged"
+    if submission["submission_method"] == "url":
+        if previous.get("url") != submission["url"]:
+            return "update", "different URL"
+        not_modified = check_not_modified(submission["url"], previous.get("etag"), previous.get("last_modified"))
+        if not_modified:
+            return "skip", "server reports not modified"
+        if not_modified is None:
+            return "update", "server cannot confirm; would download and compare hashes"
+        return "update", "server reports a change; would download and compare hashes"
+    if submission["submission_method"] == "repository":
+        return "update", f"commit {previous.get('commit', '')[:12]} -> {submission['commit'][:12]}"
+    return "update", "upload differs from the ingested zip"
+
+def apply_result(result, catalog):
+    """Apply a processed submission to the catalog (must run serially)"""
+    submission = result["submission"]
+    with PROFILER.span("apply_result", submission=submission["name"]):
+        if result.get("unchanged"):
+            refresh_entry(catalog, submission, result["source"])
+        elif not update_catalog(catalog, submission, result["preview_path"], result["manifest_path"],
+                                result["package_url"], result["metadata"], result["thumbnails"], result["source"]):
+            print(f"Failed to update catalog for submission: {submission['name']}")
+            return False
+        else:
+            REGISTRY.set(section_for_type(submission["type"]), submission["name"], result["owned"])
+            if result["images"] is not None:
+                # Warn about artwork that is (nearly) the same as another entry's
+                key = entry_key(section_for_type(submission["type"]), submission["name"])
+                report_near_duplicates(IMAGE_INDEX, key, result["images"])
+                IMAGE_INDEX.set_entry(key, result["images"])
+            if result["colors"] is not None:
+                COLOR_INDEX.set_entry(entry_key(section_for_type(submission["type"]), submission["name"]), result["colors"])
+
+    # Remove the original zip file from the Upload directory after successful processing
+    if submission["submission_method"] == "zip":
+        source_zip = UPLOAD_DIR / f"{submission['name']}.zip"
+        try:
+            os.remove(source_zip)
+            print(f"Removed original zip file from Upload directory: {source_zip}")
+        except Exception as e:
+            print(f"Warning: Could not remove original zip file {source_zip}: {e}")
 
-    print(f"Successfully processed zip submission: {name}")
     return True
 
 def reset_push_json():
@@ -721,16 +994,88 @@ def reset_push_json():
         print(f"Error resetting push.json: {e}")
         return False
 
-def main():
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Process submissions listed in Upload/push.json")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of submissions to package in parallel (default: {DEFAULT_WORKERS}, 1 = sequential)")
+    parser.add_argument("--fetch-concurrency", type=int, default=FETCH_CONCURRENCY,
+                        help="Downloads and git fetches running at the same time")
+    parser.add_argument("--fetch-per-host", type=int, default=FETCH_PER_HOST,
+                        help="Downloads and git fetches running at the same time against one host")
+    parser.add_argument("--max-download-mb", type=int, default=MAX_DOWNLOAD_SIZE // (1024 * 1024),
+                        help="Largest package accepted from a URL submission, in MB")
+    parser.add_argument("--max-package-mb", type=int, default=PACKAGE_LIMITS.max_total_bytes // (1024 * 1024),
+                        help="Largest total uncompressed size of a package, in MB")
+    parser.add_argument("--max-package-files", type=int, default=PACKAGE_LIMITS.max_files,
+                        help="Most files a package may contain")
+    parser.add_argument("--max-path-depth", type=int, default=PACKAGE_LIMITS.max_depth,
+                        help="Deepest directory nesting allowed inside a package")
+    parser.add_argument("--max-compression-ratio", type=int, default=PACKAGE_LIMITS.max_ratio,
+                        help="Highest uncompressed/compressed ratio allowed for a single (large) zip entry")
+    parser.add_argument("--mirror-cache-mb", type=int, default=DEFAULT_MIRROR_CACHE_BYTES // (1024 * 1024),
+                        help="Size bound of the repository mirror cache, in MB")
+    parser.add_argument("--zip-level", type=int, default=ZIP_LEVEL,
+                        help="DEFLATE level (0-9) for compressible files in packages built from repositories")
+    parser.add_argument("--optimize-png", action="store_true",
+                        help="Losslessly recompress PNGs in extracted packages and hosted package zips")
+    parser.add_argument("--no-thumbnails", action="store_true",
+                        help="Don't generate resized PNG/WebP previews")
+    parser.add_argument("--no-image-hashes", action="store_true",
+                        help="Don't hash previews and wallpapers for near-duplicate detection")
+    parser.add_argument("--no-palettes", action="store_true",
+                        help="Don't extract palettes and luminance of previews and wallpapers for color search")
+    parser.add_argument("--plan", action="store_true",
+                        help="List what each submission would change, without fetching packages or writing anything")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess submissions even when their source fingerprint is unchanged")
+    parser.add_argument("--full-extract", action="store_true",
+                        help="Wipe and rewrite extracted Catalog directories instead of updating only changed files")
+    parser.add_argument("--profile", nargs="?", const=str(CACHE_DIR / "profile.json"), default=None, metavar="PATH",
+                        help="Measure each stage and submission and write a JSON run report "
+                             f"(default path: {CACHE_DIR / 'profile.json'})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function to process push.json"""
+    args = parse_args(argv)
+    if args.profile:
+        PROFILER.start()
+    try:
+        return run(args)
+    finally:
+        # Per-stage timing and memory report (also for --plan and runs that stop early)
+        if PROFILER.enabled:
+            print(PROFILER.summary_table())
+            try:
+                PROFILER.write_report(args.profile, argv)
+                print(f"Wrote profile report to {args.profile}")
+            except OSError as e:
+                print(f"Warning: Could not write profile report: {e}")
+            PROFILER.stop()
+
+def run(args):
+    """Process push.json with parsed arguments; returns True if every submission succeeded"""
+    global INCREMENTAL_EXTRACT, MAX_DOWNLOAD_SIZE, ZIP_LEVEL, PROCESS_POOL, MAKE_THUMBNAILS, PNG_OPTIMIZER
+    global FETCH_CONCURRENCY, FETCH_PER_HOST, PACKAGE_LIMITS, REGISTRY, IMAGE_INDEX, COLOR_INDEX
+
+    INCREMENTAL_EXTRACT = not args.full_extract
+    MAX_DOWNLOAD_SIZE = args.max_download_mb * 1024 * 1024
+    PACKAGE_LIMITS = PackageLimits(args.max_package_mb * 1024 * 1024, args.max_package_files,
+                                   args.max_path_depth, args.max_compression_ratio)
+    MIRROR_CACHE.max_bytes = args.mirror_cache_mb * 1024 * 1024
+    ZIP_LEVEL = args.zip_level
+    FETCH_CONCURRENCY = args.fetch_concurrency
+    FETCH_PER_HOST = args.fetch_per_host
     print("Starting push.json processing")
 
     # Create necessary directories
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    os.makedirs(PACKAGES_DIR, exist_ok=True)
-    os.makedirs(CATALOG_DIR, exist_ok=True)
-    os.makedirs(METADATA_DIR / "previews", exist_ok=True)
-    os.makedirs(METADATA_DIR / "manifests", exist_ok=True)
+    if not args.plan:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        os.makedirs(PACKAGES_DIR, exist_ok=True)
+        os.makedirs(CATALOG_DIR, exist_ok=True)
+        os.makedirs(METADATA_DIR / "previews", exist_ok=True)
+        os.makedirs(METADATA_DIR / "manifests", exist_ok=True)
 
     # Load push.json
     push_data = load_push_json()
@@ -743,28 +1088,155 @@ def main():
         print("No submissions found in push.json")
         return True
 
-    # Process each submission
+    # Validate submissions up front
     success = True
+    submissions = []
     for submission in push_data["submission"]:
-        # Validate submission
         if not validate_submission(submission):
             print(f"Validation failed for submission: {submission.get('name', 'unknown')}")
             success = False
             continue
+        submissions.append(submission)
 
-        # Process submission based on method
-        if submission["submission_method"] == "repository":
-            if not process_repository_submission(submission):
-                print(f"Failed to process repository submission: {submission['name']}")
-                success = False
-        elif submission["submission_method"] == "zip":
-            if not process_zip_submission(submission):
-                print(f"Failed to process zip submission: {submission['name']}")
-                success = False
-        elif submission["submission_method"] == "url":
-            if not process_url_submission(submission):
-                print(f"Failed to process URL submission: {submission['name']}")
-                success = False
+    # Only the last submission for a given name is processed, since workers for the
+    # same name would otherwise write to the same Packages/Catalog/.metadata paths
+    last_index = {submission["name"]: i for i, submission in enumerate(submissions)}
+    for i, submission in enumerate(submissions):
+        if last_index[submission["name"]] != i:
+            print(f"Skipping {submission['name']}: superseded by a later submission in push.json")
+    submissions = [s for i, s in enumerate(submissions) if last_index[s["name"]] == i]
+
+    # Load the catalog once; workers only read it, the serial phase below edits it
+    try:
+        catalog = Catalog.load(CATALOG_PATH)
+    except Exception as e:
+        print(f"Error loading catalog: {e}")
+        return False
+    REGISTRY = OwnershipRegistry.load(REGISTRY_PATH, REPO_ROOT)
+
+    # Thumbnails and PNG optimization are CPU bound, so they run in worker processes
+    workers = max(1, args.workers)
+    MAKE_THUMBNAILS = False
+    if not args.no_thumbnails:
+        if pillow_available():
+            MAKE_THUMBNAILS = True
+        else:
+            print("Pillow is not installed, skipping preview thumbnails")
+
+    # Dry run: report what would happen to each submission and stop before writing anything
+    if args.plan:
+        for submission in submissions:
+            action, reason = plan_submission(submission, catalog, args.force)
+            print(f"Plan: {action:<6} {submission['name']} ({submission['submission_method']}): {reason}")
+        return success
+
+    # Perceptual hashes need NumPy and Pillow
+    IMAGE_INDEX = None
+    if not args.no_image_hashes:
+        if hashing_available():
+            IMAGE_INDEX = ImageHashIndex.load(IMAGE_HASHES_PATH)
+        else:
+            print("NumPy or Pillow is not installed, skipping perceptual image hashes")
+
+    # So do palettes
+    COLOR_INDEX = None
+    if not args.no_palettes:
+        if palettes_available():
+            COLOR_INDEX = ColorIndex.load(COLORS_PATH)
+        else:
+            print("NumPy or Pillow is not installed, skipping palette extraction")
+
+    if MAKE_THUMBNAILS or args.optimize_png or IMAGE_INDEX is not None or COLOR_INDEX is not None:
+        PROCESS_POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        # Fork the workers now, while this is the only thread: a worker forked while a fetch
+        # thread is starting git would inherit the pipe that subprocess waits on and hang it
+        PROCESS_POOL.submit(int).result()
+    if args.optimize_png:
+        PNG_OPTIMIZER = PngOptimizer(PngCache(CACHE_DIR / "png" / "cache.json"), BLOB_STORE, PROCESS_POOL)
+
+    # Fetch everything up front; package, validate and extract in a bounded worker pool as fetches land
+    print(f"Processing {len(submissions)} submission(s) with {workers} worker(s), "
+          f"up to {FETCH_CONCURRENCY} concurrent fetch(es)")
+    try:
+        results = ingest_all(submissions, catalog, workers, args.force)
+    finally:
+        if PROCESS_POOL is not None:
+            PROCESS_POOL.shutdown()
+            PROCESS_POOL = None
+        if PNG_OPTIMIZER is not None:
+            print(PNG_OPTIMIZER.summary())
+            PNG_OPTIMIZER.cache.save()
+            PNG_OPTIMIZER = None
+
+    # Apply catalog changes serially, in push.json order
+    for result in results:
+        if not result or not apply_result(result, catalog):
+            success = False
+
+    # Write catalog.json once, and only if something changed
+    try:
+        with PROFILER.span("save_catalog"):
+            if catalog.save():
+                print(f"Saved {CATALOG_PATH}")
+    except Exception as e:
+        print(f"Error saving catalog: {e}")
+        success = False
+
+    # Record which files each entry owns, so the next cleanup is an exact lookup
+    try:
+        with PROFILER.span("save_registry"):
+            if REGISTRY.save():
+                print(f"Saved {REGISTRY_PATH}")
+    except Exception as e:
+        print(f"Error saving ownership registry: {e}")
+        success = False
+
+    # Perceptual hashes of the new previews and wallpapers
+    if IMAGE_INDEX is not None:
+        try:
+            with PROFILER.span("save_image_hashes"):
+                if IMAGE_INDEX.save():
+                    print(f"Saved {IMAGE_HASHES_PATH}")
+        except Exception as e:
+            print(f"Error saving image hash index: {e}")
+            success = False
+
+    # Color index for the gallery and the Theme Manager
+    if COLOR_INDEX is not None:
+        try:
+            with PROFILER.span("save_colors"):
+                if COLOR_INDEX.save():
+                    print(f"Saved {COLORS_PATH}")
+        except Exception as e:
+            print(f"Error saving color index: {e}")
+            success = False
+
+    # Compact binary copy for the Theme Manager (rewritten only when its bytes change)
+    try:
+        with PROFILER.span("export_binary_catalog"):
+            if catalog_binary.export(catalog, REPO_ROOT, CATALOG_BINARY_PATH):
+                print(f"Saved {CATALOG_BINARY_PATH}")
+    except Exception as e:
+        print(f"Error exporting binary catalog: {e}")
+        success = False
+
+    # Keep the repository mirror cache within its size bound
+    try:
+        with PROFILER.span("evict_mirrors"):
+            MIRROR_CACHE.evict()
+    except Exception as e:
+        print(f"Warning: Could not evict repository mirrors: {e}")
+
+    # Report deduplication and drop blobs nothing links to or references any more
+    print(BLOB_STORE.summary())
+    try:
+        with PROFILER.span("prune_blobs"):
+            keep = REGISTRY.blob_hashes() | PngCache(CACHE_DIR / "png" / "cache.json").blob_hashes()
+            pruned_files, pruned_bytes = BLOB_STORE.prune(keep)
+        if pruned_files:
+            print(f"Pruned {pruned_files} unreferenced blob(s) ({pruned_bytes} bytes) from {BLOB_STORE.root}")
+    except Exception as e:
+        print(f"Warning: Could not prune blob store: {e}")
 
     # Reset push.json if all submissions were processed successfully
     if success:
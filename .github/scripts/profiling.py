@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Span-based timing and resource instrumentation for the ingest scripts.
+
+Code marks its stages with PROFILER.span("name") (or the PROFILER.stage
+decorator). Nothing is measured until PROFILER.start() is called, so the
+spans cost a function call when profiling is off. When it is on, each span
+records:
+
+    wall_seconds     elapsed time
+    bytes_read       bytes read/written by this process during the span
+    bytes_written    (rchar/wchar from /proc/self/io; Linux only, else null)
+    files_touched    distinct paths opened, renamed, linked or removed by the span's thread
+    peak_memory      highest Python heap usage during the span (tracemalloc)
+
+I/O counters and memory are process-wide, so with several worker threads a
+span also includes what concurrent submissions did meanwhile. Work done in
+child processes (git, the thumbnail and PNG process pool) only shows up as
+wall time.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+# Audit events that touch a file, and the position of the path in their arguments
+FILE_EVENTS = {
+    "open": (0,),
+    "os.remove": (0,),
+    "os.rename": (0, 1),
+    "os.link": (0, 1),
+    "os.truncate": (0,),
+    "shutil.copyfile": (0, 1),
+    "shutil.rmtree": (0,)
+}
+
+
+def read_proc_io():
+    """Return (bytes read, bytes written) of this process, or (None, None) without /proc"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def format_bytes(value):
+    """Format a byte count for the summary table"""
+    if value is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+class Span:
+    """One measured interval"""
+
+    def __init__(self, span_id, name, parent, submission):
+        self.id = span_id
+        self.name = name
+        self.parent = parent
+        self.submission = submission
+        self.thread = threading.current_thread().name
+        self.files = set()
+        self.error = None
+        self.start = time.perf_counter()
+        self.io_start = read_proc_io()
+        self.peak_memory = 0
+        self.wall_seconds = None
+        self.bytes_read = None
+        self.bytes_written = None
+
+    def finish(self):
+        """Record the span's duration and I/O"""
+        self.wall_seconds = time.perf_counter() - self.start
+        read, written = read_proc_io()
+        if read is not None and self.io_start[0] is not None:
+            self.bytes_read = read - self.io_start[0]
+            self.bytes_written = written - self.io_start[1]
+
+    def to_dict(self, origin):
+        """Return the span as a report record"""
+        return OrderedDict([
+            ("id", self.id),
+            ("parent", self.parent),
+            ("name", self.name),
+            ("submission", self.submission),
+            ("thread", self.thread),
+            ("start", round(self.start - origin, 6)),
+            ("wall_seconds", round(self.wall_seconds, 6)),
+            ("bytes_read", self.bytes_read),
+            ("bytes_written", self.bytes_written),
+            ("files_touched", len(self.files)),
+            ("peak_memory", self.peak_memory),
+            ("error", self.error)
+        ])
+
+
+class Profiler:
+    """Collects spans from any thread and turns them into a run report"""
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open = []  # Spans in progress in any thread (for folding memory peaks)
+        self._hooked = False
+        self._origin = None
+        self._started_at = None
+        self._io_origin = (None, None)
+
+    def start(self):
+        """Start measuring (tracemalloc and the file audit hook stay active for the rest of the process)"""
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if not self._hooked:
+            # Audit hooks cannot be removed, so the hook checks self.enabled itself
+            sys.addaudithook(self._audit)
+            self._hooked = True
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._started_at = time.time()
+        self._io_origin = read_proc_io()
+        self.enabled = True
+
+    def stop(self):
+        """Stop measuring"""
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _stack(self):
+        """Return the calling thread's stack of open spans"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _audit(self, event, args):
+        """Attribute file operations to the open spans of the calling thread"""
+        positions = FILE_EVENTS.get(event)
+        if positions is None or not self.enabled:
+            return
+        stack = getattr(self._local, "stack", None)
+        if not stack:
+            return
+        for position in positions:
+            if position >= len(args):
+                continue
+            path = args[position]
+            if isinstance(path, (str, bytes, os.PathLike)):
+                path = os.fsdecode(path)
+                if path.startswith("/proc/"):
+                    continue  # Our own counter reads
+                for span in stack:
+                    span.files.add(path)
+
+    def _fold_peak(self):
+        """Credit the heap peak since the last reset to every open span, then reset it"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for span in self._open:
+            span.peak_memory = max(span.peak_memory, peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def span(self, name, submission=None):
+        """Measure a block; nested spans inherit the submission of the enclosing span"""
+        if not self.enabled:
+            yield None
+            return
+
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        if submission is None and parent is not None:
+            submission = parent.submission
+
+        with self._lock:
+            self._fold_peak()
+            span = Span(len(self.spans), name, parent.id if parent else None, submission)
+            span.peak_memory = tracemalloc.get_traced_memory()[0]
+            self.spans.append(span)
+            self._open.append(span)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            span.finish()
+            with self._lock:
+                self._fold_peak()
+                self._open.remove(span)
+
+    def stage(self, name=None):
+        """Decorator that runs a function inside a span named after it"""
+        def decorator(function):
+            span_name = name or function.__name__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.span(span_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stage_totals(self):
+        """Aggregate the spans per stage name, in order of first appearance"""
+        totals = OrderedDict()
+        for span in self.spans:
+            if span.wall_seconds is None:
+                continue
+            total = totals.setdefault(span.name, OrderedDict([
+                ("count", 0), ("wall_seconds", 0.0), ("max_seconds", 0.0),
+                ("bytes_read", None), ("bytes_written", None), ("files_touched", 0), ("peak_memory", 0)
+            ]))
+            total["count"] += 1
+            total["wall_seconds"] += span.wall_seconds
+            total["max_seconds"] = max(total["max_seconds"], span.wall_seconds)
+            if span.bytes_read is not None:
+                total["bytes_read"] = (total["bytes_read"] or 0) + span.bytes_read
+                total["bytes_written"] = (total["bytes_written"] or 0) + span.bytes_written
+            total["files_touched"] += len(span.files)
+            total["peak_memory"] = max(total["peak_memory"], span.peak_memory)
+        for total in totals.values():
+            total["wall_seconds"] = round(total["wall_seconds"], 6)
+            total["max_seconds"] = round(total["max_seconds"], 6)
+        return totals
+
+    def report(self, argv=None):
+        """Return the run report as a dict"""
+        read, written = read_proc_io()
+        io_origin = self._io_origin
+        return OrderedDict([
+            ("started", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._started_at or time.time()))),
+            ("argv", list(sys.argv[1:] if argv is None else argv)),
+            ("wall_seconds", round(time.perf_counter() - self._origin, 6) if self._origin else None),
+            ("bytes_read", read - io_origin[0] if read is not None and io_origin[0] is not None else None),
+            ("bytes_written", written - io_origin[1] if written is not None and io_origin[1] is not None else None),
+            ("peak_memory", tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None),
+            ("stages", self.stage_totals()),
+            ("spans", [span.to_dict(self._origin) for span in self.spans if span.wall_seconds is not None])
+        ])
+
+    def write_report(self, path, argv=None):
+        """Write the run report as JSON"""
+        path = Path(path)
+        os.makedirs(path.parent, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(argv), f, indent=2)
+
+    def summary_table(self):
+        """Return the per-stage totals as a text table"""
+        rows = [("stage", "count", "total s", "max s", "read", "written", "files", "peak mem")]
+        for name, total in self.stage_totals().items():
+            rows.append((
+                name,
+                str(total["count"]),
+                f"{total['wall_seconds']:.3f}",
+                f"{total['max_seconds']:.3f}",
+                format_bytes(total["bytes_read"]),
+                format_bytes(total["bytes_written"]),
+                str(total["files_touched"]),
+                format_bytes(total["peak_memory"])
+            ))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = []
+        for i, row in enumerate(rows):
+            cells = [row[0].ljust(widths[0])] + [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+            lines.append("  ".join(cells))
+            if i == 0:
+                lines.append("  ".join("-" * width for width in widths))
+        return "\n".join(lines)
+
+
+# Shared instance used by the ingest scripts
+PROFILER = Profiler()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of bare git mirrors for repository submissions.
+
+Each submitted repository gets one bare mirror (keyed by URL) under the cache
+directory. Only the requested commit is fetched, at depth 1, and pinned under
+refs/pins/ so later submissions from the same repository fetch only new objects.
+The cache is bounded by size with least-recently-used eviction. Packages are
+built by streaming blobs out of the mirror, so no working tree is ever checked out.
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+# Default size bound for all mirrors together
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GiB
+
+# File inside each mirror whose mtime records when it was last used
+LAST_USED_MARKER = "ingest-last-used"
+
+# Commits come from push.json, so only plain (possibly abbreviated) hex SHAs reach git
+COMMIT_PATTERN = re.compile(r"[0-9a-fA-F]{7,40}")
+
+
+class MirrorError(Exception):
+    """Raised when a repository or commit cannot be fetched"""
+
+
+def git(*args, cwd=None, check=True):
+    """Run a git command and return its stdout"""
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise MirrorError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+def directory_size(path):
+    """Return the total size of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorCache:
+    """Size-bounded LRU cache of bare, shallow git mirrors keyed by repository URL"""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._mirror_locks = {}
+        self._used = set()
+
+    def mirror_path(self, repo_url):
+        """Return the mirror directory for a repository URL"""
+        key = hashlib.sha256(repo_url.strip().rstrip("/").encode("utf-8")).hexdigest()[:24]
+        return self.root / f"{key}.git"
+
+    def _mirror_lock(self, mirror):
+        """Return the lock serializing git operations on one mirror"""
+        with self._lock:
+            return self._mirror_locks.setdefault(str(mirror), threading.Lock())
+
+    def _has_commit(self, mirror, commit):
+        """Return the full SHA if the mirror already has the commit, else None"""
+        sha = git("rev-parse", "--verify", "--quiet", "--end-of-options", f"{commit}^{{commit}}", cwd=mirror, check=False)
+        return sha or None
+
+    def fetch(self, repo_url, commit, branch=None):
+        """Make sure the mirror for repo_url contains commit; returns (mirror path, full commit SHA)"""
+        if not isinstance(commit, str) or not COMMIT_PATTERN.fullmatch(commit):
+            raise MirrorError(f"Invalid commit {commit!r}: expected a 7-40 character hexadecimal SHA")
+        mirror = self.mirror_path(repo_url)
+        with self._mirror_lock(mirror):
+            if not (mirror / "HEAD").exists():
+                os.makedirs(mirror, exist_ok=True)
+                git("init", "--bare", "--quiet", cwd=mirror)
+                git("remote", "add", "origin", repo_url, cwd=mirror)
+                # No auto-gc pauses during ingest; refs/pins/* keep fetched commits reachable
+                git("config", "gc.auto", "0", cwd=mirror)
+
+            sha = self._has_commit(mirror, commit)
+            if sha:
+                print(f"Mirror cache hit for {repo_url} at {commit}")
+            else:
+                sha = self._fetch_commit(mirror, repo_url, commit, branch)
+
+            with self._lock:
+                self._used.add(str(mirror))
+            (mirror / LAST_USED_MARKER).touch()
+            return mirror, sha
+
+    def _fetch_commit(self, mirror, repo_url, commit, branch):
+        """Fetch a single commit at depth 1, falling back to the branch history"""
+        print(f"Fetching {repo_url} at {commit} (depth 1)")
+        result = subprocess.run(
+            ["git", "fetch", "--quiet", "--depth", "1", "--end-of-options", "origin", f"{commit}:refs/pins/{commit}"],
+            cwd=mirror, capture_output=True, text=True
+        )
+        sha = self._has_commit(mirror, commit) if result.returncode == 0 else None
+        if sha:
+            return sha
+
+        # Servers that refuse unadvertised SHAs (or abbreviated hashes) need the branch history
+        branch = branch if branch and branch != "None" else "main"
+        print(f"Direct fetch of {commit} failed, fetching branch {branch} instead")
+        git("fetch", "--quiet", "origin", f"+refs/heads/{branch}:refs/heads/{branch}", cwd=mirror)
+        git("fetch", "--quiet", "--unshallow", "origin", cwd=mirror, check=False)
+        sha = self._has_commit(mirror, commit)
+        if not sha:
+            raise MirrorError(f"Commit {commit} not found in {repo_url} (branch {branch})")
+        git("update-ref", f"refs/pins/{sha}", sha, cwd=mirror)
+        return sha
+
+    def list_tree(self, mirror, commit):
+        """Return (path, mode, size, blob sha) for every file in a commit's tree, sorted by path"""
+        output = subprocess.run(
+            ["git", "ls-tree", "-r", "-l", "-z", commit],
+            cwd=mirror, capture_output=True, check=False
+        )
+        if output.returncode != 0:
+            raise MirrorError(f"git ls-tree {commit} failed: {output.stderr.decode('utf-8', 'replace').strip()}")
+
+        entries = []
+        for record in output.stdout.split(b"\0"):
+            if not record:
+                continue
+            meta, path = record.split(b"\t", 1)
+            mode, kind, sha, size = meta.split()
+            if kind != b"blob":
+                continue  # Submodules have no content in this repository
+            size = int(size) if size != b"-" else 0
+            entries.append((path.decode("utf-8", "surrogateescape"), mode.decode(), size, sha.decode()))
+        entries.sort()
+        return entries
+
+    def iter_blobs(self, mirror, shas):
+        """Yield (sha, bytes) for each blob SHA, in order, from a single git cat-file --batch process"""
+        process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=mirror, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+        # Feed requests from a thread so git can stream responses while we consume them
+        def feed():
+            try:
+                for sha in shas:
+                    process.stdin.write(f"{sha}\n".encode())
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        try:
+            for _ in shas:
+                header = process.stdout.readline().split()
+                if len(header) != 3 or header[1] != b"blob":
+                    raise MirrorError(f"git cat-file returned an unexpected header: {header!r}")
+                size = int(header[2])
+                data = process.stdout.read(size)
+                process.stdout.read(1)  # Trailing newline
+                yield header[0].decode(), data
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+            feeder.join()
+
+    def evict(self):
+        """Delete least recently used mirrors until the cache fits max_bytes; returns removed count"""
+        if not self.root.exists():
+            return 0
+
+        mirrors = []
+        for mirror in self.root.glob("*.git"):
+            marker = mirror / LAST_USED_MARKER
+            last_used = marker.stat().st_mtime if marker.exists() else 0
+            mirrors.append((last_used, directory_size(mirror), mirror))
+
+        total = sum(size for _, size, _ in mirrors)
+        removed = 0
+        for _, size, mirror in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if str(mirror) in self._used:
+                continue  # Never evict a mirror used by the current run
+            shutil.rmtree(mirror, ignore_errors=True)
+            total -= size
+            removed += 1
+            print(f"Evicted mirror {mirror.name} ({size} bytes)")
+        return removed
+
+
+def main(argv=None):
+    """Show the mirror cache and optionally evict down to a size"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Inspect or trim the repository mirror cache")
+    parser.add_argument("--cache-dir", default=str(repo_root / ".cache" / "mirrors"))
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--evict", action="store_true", help="Evict mirrors until the cache fits --max-mb")
+    args = parser.parse_args(argv)
+
+    cache = MirrorCache(args.cache_dir, args.max_mb * 1024 * 1024)
+    for mirror in sorted(cache.root.glob("*.git")):
+        url = git("remote", "get-url", "origin", cwd=mirror, check=False)
+        marker = mirror / LAST_USED_MARKER
+        last_used = time.strftime("%Y-%m-%d %H:%M", time.gmtime(marker.stat().st_mtime)) if marker.exists() else "never"
+        print(f"{mirror.name}  {directory_size(mirror):>12}  {last_used}  {url}")
+    if args.evict:
+        cache.evict()
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
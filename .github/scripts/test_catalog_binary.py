@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for catalog_binary: catalog.json and manifests are exported to
+catalog.bin, read back with CatalogReader and compared with the raw JSON values.
+
+Run with: python -m unittest discover -s .github/scripts -p "test_*.py"
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import catalog_binary
+from catalog import Catalog
+from catalog_binary import CatalogReader, export, verify
+
+THEME_MANIFEST = {
+    "accent_colors": {
+        "color1": "0xFF0000",
+        "color2": "0x00ff80",
+        "color3": "0x000000",
+        "color4": "0xFFFFFF",
+        "color5": "0x123456",
+        "color6": "0xABCDEF"
+    },
+    "led_settings": {
+        "f1_key": {"effect": 1, "color1": "0xFF0000", "color2": "0x0000FF", "speed": 1000, "brightness": 100,
+                   "trigger": 1, "in_brightness": 50},
+        "top_bar": {"effect": 4, "color1": "0x00FF00", "color2": "", "speed": 0, "brightness": 0,
+                    "trigger": 0, "in_brightness": 0}
+    }
+}
+
+CATALOG = {
+    "last_updated": "2025-05-01T12:00:00.000000Z",
+    "themes": {
+        "Colorful.theme": {
+            "preview_path": "Catalog/.metadata/previews/Colorful.theme.png",
+            "manifest_path": "Catalog/.metadata/manifests/Colorful.theme.json",
+            "author": "Someone",
+            "description": "A theme with accents and LEDs é",
+            "URL": "https://example.com/Colorful.theme.zip",
+            "last_updated": "2025-05-01T12:00:00.000000Z",
+            "repository": "https://example.com/colorful",
+            "commit": "0123456789abcdef0123456789abcdef01234567",
+            "branch": "main",
+            "thumbnails": [
+                {"path": "Catalog/.metadata/previews/Colorful.theme.320.png", "width": 320, "height": 240, "format": "png"},
+                {"path": "Catalog/.metadata/previews/Colorful.theme.160.webp", "width": 160, "height": 120, "format": "webp"},
+                {"path": "Catalog/.metadata/previews/Colorful.theme.160.png", "width": 160, "height": 120, "format": "png"}
+            ]
+        },
+        "Plain.theme": {
+            "preview_path": "Catalog/.metadata/previews/Plain.theme.png",
+            "manifest_path": "Catalog/.metadata/manifests/Plain.theme.json",
+            "author": "Someone",
+            "description": "",
+            "URL": "https://example.com/Plain.theme.zip",
+            "last_updated": "2025-04-01T12:00:00.000000Z"
+        }
+    },
+    "components": {
+        "accents": {},
+        "leds": {},
+        "icons": {},
+        "fonts": {},
+        "wallpapers": {},
+        "overlays": {
+            "Scanlines.over": {
+                "preview_path": "Catalog/.metadata/previews/Scanlines.over.png",
+                "manifest_path": "Catalog/.metadata/manifests/Scanlines.over.json",
+                "author": "Someone else",
+                "description": "Overlays",
+                "URL": "https://example.com/Scanlines.over.zip",
+                "last_updated": "2025-03-01T12:00:00.000000Z",
+                "systems": ["GB", "GBA", "PS"]
+            }
+        }
+    }
+}
+
+
+class CatalogBinaryRoundTripTest(unittest.TestCase):
+    """Export a small catalog and read it back"""
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.repo_root = Path(self._tempdir.name)
+        manifests = self.repo_root / "Catalog" / ".metadata" / "manifests"
+        manifests.mkdir(parents=True)
+        (manifests / "Colorful.theme.json").write_text(json.dumps(THEME_MANIFEST), encoding="utf-8")
+        (manifests / "Plain.theme.json").write_text(json.dumps({"name": "Plain"}), encoding="utf-8")
+        # Scanlines.over has no manifest on disk
+
+        self.catalog_path = self.repo_root / "Catalog" / "catalog.json"
+        self.catalog_path.write_text(json.dumps(CATALOG, indent=2), encoding="utf-8")
+        self.catalog = Catalog.load(self.catalog_path)
+        self.binary_path = self.repo_root / "Catalog" / "catalog.bin"
+        self.assertTrue(export(self.catalog, self.repo_root, self.binary_path))
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def test_header_and_sections(self):
+        with CatalogReader(self.binary_path) as reader:
+            self.assertEqual(reader.last_updated, CATALOG["last_updated"])
+            self.assertEqual(list(reader.sections), ["themes"] + list(CATALOG["components"]))
+            self.assertEqual(reader.record_count, 3)
+
+    def test_entries_match_json(self):
+        with CatalogReader(self.binary_path) as reader:
+            sections = dict(CATALOG["components"], themes=CATALOG["themes"])
+            for section, items in sections.items():
+                records = list(reader.entries(section))
+                self.assertEqual([record["name"] for record in records], list(items))
+                for record, entry in zip(records, items.values()):
+                    self.assertEqual(record["section"], section)
+                    for field in ("description", "author", "URL", "preview_path", "manifest_path",
+                                  "last_updated", "repository", "commit", "branch", "systems"):
+                        self.assertEqual(record[field], entry.get(field), field)
+
+    def test_smallest_png_thumbnail(self):
+        with CatalogReader(self.binary_path) as reader:
+            colorful, plain = reader.entries("themes")
+        self.assertEqual(colorful["thumbnail"], "Catalog/.metadata/previews/Colorful.theme.160.png")
+        self.assertEqual(colorful["thumbnail_size"], (160, 120))
+        self.assertIsNone(plain["thumbnail"])
+        self.assertIsNone(plain["thumbnail_size"])
+
+    def test_accent_colors_match_manifest(self):
+        with CatalogReader(self.binary_path) as reader:
+            colorful, plain = reader.entries("themes")
+            overlay = next(reader.entries("overlays"))
+        for key, value in THEME_MANIFEST["accent_colors"].items():
+            self.assertEqual(colorful["accent_colors"][key].lower(), value.lower(), key)
+        self.assertIsNone(plain["accent_colors"])
+        self.assertIsNone(overlay["accent_colors"])
+
+    def test_led_settings_match_manifest(self):
+        with CatalogReader(self.binary_path) as reader:
+            colorful, plain = reader.entries("themes")
+        leds = colorful["led_settings"]
+        self.assertEqual(sorted(leds), sorted(THEME_MANIFEST["led_settings"]))
+        for zone_name, zone in THEME_MANIFEST["led_settings"].items():
+            for field, value in zone.items():
+                self.assertEqual(leds[zone_name][field].lower() if isinstance(value, str) else leds[zone_name][field],
+                                 value.lower() if isinstance(value, str) else value, f"{zone_name}.{field}")
+        self.assertIsNone(plain["led_settings"])
+
+    def test_verify_accepts_fresh_export(self):
+        self.assertEqual(verify(self.catalog, self.repo_root, self.binary_path), [])
+
+    def test_verify_reports_changed_manifest(self):
+        manifest = dict(THEME_MANIFEST, accent_colors=dict(THEME_MANIFEST["accent_colors"], color2="0x000001"))
+        path = self.repo_root / "Catalog" / ".metadata" / "manifests" / "Colorful.theme.json"
+        path.write_text(json.dumps(manifest), encoding="utf-8")
+        errors = verify(self.catalog, self.repo_root, self.binary_path)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("accent_colors.color2", errors[0])
+
+    def test_verify_reports_unrepresentable_led_value(self):
+        manifest = json.loads(json.dumps(THEME_MANIFEST))
+        manifest["led_settings"]["f1_key"]["brightness"] = 0x10000  # Does not fit the u16 field
+        path = self.repo_root / "Catalog" / ".metadata" / "manifests" / "Colorful.theme.json"
+        path.write_text(json.dumps(manifest), encoding="utf-8")
+        export(self.catalog, self.repo_root, self.binary_path)
+        errors = verify(self.catalog, self.repo_root, self.binary_path)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("f1_key.brightness", errors[0])
+
+    def test_export_is_unchanged_when_rerun(self):
+        self.assertFalse(export(self.catalog, self.repo_root, self.binary_path))
+
+    def test_rejects_other_files(self):
+        self.catalog_path.write_bytes(b"not a binary catalog at all, just some text")
+        with self.assertRaises(catalog_binary.CatalogBinaryError):
+            CatalogReader(self.catalog_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests for process_push: a rejected resubmission must leave the entry that is
+already in the catalog, and every file it owns, untouched; refreshing only the
+source fingerprint of an unchanged entry must not show up in the change feed.
+
+Run with: python -m unittest discover -s .github/scripts -p "test_*.py"
+"""
+
+import io
+import json
+import struct
+import subprocess
+import tempfile
+import unittest
+import zipfile
+import zlib
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import process_push
+from catalog import Catalog
+from ownership import OwnershipRegistry
+
+NAME = "Sample.theme"
+
+MAIN_ARGS = ["--workers", "1", "--no-thumbnails", "--no-image-hashes", "--no-palettes"]
+
+
+def png(width, height, value):
+    """Return a small solid RGB PNG"""
+    def chunk(chunk_type, payload):
+        return struct.pack(">I", len(payload)) + chunk_type + payload + struct.pack(">I", zlib.crc32(chunk_type + payload))
+    raw = b"".join(b"\x00" + bytes([value]) * width * 3 for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+def theme_manifest(name):
+    """Return a manifest that passes the theme schema"""
+    return {
+        "theme_info": {"name": name, "version": "1.0.0", "author": "Tester",
+                       "creation_date": "2025-01-01T00:00:00Z", "exported_by": "Theme Manager v1.0.0"},
+        "content": {
+            "wallpapers": {"present": True, "count": 1},
+            "icons": {"present": False, "system_count": 0, "tool_count": 0, "collection_count": 0},
+            "overlays": {"present": False, "systems": []},
+            "fonts": {"present": False, "og_replaced": False, "next_replaced": False},
+            "settings": {"accents_included": False, "leds_included": False}
+        },
+        "path_mappings": {}
+    }
+
+def package_files(manifest, value):
+    """Return {path: bytes} of a theme package"""
+    return {
+        "manifest.json": json.dumps(manifest, indent=2).encode("utf-8"),
+        "preview.png": png(64, 48, value),
+        "Wallpapers/SystemWallpapers/Game Boy (GB).png": png(16, 16, value)
+    }
+
+
+class RejectedResubmissionTest(unittest.TestCase):
+    """Ingest a theme, resubmit it with a broken manifest and check nothing was removed"""
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.root = Path(self._tempdir.name) / "repo"
+        (self.root / "Upload").mkdir(parents=True)
+        process_push.configure_paths(self.root, Path(self._tempdir.name) / "cache")
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def run_push(self, submission):
+        with open(self.root / "Upload" / "push.json", "w", encoding="utf-8") as f:
+            json.dump({"submission": [submission]}, f)
+        with redirect_stdout(io.StringIO()) as output:
+            success = process_push.main(MAIN_ARGS)
+        return success, output.getvalue()
+
+    def write_upload(self, files):
+        with zipfile.ZipFile(self.root / "Upload" / f"{NAME}.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+            for path, data in files.items():
+                archive.writestr(f"{NAME}/{path}", data)
+
+    def make_repository(self, files):
+        """Commit files to a local repository; returns (file URL, commit)"""
+        repo = Path(self._tempdir.name) / "source"
+        for path, data in files.items():
+            (repo / path).parent.mkdir(parents=True, exist_ok=True)
+            (repo / path).write_bytes(data)
+
+        def git(*args):
+            return subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True, text=True).stdout
+        if not (repo / ".git").exists():
+            git("init", "-q", "-b", "main")
+        git("add", "-A")
+        git("-c", "user.name=Tester", "-c", "user.email=tester@example.com", "commit", "-qm", "Update")
+        return repo.as_uri(), git("rev-parse", "HEAD").strip()
+
+    def snapshot(self):
+        """Return the catalog entry and {path: bytes} of every file the registry says it owns"""
+        entry = Catalog.load(process_push.CATALOG_PATH).get("themes", NAME)
+        registry = OwnershipRegistry.load(process_push.REGISTRY_PATH, self.root)
+        files = registry.files("themes", NAME)
+        self.assertIsNotNone(entry)
+        self.assertTrue(files)
+        return entry, {path: (self.root / path).read_bytes() for path in files}
+
+    def assert_intact(self, before, output):
+        entry, files = self.snapshot()
+        self.assertEqual((entry, files), before)
+        for path in (entry["preview_path"], entry["manifest_path"], f"Packages/themes/{NAME}.zip"):
+            self.assertTrue((self.root / path).is_file(), path)
+        self.assertNotIn("owned by", output)
+
+    def test_rejected_zip_resubmission_keeps_entry(self):
+        submission = {"type": "theme", "name": NAME, "author": "Tester", "submission_method": "zip"}
+        self.write_upload(package_files(theme_manifest(NAME), 10))
+        success, output = self.run_push(submission)
+        self.assertTrue(success, output)
+        before = self.snapshot()
+
+        broken = theme_manifest(NAME)
+        del broken["theme_info"]
+        self.write_upload(package_files(broken, 20))
+        success, output = self.run_push(submission)
+        self.assertFalse(success)
+        self.assert_intact(before, output)
+
+    def test_rejected_repository_resubmission_keeps_entry(self):
+        url, commit = self.make_repository(package_files(theme_manifest(NAME), 10))
+        submission = {"type": "theme", "name": NAME, "author": "Tester", "submission_method": "repository",
+                      "url": url, "commit": commit, "branch": "main"}
+        success, output = self.run_push(submission)
+        self.assertTrue(success, output)
+        before = self.snapshot()
+
+        broken = theme_manifest(NAME)
+        del broken["theme_info"]
+        url, commit = self.make_repository(package_files(broken, 20))
+        success, output = self.run_push(dict(submission, commit=commit))
+        self.assertFalse(success)
+        self.assert_intact(before, output)
+
+
+class RefreshEntryTest(unittest.TestCase):
+    """Refresh an unchanged entry and check what reaches the change feed"""
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.catalog_path = Path(self._tempdir.name) / "Catalog" / "catalog.json"
+        self.catalog = Catalog.load(self.catalog_path)
+        self.catalog.put_first("themes", NAME, {"author": "Tester", "description": "Sample", "last_updated": "x",
+                                                "source": {"method": "url", "url": "https://example.com/a.zip",
+                                                           "sha256": "0" * 64, "etag": "\"1\""}})
+        self.catalog.save()
+        self.submission = {"type": "theme", "name": NAME, "author": "Tester", "submission_method": "url"}
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def test_new_validators_are_saved_without_a_change_record(self):
+        sequence = self.catalog.change_log.last_sequence()
+        source = dict(self.catalog.get("themes", NAME)["source"], etag="\"2\"")
+        with redirect_stdout(io.StringIO()):
+            process_push.refresh_entry(self.catalog, self.submission, source)
+        self.assertTrue(self.catalog.save())
+        self.assertEqual(self.catalog.change_log.last_sequence(), sequence)
+        self.assertEqual(Catalog.load(self.catalog_path).get("themes", NAME)["source"], source)
+
+    def test_new_author_is_logged(self):
+        sequence = self.catalog.change_log.last_sequence()
+        source = self.catalog.get("themes", NAME)["source"]
+        with redirect_stdout(io.StringIO()):
+            process_push.refresh_entry(self.catalog, dict(self.submission, author="Someone else"), source)
+        self.catalog.save()
+        self.assertEqual(self.catalog.change_log.last_sequence(), sequence + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Resized preview derivatives (thumbnails) for the gallery and the Theme Manager.
+
+Each preview is resized to a few fixed widths and saved as PNG and WebP.
+Results are cached under the source image's SHA-256, so a preview that has not
+changed is never resized again. Rendering is CPU bound and runs in worker
+processes. Pillow is optional: without it no derivatives are produced and the
+full-size preview is used everywhere.
+
+Run directly to (re)build the derivatives of every catalog entry's preview.
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from blobstore import BlobStore, file_sha256
+from catalog import Catalog
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Widths of the generated derivatives (never larger than the source)
+DERIVATIVE_WIDTHS = [240, 480]
+
+# File extension -> Pillow format name
+DERIVATIVE_FORMATS = {"png": "PNG", "webp": "WEBP"}
+
+# Lossy WebP quality; previews are screenshots, so stay on the high side
+WEBP_QUALITY = 85
+
+# Name of the per-source description of the cached derivatives
+CACHE_INDEX = "derivatives.json"
+
+
+def pillow_available():
+    """Return True when Pillow can be imported"""
+    return Image is not None
+
+def _load_cached(entry_dir, widths):
+    """Return the cached derivatives of a source if they are complete, else None"""
+    try:
+        with open(entry_dir / CACHE_INDEX, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("widths") != sorted(widths):
+        return None
+    for derivative in cached["derivatives"]:
+        if not (entry_dir / derivative["file"]).exists():
+            return None
+    return cached["derivatives"]
+
+def _save_image(image, path, image_format):
+    """Save an image atomically (never over a possibly hardlinked file)"""
+    temp_path = path.parent / f".{path.name}.{os.getpid()}.tmp"
+    if image_format == "WEBP":
+        image.save(temp_path, image_format, quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(temp_path, image_format, optimize=True)
+    os.replace(temp_path, path)
+
+def render_derivatives(source_path, cache_dir, widths=DERIVATIVE_WIDTHS):
+    """
+    Resize an image to each width (PNG and WebP), reusing the cache when the source
+    is unchanged. Returns a list of dicts with width, height, format and cache_path.
+    """
+    sha256 = file_sha256(source_path)
+    entry_dir = Path(cache_dir) / sha256[:2] / sha256
+    derivatives = _load_cached(entry_dir, widths)
+
+    if derivatives is None:
+        if Image is None:
+            return []
+        os.makedirs(entry_dir, exist_ok=True)
+        derivatives = []
+        with Image.open(source_path) as image:
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+            for width in sorted(widths):
+                if width >= image.width:
+                    continue  # The original already fits
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+                for extension, image_format in DERIVATIVE_FORMATS.items():
+                    file_name = f"{width}.{extension}"
+                    _save_image(resized, entry_dir / file_name, image_format)
+                    derivatives.append({"width": width, "height": height, "format": extension, "file": file_name})
+
+        index_path = entry_dir / CACHE_INDEX
+        with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": sha256, "widths": sorted(widths), "derivatives": derivatives}, f, indent=2)
+        os.replace(f"{index_path}.tmp", index_path)
+
+    return [dict(derivative, cache_path=str(entry_dir / derivative["file"])) for derivative in derivatives]
+
+def place_derivatives(derivatives, name, output_dir, store, repo_root):
+    """Place rendered derivatives as <name>.<width>.<format> through a blob store; returns catalog records"""
+    records = []
+    for derivative in derivatives:
+        dest = Path(output_dir) / f"{name}.{derivative['width']}.{derivative['format']}"
+        store.copy_file(derivative["cache_path"], dest)
+        records.append({
+            "path": str(dest.relative_to(repo_root)),
+            "width": derivative["width"],
+            "height": derivative["height"],
+            "format": derivative["format"]
+        })
+    return records
+
+
+def main(argv=None):
+    """Build derivatives for every catalog entry's preview and record them in catalog.json"""
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    parser = argparse.ArgumentParser(description="Generate resized PNG/WebP derivatives of catalog previews")
+    parser.add_argument("--catalog", default=str(repo_root / "Catalog" / "catalog.json"))
+    parser.add_argument("--cache-dir", default=str(repo_root / ".cache"))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if not pillow_available():
+        print("Error: Pillow is not installed (pip install Pillow)")
+        return False
+
+    catalog = Catalog.load(args.catalog)
+    store = BlobStore(Path(args.cache_dir) / "blobs")
+    output_dir = repo_root / "Catalog" / ".metadata" / "thumbnails"
+
+    jobs = []
+    for section in catalog.sections:
+        for name, entry in catalog.items(section):
+            preview = repo_root / entry.get("preview_path", "")
+            if "preview_path" in entry and preview.is_file():
+                jobs.append((entry, name, preview))
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(render_derivatives, str(preview), Path(args.cache_dir) / "thumbnails")
+                   for _, _, preview in jobs]
+        for (entry, name, _), future in zip(jobs, futures):
+            records = place_derivatives(future.result(), name, output_dir, store, repo_root)
+            if entry.get("thumbnails") != records:
+                entry["thumbnails"] = records
+                catalog.mark_dirty()
+            print(f"{name}: {len(records)} derivative(s)")
+
+    catalog.save()
+    print(store.summary())
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)